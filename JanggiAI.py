@@ -0,0 +1,716 @@
+# Description: Computer opponent for Janggi. Searches positions with negamax alpha-beta, a transposition table,
+#              move ordering (captures, killer moves and the history heuristic) and iterative deepening under a
+#              time budget. Works on JanggiPosition.Position and returns moves that JanggiGame.make_move accepts.
+#              ParallelSearchEngine spreads the root moves over a pool of worker processes, each worker only showing
+#              whether its move beats the best score found so far.
+
+import multiprocessing
+import os
+import queue
+import time
+from collections import deque
+
+from JanggiPosition import (BLUE, RED, GENERAL, GUARD, HORSE, ELEPHANT, CHARIOT, CANNON, SOLDIER, PALACE_MASKS,
+                            SQUARE_NAMES, Position)
+
+MATE_SCORE = 100000
+MATE_THRESHOLD = MATE_SCORE - 1000
+INFINITY = MATE_SCORE + 1
+
+# material values (in hundredths of a Soldier-ish unit), indexed by piece type
+PIECE_VALUES = [0, 300, 500, 300, 1300, 700, 200]
+
+# transposition table entry flags
+EXACT = 0
+LOWER_BOUND = 1
+UPPER_BOUND = 2
+
+# how deep the capture-only search at the leaves may go
+QUIESCENCE_DEPTH = 6
+
+
+def _build_piece_square_tables():
+    """
+    Builds the positional bonus of every piece code on every square
+    :return: list indexed by piece code (1-14) of lists indexed by square
+    """
+    tables = [[0] * 90]
+    for color in [BLUE, RED]:
+        for piece_type in range(7):
+            table = []
+            for square in range(90):
+                row, column = square // 9 + 1, square % 9 + 1
+                # rows advanced from the player's own back rank (0-9)
+                advance = 10 - row if color == BLUE else row - 1
+                center_distance = abs(column - 5)
+                bonus = 0
+                if piece_type == SOLDIER:
+                    bonus = 8 * max(0, advance - 3) - 3 * center_distance
+                    if advance >= 7 and 4 <= column <= 6:
+                        bonus += 20
+                elif piece_type == HORSE:
+                    bonus = 12 - 3 * center_distance - 2 * abs(advance - 4)
+                elif piece_type == ELEPHANT:
+                    bonus = 6 - 2 * center_distance
+                elif piece_type == CHARIOT:
+                    bonus = 8 if advance >= 5 else 0
+                    bonus += 6 if column == 5 else 0
+                elif piece_type == CANNON:
+                    bonus = 10 if advance <= 2 and column == 5 else 0
+                elif piece_type == GENERAL:
+                    bonus = 20 if column == 5 and advance == 1 else 0
+                elif piece_type == GUARD:
+                    bonus = 10 if advance <= 2 else 0
+                table.append(bonus)
+            tables.append(table)
+    return tables
+
+
+PIECE_SQUARE_TABLES = _build_piece_square_tables()
+
+# squares in and just in front of each palace; enemy attackers there threaten the General
+_PALACE_ZONES = [PALACE_MASKS[BLUE] | PALACE_MASKS[BLUE] >> 9, PALACE_MASKS[RED] | PALACE_MASKS[RED] << 9]
+_ATTACKER_WEIGHTS = [(CHARIOT, 40), (CANNON, 25), (HORSE, 25), (SOLDIER, 20)]
+
+
+def evaluate(position):
+    """
+    Static evaluation of a position: material, piece placement and palace safety
+    :param position: Position object
+    :return: score in favor of the side to move
+    """
+    squares = position.get_squares()
+    score = 0
+    for square in range(90):
+        code = squares[square]
+        if code:
+            value = PIECE_VALUES[(code - 1) % 7] + PIECE_SQUARE_TABLES[code][square]
+            if code <= 7:
+                score += value
+            else:
+                score -= value
+
+    # palace safety: Guards at home and enemy attackers around the palace
+    for color, sign in [(BLUE, 1), (RED, -1)]:
+        zone = _PALACE_ZONES[color]
+        safety = 15 * bin(position.get_bitboard(color, GUARD) & PALACE_MASKS[color]).count('1')
+        for piece_type, weight in _ATTACKER_WEIGHTS:
+            safety -= weight * bin(position.get_bitboard(1 - color, piece_type) & zone).count('1')
+        score += sign * safety
+
+    return score if position.get_side_to_move() == BLUE else -score
+
+
+class _SearchTimeout(Exception):
+    """
+    Raised inside the search when the time budget runs out
+    """
+    pass
+
+
+class SearchResult:
+    """
+    Represents the outcome of a search
+    """
+
+    def __init__(self, move, score, depth, nodes, elapsed):
+        """
+        Initializes the search result
+        :param move: best move as a (from_location, to_location) tuple, or None if there are no moves
+        :param score: score of the best move for the side to move
+        :param depth: deepest completed iteration
+        :param nodes: number of positions searched
+        :param elapsed: time spent searching in seconds
+        """
+        self._move = move
+        self._score = score
+        self._depth = depth
+        self._nodes = nodes
+        self._elapsed = elapsed
+
+    def get_move(self):
+        """
+        Getter method for the best move
+        :return: (from_location, to_location) tuple in algebraic notation, or None
+        """
+        return self._move
+
+    def get_score(self):
+        """
+        Getter method for the score of the best move
+        :return: score for the side to move (mates are close to +/- MATE_SCORE)
+        """
+        return self._score
+
+    def get_depth(self):
+        """
+        Getter method for the deepest completed iteration
+        :return: search depth in plies
+        """
+        return self._depth
+
+    def get_nodes(self):
+        """
+        Getter method for the number of positions searched
+        :return: node count
+        """
+        return self._nodes
+
+    def get_elapsed(self):
+        """
+        Getter method for the time spent searching
+        :return: seconds
+        """
+        return self._elapsed
+
+    def get_nodes_per_second(self):
+        """
+        Getter method for the search speed
+        :return: nodes searched per second
+        """
+        return self._nodes / self._elapsed if self._elapsed > 0 else 0.0
+
+
+class SearchEngine:
+    """
+    Represents a computer player that searches for the best move in a position
+    """
+
+    def __init__(self, max_depth=64, time_limit=None, table_size=1 << 20, book=None, tablebases=None):
+        """
+        Initializes the search engine
+        :param max_depth: deepest iteration to search
+        :param time_limit: seconds allowed per search (None for no limit)
+        :param table_size: maximum number of transposition table entries kept between searches
+        :param book: JanggiBook.OpeningBook object to play from before searching (None to always search)
+        :param tablebases: JanggiTablebase.Tablebases object to look endgames up in instead of searching them
+        """
+        self._book = book
+        self._tablebases = tablebases
+        self._tablebase_pieces = 0 if tablebases is None else tablebases.get_max_pieces()
+        self._max_depth = max_depth
+        self._time_limit = time_limit
+        self._table_size = table_size
+        self._table = {}
+        self._history = [0] * (90 << 7)
+        self._killers = []
+        self._nodes = 0
+        self._deadline = None
+        self._path = set()
+
+    def get_nodes(self):
+        """
+        Getter method for the number of positions searched by the last search
+        :return: node count
+        """
+        return self._nodes
+
+    def clear(self):
+        """
+        Forgets everything learned in earlier searches (transposition table and move ordering statistics)
+        """
+        self._table.clear()
+        self._history = [0] * (90 << 7)
+
+    def best_move(self, game, max_depth=None, time_limit=None):
+        """
+        Finds the best move for the player whose turn it is
+        :param game: JanggiGame or Position object (not modified)
+        :param max_depth: deepest iteration to search (the engine's default if not given)
+        :param time_limit: seconds allowed (the engine's default if not given)
+        :return: (from_location, to_location) tuple to pass to make_move, or None if the game is over
+        """
+        if self._book is not None:
+            if isinstance(game, Position):
+                move = None
+                if game.get_game_state() == 'UNFINISHED':
+                    move = self._book.choose_move(game.get_hash(), game.get_side_to_move())
+                if move is not None and move in game.generate_legal_moves():
+                    return SQUARE_NAMES[move >> 7], SQUARE_NAMES[move & 127]
+            else:
+                book_move = game.get_book_move(self._book)
+                if book_move is not None:
+                    return book_move
+        return self.search(game, max_depth, time_limit).get_move()
+
+    def search(self, game, max_depth=None, time_limit=None, root_moves=None, hash_history=None, alpha=None):
+        """
+        Searches a position with iterative deepening until the depth or time budget is used up.
+        The first iteration always completes so that a move is returned.
+        :param game: JanggiGame or Position object (not modified)
+        :param max_depth: deepest iteration to search (the engine's default if not given)
+        :param time_limit: seconds allowed (the engine's default if not given)
+        :param root_moves: encoded moves to restrict the search to (all legal moves if not given)
+        :param hash_history: hashes of earlier positions in the game, when not recorded on the position's undo stack
+        :param alpha: score already reached by another move, so only moves that beat it need an exact score (a score
+                      not above alpha is an upper bound)
+        :return: SearchResult object
+        """
+        if isinstance(game, Position):
+            position = game.copy()
+        else:
+            # the Position is built without the game's moves, so the earlier positions come from the game itself
+            position = Position.from_game(game)
+            hash_history = game.get_hash_history() + (list(hash_history) if hash_history is not None else [])
+        max_depth = self._max_depth if max_depth is None else max_depth
+        time_limit = self._time_limit if time_limit is None else time_limit
+
+        start = time.perf_counter()
+        self._nodes = 0
+        self._deadline = None
+        self._path = set(position.get_hash_history())
+        if hash_history is not None:
+            self._path.update(hash_history)
+        self._killers = [[0, 0] for _ in range(max_depth + QUIESCENCE_DEPTH + 64)]
+        self._history = [value >> 1 for value in self._history]
+        if len(self._table) > self._table_size:
+            self._table.clear()
+
+        if position.get_game_state() != 'UNFINISHED':
+            return SearchResult(None, 0, 0, 0, 0.0)
+        moves = position.generate_legal_moves() if root_moves is None else list(root_moves)
+        if len(moves) == 0:
+            return SearchResult(None, 0, 0, 0, time.perf_counter() - start)
+
+        best_move, best_score, completed_depth = moves[0], -INFINITY, 0
+        for depth in range(1, max_depth + 1):
+            # the first iteration runs without a deadline so there is always a move to return
+            if depth == 2 and time_limit is not None:
+                self._deadline = start + time_limit
+            try:
+                score, move = self._search_root(position, moves, depth, best_move, root_moves is None,
+                                                -INFINITY if alpha is None else alpha)
+            except _SearchTimeout:
+                break
+            best_move, best_score, completed_depth = move, score, depth
+            if abs(score) >= MATE_THRESHOLD or (root_moves is None and len(moves) == 1):
+                break
+            if self._deadline is not None and time.perf_counter() > self._deadline:
+                break
+
+        return SearchResult((SQUARE_NAMES[best_move >> 7], SQUARE_NAMES[best_move & 127]), best_score,
+                            completed_depth, self._nodes, time.perf_counter() - start)
+
+    def _search_root(self, position, moves, depth, previous_best, all_moves=True, alpha=-INFINITY):
+        """
+        Searches every root move to the given depth. When a score to beat is given (by the parallel search), each
+        move is first searched with a null window to see if it beats the score, and only searched again for its
+        exact score if it does.
+        :param position: Position object
+        :param moves: legal encoded moves
+        :param depth: depth in plies
+        :param previous_best: best move of the previous iteration (searched first)
+        :param all_moves: False if moves is only some of the legal moves, so the score is not the position's
+        :param alpha: score the moves have to beat (-INFINITY for none)
+        :return: (score, best move), the score being an upper bound if no move beat alpha
+        """
+        ordered = [previous_best] + [move for move in moves if move != previous_best]
+        best_score, best_move = -INFINITY, previous_best
+        null_window = alpha > -INFINITY
+        exact = all_moves and not null_window
+        # lines that come back to the root are repetitions too
+        key = position.get_hash()
+        self._path.add(key)
+        for move in ordered:
+            position.push_move(move)
+            if null_window:
+                score = -self._negamax(position, depth - 1, -alpha - 1, -alpha, 1)
+                if score > alpha:
+                    score = -self._negamax(position, depth - 1, -INFINITY, -alpha, 1)
+            else:
+                score = -self._negamax(position, depth - 1, -INFINITY, -alpha, 1)
+            position.pop_move()
+            if score > best_score:
+                best_score, best_move = score, move
+                alpha = max(alpha, score)
+        self._path.discard(key)
+        if exact:
+            self._store(key, depth, best_score, EXACT, best_move, 0)
+        return best_score, best_move
+
+    def _check_time(self):
+        """
+        Raises _SearchTimeout once the deadline has passed (checked every 1024 nodes)
+        """
+        if self._nodes & 1023 == 0 and self._deadline is not None and time.perf_counter() > self._deadline:
+            raise _SearchTimeout()
+
+    def _store(self, key, depth, score, flag, move, ply):
+        """
+        Stores a search result in the transposition table, converting mate scores to be relative to the position
+        """
+        if score >= MATE_THRESHOLD:
+            score += ply
+        elif score <= -MATE_THRESHOLD:
+            score -= ply
+        self._table[key] = (depth, score, flag, move)
+
+    def _order_moves(self, position, moves, table_move, ply):
+        """
+        Sorts moves so the likeliest best moves are searched first: the transposition table move, then captures of
+        valuable pieces by cheap pieces, then killer moves, then moves with the best history
+        """
+        squares = position.get_squares()
+        killers = self._killers[ply]
+        history = self._history
+        scored = []
+        for move in moves:
+            if move == table_move:
+                priority = 1 << 30
+            else:
+                victim = squares[move & 127]
+                if victim:
+                    priority = (1 << 24) + 16 * PIECE_VALUES[(victim - 1) % 7] - \
+                        PIECE_VALUES[(squares[move >> 7] - 1) % 7]
+                elif move == killers[0]:
+                    priority = 1 << 23
+                elif move == killers[1]:
+                    priority = (1 << 23) - 1
+                else:
+                    priority = history[move]
+            scored.append((priority, move))
+        scored.sort(reverse=True)
+        return [move for _, move in scored]
+
+    def _negamax(self, position, depth, alpha, beta, ply):
+        """
+        Alpha-beta search in negamax form
+        :param position: Position object
+        :param depth: remaining depth in plies
+        :param alpha: lower bound of the search window
+        :param beta: upper bound of the search window
+        :param ply: distance from the root
+        :return: score for the side to move
+        """
+        self._nodes += 1
+        self._check_time()
+
+        # repeating a position from the game or the current line is scored as a draw
+        key = position.get_hash()
+        if key in self._path:
+            return 0
+
+        if self._tablebase_pieces and bin(position.get_occupied()).count('1') <= self._tablebase_pieces:
+            result = self._tablebases.probe(position)
+            if result is not None:
+                # results are with best play from here, so they count from this ply
+                result, distance = result
+                if result > 0:
+                    return MATE_SCORE - ply - distance
+                return -MATE_SCORE + ply + distance if result < 0 else 0
+
+        entry = self._table.get(key)
+        table_move = 0
+        if entry is not None:
+            entry_depth, entry_score, flag, table_move = entry
+            if entry_depth >= depth:
+                if entry_score >= MATE_THRESHOLD:
+                    entry_score -= ply
+                elif entry_score <= -MATE_THRESHOLD:
+                    entry_score += ply
+                if flag == EXACT:
+                    return entry_score
+                if flag == LOWER_BOUND and entry_score >= beta:
+                    return entry_score
+                if flag == UPPER_BOUND and entry_score <= alpha:
+                    return entry_score
+
+        side = position.get_side_to_move()
+        in_check = position.square_attacked(position.general_square(side), 1 - side)
+        # the entry is stored at the depth it was asked for, so a later probe doesn't count the extension twice
+        probed_depth = depth
+        if in_check:
+            depth += 1
+        if depth <= 0:
+            return self._quiescence(position, alpha, beta, ply, QUIESCENCE_DEPTH)
+
+        original_alpha = alpha
+        best_score, best_move, legal_moves = -INFINITY, 0, 0
+        squares = position.get_squares()
+        self._path.add(key)
+        for move in self._order_moves(position, position.pseudo_legal_moves(side), table_move, ply):
+            capture = squares[move & 127]
+            position.push_move(move)
+            if position.square_attacked(position.general_square(side), 1 - side):
+                position.pop_move()
+                continue
+            legal_moves += 1
+            score = -self._negamax(position, depth - 1, -beta, -alpha, ply + 1)
+            position.pop_move()
+
+            if score > best_score:
+                best_score, best_move = score, move
+            if score > alpha:
+                alpha = score
+            if alpha >= beta:
+                if not capture:
+                    killers = self._killers[ply]
+                    if killers[0] != move:
+                        killers[1], killers[0] = killers[0], move
+                    self._history[move] += depth * depth
+                break
+        self._path.discard(key)
+
+        if legal_moves == 0:
+            # checkmated, or no moves but allowed to pass the turn
+            return -MATE_SCORE + ply if in_check else 0
+
+        if best_score <= original_alpha:
+            flag = UPPER_BOUND
+        elif best_score >= beta:
+            flag = LOWER_BOUND
+        else:
+            flag = EXACT
+        self._store(key, probed_depth, best_score, flag, best_move, ply)
+        return best_score
+
+    def _quiescence(self, position, alpha, beta, ply, remaining):
+        """
+        Searches captures only, so that positions are not evaluated in the middle of an exchange
+        :param position: Position object
+        :param alpha: lower bound of the search window
+        :param beta: upper bound of the search window
+        :param ply: distance from the root
+        :param remaining: how many more capture plies may be searched
+        :return: score for the side to move
+        """
+        self._nodes += 1
+        self._check_time()
+
+        stand_pat = evaluate(position)
+        if stand_pat >= beta or remaining == 0:
+            return stand_pat
+        if stand_pat > alpha:
+            alpha = stand_pat
+
+        side = position.get_side_to_move()
+        squares = position.get_squares()
+        captures = [move for move in position.pseudo_legal_moves(side) if squares[move & 127]]
+        for move in self._order_moves(position, captures, 0, ply):
+            position.push_move(move)
+            if position.square_attacked(position.general_square(side), 1 - side):
+                position.pop_move()
+                continue
+            score = -self._quiescence(position, -beta, -alpha, ply + 1, remaining - 1)
+            position.pop_move()
+            if score >= beta:
+                return score
+            if score > alpha:
+                alpha = score
+        return alpha
+
+
+# search engine of each worker process, created by _init_worker so its transposition table survives between tasks
+_worker_engine = None
+
+
+def _init_worker(table_size):
+    """
+    Creates the search engine of a worker process
+    :param table_size: transposition table size of the worker's engine
+    """
+    global _worker_engine
+    _worker_engine = SearchEngine(table_size=table_size)
+
+
+def _search_root_move(task):
+    """
+    Searches a single root move in a worker process
+    :param task: (encoded position, hash history, encoded move, depth, deadline as time.time() or None, score to
+                 beat or None)
+    :return: (move, score, completed depth (0 if the deadline had already passed), nodes, worker process id), the
+             score being an upper bound if it doesn't beat the score to beat
+    """
+    encoded, hash_history, move, depth, deadline, alpha = task
+    time_limit = None
+    if deadline is not None:
+        time_limit = deadline - time.time()
+        if time_limit <= 0:
+            return move, 0, 0, 0, os.getpid()
+
+    result = _worker_engine.search(Position.decode(encoded), depth, time_limit, [move], hash_history, alpha)
+    return move, result.get_score(), result.get_depth(), result.get_nodes(), os.getpid()
+
+
+class ParallelSearchResult(SearchResult):
+    """
+    Represents the outcome of a parallel search, including the work done by each worker process
+    """
+
+    def __init__(self, move, score, depth, nodes, elapsed, worker_nodes):
+        """
+        Initializes the parallel search result
+        :param worker_nodes: dictionary of worker process id to the number of positions it searched
+        (other parameters as for SearchResult)
+        """
+        super().__init__(move, score, depth, nodes, elapsed)
+        self._worker_nodes = worker_nodes
+
+    def get_worker_nodes(self):
+        """
+        Getter method for the positions searched by each worker process
+        :return: dictionary of worker process id to node count
+        """
+        return self._worker_nodes
+
+
+class ParallelSearchEngine:
+    """
+    Represents a computer player that searches the root moves of a position in parallel on a process pool.
+    Positions are sent to the workers in the compact Position.encode format.
+    """
+
+    def __init__(self, workers=None, max_depth=64, time_limit=None, table_size=1 << 18):
+        """
+        Initializes the parallel search engine (the process pool is started on first use)
+        :param workers: number of worker processes (the number of CPUs if not given)
+        :param max_depth: deepest iteration to search
+        :param time_limit: seconds allowed per search (None for no limit)
+        :param table_size: transposition table size of each worker
+        """
+        self._workers = workers or os.cpu_count() or 1
+        self._max_depth = max_depth
+        self._time_limit = time_limit
+        self._table_size = table_size
+        self._pool = None
+
+    def get_workers(self):
+        """
+        Getter method for the number of worker processes
+        :return: number of workers
+        """
+        return self._workers
+
+    def close(self):
+        """
+        Shuts down the worker processes
+        """
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+
+    def __enter__(self):
+        """
+        Allows the engine to be used in a with statement so the worker processes are shut down afterwards
+        :return: the engine
+        """
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """
+        Shuts down the worker processes at the end of a with statement
+        """
+        self.close()
+
+    def best_move(self, game, max_depth=None, time_limit=None):
+        """
+        Finds the best move for the player whose turn it is
+        :param game: JanggiGame or Position object (not modified)
+        :param max_depth: deepest iteration to search (the engine's default if not given)
+        :param time_limit: seconds allowed (the engine's default if not given)
+        :return: (from_location, to_location) tuple to pass to make_move, or None if the game is over
+        """
+        return self.search(game, max_depth, time_limit).get_move()
+
+    def search(self, game, max_depth=None, time_limit=None):
+        """
+        Searches a position with iterative deepening, handing each root move to the worker pool as a separate task.
+        In each iteration the first move (the best of the previous iteration) is searched alone; the others are then
+        handed out as workers become free, each with the best score found so far, so a worker only has to show that
+        its move doesn't beat that score (a null-window search) unless it does. An iteration only counts if every
+        root move finished it before the deadline. The first iteration always completes so that a move is returned.
+        :param game: JanggiGame or Position object (not modified)
+        :param max_depth: deepest iteration to search (the engine's default if not given)
+        :param time_limit: seconds allowed (the engine's default if not given)
+        :return: ParallelSearchResult object
+        """
+        position = game.copy() if isinstance(game, Position) else Position.from_game(game)
+        max_depth = self._max_depth if max_depth is None else max_depth
+        time_limit = self._time_limit if time_limit is None else time_limit
+
+        start = time.perf_counter()
+        worker_nodes = {}
+        if position.get_game_state() != 'UNFINISHED':
+            return ParallelSearchResult(None, 0, 0, 0, 0.0, worker_nodes)
+        moves = position.generate_legal_moves()
+        if len(moves) == 0:
+            return ParallelSearchResult(None, 0, 0, 0, time.perf_counter() - start, worker_nodes)
+
+        if self._pool is None:
+            self._pool = multiprocessing.Pool(self._workers, _init_worker, (self._table_size,))
+
+        encoded = position.encode()
+        hash_history = position.get_hash_history() if isinstance(game, Position) else game.get_hash_history()
+        deadline = None
+        best_move, best_score, completed_depth = moves[0], -INFINITY, 0
+        scores = {}
+        # results of the tasks, put there by the pool's result thread
+        results = queue.Queue()
+        for depth in range(1, max_depth + 1):
+            if depth == 2 and time_limit is not None:
+                deadline = time.time() + time_limit
+
+            # best moves of the previous iteration first (their scores are exact or upper bounds)
+            moves.sort(key=lambda move: scores.get(move, -INFINITY), reverse=True)
+            waiting = deque(moves)
+            iteration_scores = {}
+            iteration_best, alpha = None, None
+            finished = True
+            running = 1
+            self._pool.apply_async(_search_root_move, ((encoded, hash_history, waiting.popleft(), depth, deadline,
+                                                        None),), callback=results.put, error_callback=results.put)
+            while running:
+                result = results.get()
+                running -= 1
+                if isinstance(result, BaseException):
+                    raise result
+                move, score, move_depth, nodes, worker = result
+                worker_nodes[worker] = worker_nodes.get(worker, 0) + nodes
+                # the search of a move may stop early once it finds a mate
+                if move_depth == 0 or (move_depth < depth and abs(score) < MATE_THRESHOLD):
+                    finished = False
+                iteration_scores[move] = score
+                if alpha is None or score > alpha:
+                    iteration_best, alpha = move, score
+                while finished and waiting and running < self._workers:
+                    self._pool.apply_async(_search_root_move, ((encoded, hash_history, waiting.popleft(), depth,
+                                                                deadline, alpha),),
+                                           callback=results.put, error_callback=results.put)
+                    running += 1
+            if not finished:
+                break
+
+            scores = iteration_scores
+            best_move, best_score, completed_depth = iteration_best, alpha, depth
+            if abs(best_score) >= MATE_THRESHOLD or len(moves) == 1:
+                break
+            if deadline is not None and time.time() > deadline:
+                break
+
+        return ParallelSearchResult((SQUARE_NAMES[best_move >> 7], SQUARE_NAMES[best_move & 127]), best_score,
+                                    completed_depth, sum(worker_nodes.values()), time.perf_counter() - start,
+                                    worker_nodes)
+
+
+def measure_speedup(game, depth, workers=None):
+    """
+    Searches a position to a fixed depth with SearchEngine and with ParallelSearchEngine and compares them.
+    Used to tune the number of workers for a machine.
+    :param game: JanggiGame or Position object
+    :param depth: search depth in plies
+    :param workers: number of worker processes (the number of CPUs if not given)
+    :return: dictionary with the elapsed time and nodes of each search, the nodes of each worker and the speedup
+    """
+    single = SearchEngine().search(game, depth)
+    with ParallelSearchEngine(workers) as engine:
+        # start the pool before timing so process start-up isn't counted
+        engine.search(game, 1)
+        parallel = engine.search(game, depth)
+    return {'workers': engine.get_workers(),
+            'single_elapsed': single.get_elapsed(),
+            'single_nodes': single.get_nodes(),
+            'parallel_elapsed': parallel.get_elapsed(),
+            'parallel_nodes': parallel.get_nodes(),
+            'worker_nodes': parallel.get_worker_nodes(),
+            'speedup': single.get_elapsed() / parallel.get_elapsed() if parallel.get_elapsed() > 0 else 0.0}
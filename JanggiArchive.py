@@ -0,0 +1,301 @@
+# Description: Memory-mapped game archive. Builds an on-disk index of a game file (see JanggiRecord) from position
+#              hash to every (game, ply) where the position occurred, and answers which games reached a position and
+#              with what results by binary search over the memory-mapped index, without loading games into memory.
+#
+#              Index file: a header (INDEX_HEADER: magic, number of games, number of positions), one GAME_ENTRY per
+#              game (offset of its record in the game file and its result), then one POSITION_ENTRY per position
+#              reached (Zobrist hash, game number, ply) sorted by hash. Ply 0 is the position before the first move.
+#
+#              python JanggiArchive.py build GAMES_FILE
+#              python JanggiArchive.py query GAMES_FILE [MOVE ...]        (moves as from-to, e.g. c7-c6)
+
+import argparse
+import heapq
+import mmap
+import os
+import struct
+import sys
+import tempfile
+
+from JanggiPosition import SQUARE_INDEX, Position, encode_move
+from JanggiRecord import MAGIC, RESULTS, decode_position, decode_record, decode_record_header
+
+INDEX_MAGIC = b'JGI\x01'
+INDEX_HEADER = struct.Struct('<4sQQ')
+GAME_ENTRY = struct.Struct('<QB')
+POSITION_ENTRY = struct.Struct('<QII')
+
+# index entries sorted in memory at a time while building an index (larger sets are merged from sorted runs on disk)
+SORT_RUN_SIZE = 1 << 21
+
+
+def index_path_for(games_path):
+    """
+    Works out where the index of a game file is stored
+    :param games_path: path of the game file
+    :return: path of the index file
+    """
+    return games_path + '.idx'
+
+
+def scan_records(data):
+    """
+    Lists the records of a memory-mapped game file without decoding their moves
+    :param data: bytes-like object holding the whole game file
+    :return: generator of (offset of the record, result, (start, end) of the start position or None, offset of the
+             moves, number of moves) tuples
+    :raises ValueError: if the data is not a game file
+    """
+    if bytes(data[:len(MAGIC)]) != MAGIC:
+        raise ValueError('not a Janggi game file')
+    offset = len(MAGIC)
+    while offset < len(data):
+        result, start, moves_offset, count = decode_record_header(data, offset)
+        yield offset, result, start, moves_offset, count
+        offset = moves_offset + 2 * count
+
+
+def write_sorted_run(entries, directory):
+    """
+    Sorts index entries and writes them to a temporary file
+    :param entries: list of (hash, game, ply) tuples (cleared afterwards)
+    :param directory: directory for the temporary file
+    :return: path of the file
+    """
+    entries.sort()
+    descriptor, path = tempfile.mkstemp(suffix='.run', dir=directory)
+    with os.fdopen(descriptor, 'wb') as file:
+        for entry in entries:
+            file.write(POSITION_ENTRY.pack(*entry))
+    entries.clear()
+    return path
+
+
+def read_sorted_run(path):
+    """
+    Reads back the entries of a sorted run
+    :param path: path of a file written by write_sorted_run
+    :return: generator of (hash, game, ply) tuples
+    """
+    with open(path, 'rb') as file:
+        while True:
+            data = file.read(POSITION_ENTRY.size * 4096)
+            if not data:
+                return
+            yield from POSITION_ENTRY.iter_unpack(data)
+
+
+def build_index(games_path, index_path=None, run_size=SORT_RUN_SIZE):
+    """
+    Replays every game of a game file and writes the index of the positions reached. Uses a bounded amount of
+    memory: entries are sorted in runs of run_size and merged from temporary files.
+    :param games_path: path of the game file
+    :param index_path: path of the index file (next to the game file if not given)
+    :param run_size: number of index entries sorted in memory at a time
+    :return: (number of games, number of positions indexed) tuple
+    """
+    index_path = index_path_for(games_path) if index_path is None else index_path
+    directory = os.path.dirname(os.path.abspath(index_path))
+    game_entries = bytearray()
+    entries = []
+    runs = []
+    position = Position()
+    position_count = 0
+    try:
+        with open(games_path, 'rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            for game, (offset, result, start, moves_offset, count) in enumerate(scan_records(data)):
+                game_entries += GAME_ENTRY.pack(offset, RESULTS.index(result))
+                if start is None:
+                    position.reset()
+                else:
+                    pieces, current_player, _, _ = decode_position(data, start[0])
+                    position.reset(pieces, current_player)
+                entries.append((position.get_hash(), game, 0))
+                for ply, move in enumerate(struct.unpack_from('<%dH' % count, data, moves_offset)):
+                    position.push_move(move)
+                    entries.append((position.get_hash(), game, ply + 1))
+                position_count += count + 1
+                if len(entries) >= run_size:
+                    runs.append(write_sorted_run(entries, directory))
+
+        game_count = len(game_entries) // GAME_ENTRY.size
+        with open(index_path, 'wb') as file:
+            file.write(INDEX_HEADER.pack(INDEX_MAGIC, game_count, position_count))
+            file.write(game_entries)
+            if len(runs) == 0:
+                entries.sort()
+                merged = entries
+            else:
+                runs.append(write_sorted_run(entries, directory))
+                merged = heapq.merge(*[read_sorted_run(path) for path in runs])
+            buffer = bytearray()
+            for entry in merged:
+                buffer += POSITION_ENTRY.pack(*entry)
+                if len(buffer) >= 1 << 20:
+                    file.write(buffer)
+                    buffer.clear()
+            file.write(buffer)
+    finally:
+        for path in runs:
+            os.remove(path)
+    return game_count, position_count
+
+
+class GameArchive:
+    """
+    Represents a game file and its index, both memory-mapped. Lookups read only the index entries they need, so the
+    archive can be much larger than memory.
+    """
+
+    def __init__(self, games_path, index_path=None):
+        """
+        Opens the archive (the index has to have been built with build_index)
+        :param games_path: path of the game file
+        :param index_path: path of the index file (next to the game file if not given)
+        :raises ValueError: if the index file is not a Janggi index
+        """
+        index_path = index_path_for(games_path) if index_path is None else index_path
+        self._games_file = open(games_path, 'rb')
+        self._index_file = open(index_path, 'rb')
+        self._games = mmap.mmap(self._games_file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._index = mmap.mmap(self._index_file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self._game_count, self._position_count = INDEX_HEADER.unpack_from(self._index, 0)
+        if magic != INDEX_MAGIC:
+            self.close()
+            raise ValueError('not a Janggi index file')
+        self._positions_offset = INDEX_HEADER.size + self._game_count * GAME_ENTRY.size
+
+    def close(self):
+        """
+        Unmaps and closes the game and index files (views returned by get_moves have to be released first)
+        """
+        self._games.close()
+        self._index.close()
+        self._games_file.close()
+        self._index_file.close()
+
+    def __enter__(self):
+        """
+        Allows the archive to be used in a with statement so its files are closed afterwards
+        :return: the archive
+        """
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """
+        Closes the files at the end of a with statement
+        """
+        self.close()
+
+    def get_game_count(self):
+        """
+        Getter method for the number of games in the archive
+        :return: number of games
+        """
+        return self._game_count
+
+    def get_position_count(self):
+        """
+        Getter method for the number of (game, ply) positions in the index
+        :return: number of positions
+        """
+        return self._position_count
+
+    def get_result(self, game):
+        """
+        Looks up the result of a game in the index
+        :param game: game number (0 for the first game in the file)
+        :return: 'UNFINISHED', 'BLUE_WON', 'RED_WON' or 'DRAW'
+        """
+        return RESULTS[GAME_ENTRY.unpack_from(self._index, INDEX_HEADER.size + game * GAME_ENTRY.size)[1]]
+
+    def get_record(self, game):
+        """
+        Decodes one game of the archive
+        :param game: game number
+        :return: GameRecord object
+        """
+        offset = GAME_ENTRY.unpack_from(self._index, INDEX_HEADER.size + game * GAME_ENTRY.size)[0]
+        return decode_record(self._games, offset)[0]
+
+    def get_moves(self, game):
+        """
+        Gives the moves of a game as a view into the memory-mapped game file (nothing is copied)
+        :param game: game number
+        :return: memoryview of unsigned 16-bit encoded moves (a list on big-endian machines)
+        """
+        offset = GAME_ENTRY.unpack_from(self._index, INDEX_HEADER.size + game * GAME_ENTRY.size)[0]
+        _, _, moves_offset, count = decode_record_header(self._games, offset)
+        if sys.byteorder == 'big':
+            return list(struct.unpack_from('<%dH' % count, self._games, moves_offset))
+        return memoryview(self._games)[moves_offset:moves_offset + 2 * count].cast('H')
+
+    def get_hash_at(self, index):
+        """
+        Reads the hash of a position entry
+        :param index: entry number (entries are sorted by hash)
+        :return: 64-bit hash
+        """
+        return POSITION_ENTRY.unpack_from(self._index, self._positions_offset + index * POSITION_ENTRY.size)[0]
+
+    def find_position(self, position_hash):
+        """
+        Lists every place a position occurred in the archive
+        :param position_hash: Zobrist hash of the position (from get_position_hash/get_hash), or a JanggiGame or
+                              Position object
+        :return: list of (game number, ply) tuples
+        """
+        if not isinstance(position_hash, int):
+            position_hash = position_hash.get_hash() if isinstance(position_hash, Position) else \
+                position_hash.get_position_hash()
+
+        # binary search for the first entry with the hash
+        low, high = 0, self._position_count
+        while low < high:
+            middle = (low + high) // 2
+            if self.get_hash_at(middle) < position_hash:
+                low = middle + 1
+            else:
+                high = middle
+
+        occurrences = []
+        offset = self._positions_offset + low * POSITION_ENTRY.size
+        for _ in range(low, self._position_count):
+            entry_hash, game, ply = POSITION_ENTRY.unpack_from(self._index, offset)
+            if entry_hash != position_hash:
+                break
+            occurrences.append((game, ply))
+            offset += POSITION_ENTRY.size
+        return occurrences
+
+    def get_position_statistics(self, position_hash):
+        """
+        Counts the games that reached a position, by result (a game that reached the position more than once counts
+        once)
+        :param position_hash: Zobrist hash of the position, or a JanggiGame or Position object
+        :return: dictionary with the number of 'games' and the number of them with each result
+        """
+        games = sorted(set(game for game, _ in self.find_position(position_hash)))
+        statistics = dict.fromkeys(RESULTS, 0)
+        statistics['games'] = len(games)
+        for game in games:
+            statistics[self.get_result(game)] += 1
+        return statistics
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Janggi game archive')
+    parser.add_argument('command', choices=['build', 'query'], help='build the index or look up a position')
+    parser.add_argument('games_path', help='game file written by JanggiRecord.write_games')
+    parser.add_argument('moves', nargs='*', help='moves from the starting setup to the position to look up (c7-c6)')
+    arguments = parser.parse_args()
+
+    if arguments.command == 'build':
+        print('indexed %d games, %d positions' % build_index(arguments.games_path))
+    else:
+        query_position = Position()
+        for text in arguments.moves:
+            from_location, to_location = text.split('-')
+            query_position.push_move(encode_move(SQUARE_INDEX[from_location], SQUARE_INDEX[to_location]))
+        with GameArchive(arguments.games_path) as archive:
+            print(archive.get_position_statistics(query_position))
@@ -0,0 +1,482 @@
+# Description: Vectorized evaluation of large batches of positions with NumPy (an optional dependency: the rest of
+#              the program runs without it). Positions are given as an (N, 10, 9) integer array of piece codes
+#              (JanggiPosition.piece_code, 0 for empty squares; board[row - 1][column - 1]), and material, mobility,
+#              attack maps and in-check flags are worked out for all of them at once.
+#
+#              The boards are packed into bitmasks, a 9-bit mask per row (bit c for column c + 1) in a 12-bit lane
+#              of a 64-bit word, five rows to a word and two words to a board, so bitwise operations and square
+#              counts handle five rows at a time. Moves are worked out for all pieces on all boards at once by
+#              shifting the masks: moves that pass over at most two squares are grouped by displacement and squares
+#              in between (taken from the JanggiPosition move tables), and Chariots and Cannons slide along the rows
+#              and columns until the first occupied square. Mobility adds up the squares reached by each group of
+#              moves, which never overlap.
+#
+#              python JanggiBatch.py [--positions 20000] [--seed 1]     (checks against the rules and times both)
+
+import argparse
+import random
+import time
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from JanggiAI import PIECE_VALUES
+from JanggiPosition import (BLUE, RED, GENERAL, GUARD, HORSE, ELEPHANT, CHARIOT, CANNON, SOLDIER, RAYS, HORSE_MOVES,
+                            ELEPHANT_MOVES, PALACE_MOVES, SOLDIER_MOVES, SQUARE_NAMES, Position, piece_code)
+
+# positions evaluated at a time, to bound the size of the intermediate arrays
+BATCH_SIZE = 4096
+
+# 64-bit words of a board, rows in a word and bits in a row (the top 4 bits of a word are unused)
+BOARD_WORDS = 2
+WORD_ROWS = 5
+ROW_BITS = 12
+
+# (row step, column step) of the directions Chariots and Cannons slide along rows and columns
+LINE_DIRECTIONS = [(1, 0), (-1, 0), (0, 1), (0, -1)]
+
+
+def _squares_of(mask):
+    """
+    Lists the squares of a bitboard
+    :param mask: bitboard
+    :return: list of square indices
+    """
+    return [square for square in range(90) if mask >> square & 1]
+
+
+def _offset(origin, square):
+    """
+    Works out where a square is relative to another
+    :param origin: square index
+    :param square: square index
+    :return: (row step, column step) tuple
+    """
+    return square // 9 - origin // 9, square % 9 - origin % 9
+
+
+def _build_step_moves():
+    """
+    Lists the moves that pass over at most two squares, for every piece on every square: all moves of the Generals,
+    Guards, Horses, Elephants and Soldiers, and the palace diagonal moves of the Chariots and Cannons
+    :return: dictionary of (color, piece type) to a list indexed by square of lists of (target, tuple of squares in
+             between) tuples
+    """
+    step_moves = {}
+    for color in [BLUE, RED]:
+        for piece_type in range(7):
+            moves = []
+            for origin in range(90):
+                if piece_type == GENERAL or piece_type == GUARD:
+                    moves.append([(target, ()) for target in PALACE_MOVES[color][origin]])
+                elif piece_type == SOLDIER:
+                    moves.append([(target, ()) for target in SOLDIER_MOVES[color][origin]])
+                elif piece_type == HORSE or piece_type == ELEPHANT:
+                    table = HORSE_MOVES if piece_type == HORSE else ELEPHANT_MOVES
+                    moves.append([(target, tuple(_squares_of(legs))) for target, legs in table[origin]])
+                else:
+                    # the rays that leave both the row and the column of the origin are the palace diagonals
+                    moves.append([(target, tuple(ray[:index])) for ray in RAYS[origin]
+                                  if ray[0] // 9 != origin // 9 and ray[0] % 9 != origin % 9
+                                  for index, target in enumerate(ray)])
+            step_moves[(color, piece_type)] = moves
+    return step_moves
+
+
+def _build_step_groups():
+    """
+    Groups the step moves by displacement and squares in between, and by whether the piece is a Cannon, so that each
+    group can be worked out for every piece of the group on every board at once
+    :return: dictionary of (is a Cannon, (row step, column step), tuple of the (row step, column step) of the squares
+             in between) to a dictionary of piece type to a list (blue, red) of lists of the squares the
+             move can be made from
+    """
+    groups = {}
+    for (color, piece_type), square_moves in STEP_MOVES.items():
+        for origin, moves in enumerate(square_moves):
+            for target, between in moves:
+                # a Cannon moves along a palace diagonal only by jumping over the center
+                if piece_type == CANNON and len(between) != 1:
+                    continue
+                key = (piece_type == CANNON, _offset(origin, target),
+                       tuple(_offset(origin, square) for square in between))
+                groups.setdefault(key, {}).setdefault(piece_type, [[], []])[color].append(origin)
+    return groups
+
+
+STEP_MOVES = _build_step_moves()
+STEP_GROUPS = _build_step_groups()
+
+# NumPy tables, built on first use (see _tables)
+_TABLES = {}
+
+
+def _require_numpy():
+    """
+    Makes sure NumPy is available
+    :raises ImportError: if NumPy is not installed
+    """
+    if numpy is None:
+        raise ImportError('JanggiBatch needs NumPy (pip install numpy)')
+
+
+def _row_masks(squares):
+    """
+    Packs a set of squares into row bitmasks
+    :param squares: iterable of square indices
+    :return: (2, 1) uint64 array of the words of the board
+    """
+    words = [0] * BOARD_WORDS
+    for square in squares:
+        row, column = divmod(square, 9)
+        words[row // WORD_ROWS] |= 1 << (row % WORD_ROWS * ROW_BITS + column)
+    return numpy.array(words, dtype=numpy.uint64)[:, None]
+
+
+def _tables():
+    """
+    Getter method for the NumPy lookup tables, building them the first time
+    :return: dictionary of table name to array (or list of step move groups)
+    """
+    if _TABLES:
+        return _TABLES
+    tables = {'values': numpy.array(PIECE_VALUES, dtype=numpy.int64),
+              'board_mask': _row_masks(range(90)),
+              'step_groups': []}
+    for (is_cannon, offset, between), movers in sorted(STEP_GROUPS.items()):
+        tables['step_groups'].append((is_cannon, offset, between,
+                                      [(piece_type, numpy.stack([_row_masks(squares) for squares in origins]))
+                                       for piece_type, origins in sorted(movers.items())]))
+    _TABLES.update(tables)
+    return _TABLES
+
+
+class BatchEvaluation:
+    """
+    Represents the results of evaluating a batch of positions
+    """
+
+    __slots__ = ('_material', '_mobility', '_attack_maps', '_in_check')
+
+    def __init__(self, material, mobility, attack_maps, in_check):
+        """
+        Initializes the results
+        :param material: (N, 2) array of material (sum of JanggiAI.PIECE_VALUES) of blue and red
+        :param mobility: (N, 2) array of the number of moves blue and red could make, not checking whether they
+                         leave the General in check (as JanggiPosition.pseudo_legal_moves)
+        :param attack_maps: (N, 2, 10, 9) boolean array of the squares blue and red attack
+        :param in_check: (N, 2) boolean array of whether blue and red are in check
+        """
+        self._material = material
+        self._mobility = mobility
+        self._attack_maps = attack_maps
+        self._in_check = in_check
+
+    def get_material(self):
+        """
+        Getter method for the material of each color
+        :return: (N, 2) integer array, blue then red
+        """
+        return self._material
+
+    def get_mobility(self):
+        """
+        Getter method for the number of moves each color could make
+        :return: (N, 2) integer array, blue then red
+        """
+        return self._mobility
+
+    def get_attack_maps(self):
+        """
+        Getter method for the squares each color attacks: the squares its pieces could move to, or could capture on
+        if a piece of the other color stood there (its own pieces and, for Cannons, the Cannons it reaches included)
+        :return: (N, 2, 10, 9) boolean array, blue then red
+        """
+        return self._attack_maps
+
+    def get_in_check(self):
+        """
+        Getter method for whether each color is in check (as is_in_check)
+        :return: (N, 2) boolean array, blue then red
+        """
+        return self._in_check
+
+
+def _shift_bits(masks, bits):
+    """
+    Shifts words towards their high (positive bits) or low (negative bits) end
+    :param masks: uint64 array
+    :param bits: number of bits
+    :return: array of the same shape
+    """
+    if bits >= 64 or bits <= -64:
+        return numpy.zeros_like(masks)
+    if bits > 0:
+        return masks << numpy.uint64(bits)
+    if bits < 0:
+        return masks >> numpy.uint64(-bits)
+    return masks.copy()
+
+
+def _shift(masks, offset):
+    """
+    Moves the squares of boards, which have no squares in the unused bits of the words. Squares moved off the top or
+    bottom row are dropped, and squares moved off the sides are left in the unused bits at the end of a row for the
+    caller to mask off (for moves of more than 3 columns, some of them wrap around into the next row)
+    :param masks: (..., 2, n) uint64 array of boards
+    :param offset: (row step, column step) tuple
+    :return: array of the same shape
+    """
+    rows, columns = offset
+    distance = rows * ROW_BITS + columns
+    shifted = _shift_bits(masks, distance)
+    # rows that move into the other word skip its unused bits
+    if rows > 0:
+        shifted[..., 1, :] |= _shift_bits(masks[..., 0, :], distance - WORD_ROWS * ROW_BITS)
+    elif rows < 0:
+        shifted[..., 0, :] |= _shift_bits(masks[..., 1, :], distance + WORD_ROWS * ROW_BITS)
+    return shifted
+
+
+def _count_squares(masks):
+    """
+    Counts the squares of boards, word by word
+    :param masks: (..., 2, n) uint64 array of boards
+    :return: (..., 2, n) integer array
+    """
+    if hasattr(numpy, 'bitwise_count'):
+        return numpy.bitwise_count(masks)
+    # NumPy before 2.0: counts the bits of each byte
+    return numpy.unpackbits(masks[..., None].view(numpy.uint8), axis=-1).sum(axis=-1, dtype=numpy.uint8)
+
+
+def _slide(masks, empty, offset):
+    """
+    Slides pieces along a direction as far as they go, doubling the distance covered at each step
+    :param masks: (..., 2, n) uint64 array of boards of the pieces
+    :param empty: (2, n) uint64 array of boards of the empty squares
+    :param offset: (row step, column step) of the direction
+    :return: boards of the squares reached, up to and including the first occupied square on the way
+    """
+    rows, columns = offset
+    # the pieces and the empty squares they reach, and the empty squares with a run of empty squares behind them (a
+    # run never goes on past the unused bits at the end of a row, so squares wrapped around into the next row stop)
+    reached = masks
+    passable = empty
+    distances = (1, 2, 4) if rows == 0 else (1, 2, 4, 8)
+    for distance in distances:
+        reached = reached | passable & _shift(reached, (rows * distance, columns * distance))
+        if distance != distances[-1]:
+            passable = passable & _shift(passable, (rows * distance, columns * distance))
+    return _shift(reached, offset) & _tables()['board_mask']
+
+
+def _evaluate_chunk(squares):
+    """
+    Evaluates a chunk of positions
+    :param squares: (n, 90) int8 array of piece codes
+    :return: (material, mobility, attack maps, in check) arrays, attack maps of shape (n, 2, 10, 9)
+    """
+    tables = _tables()
+    count = len(squares)
+    # boards of the squares holding each piece, indexed [color, piece type, word, position]: with the rows padded to
+    # 12 columns and the words to 64 bits, the flags of the squares pack into the words
+    padded = numpy.zeros((count, BOARD_WORDS, 64), dtype=numpy.int8)
+    padded[:, :, :WORD_ROWS * ROW_BITS].reshape(count, BOARD_WORDS, WORD_ROWS, ROW_BITS)[..., :9] = squares.reshape(
+        count, BOARD_WORDS, WORD_ROWS, 9)
+    pieces = numpy.empty((2, 7, BOARD_WORDS, count), dtype=numpy.uint64)
+    for color in [BLUE, RED]:
+        for piece_type in range(7):
+            flags = numpy.packbits(padded == piece_code(color, piece_type), bitorder='little')
+            pieces[color, piece_type] = flags.view('<u8').reshape(count, BOARD_WORDS).T
+    own = numpy.bitwise_or.reduce(pieces, axis=1)
+    occupied = own[BLUE] | own[RED]
+    empty = ~occupied & tables['board_mask']
+    cannons = pieces[BLUE, CANNON] | pieces[RED, CANNON]
+    # squares a piece can move to if it reaches them: not its own pieces, and for a Cannon no Cannon either
+    capturable = ~own & tables['board_mask']
+    cannon_capturable = ~(own | cannons) & tables['board_mask']
+    # pieces a Cannon can jump over
+    screens = occupied & ~cannons
+
+    material = (_count_squares(pieces).sum(axis=-2, dtype=numpy.int64) * tables['values'][:, None]).sum(axis=1)
+    # moves counted word by word, added up at the end
+    mobility = numpy.zeros((2, BOARD_WORDS, count), dtype=numpy.uint16)
+    attacks = numpy.zeros((2, BOARD_WORDS, count), dtype=numpy.uint64)
+
+    # the origins of a group keep its moves on the board, so its targets need no masking (but for copies of squares
+    # moved into the other word, left in the unused bits, which the capturable squares and attack maps leave out)
+    empty_squares = {}
+    for is_cannon, offset, between, movers in tables['step_groups']:
+        moving = None
+        for piece_type, origins in movers:
+            moving = pieces[:, piece_type] & origins if moving is None else moving | pieces[:, piece_type] & origins
+        if is_cannon:
+            # jumps the palace center over a piece that is not a Cannon
+            moving &= _shift(screens, (-between[0][0], -between[0][1]))
+        else:
+            for row_step, column_step in between:
+                if (row_step, column_step) not in empty_squares:
+                    # the squares with an empty square at this offset from them
+                    empty_squares[(row_step, column_step)] = _shift(empty, (-row_step, -column_step))
+                moving &= empty_squares[(row_step, column_step)]
+        targets = _shift(moving, offset)
+        mobility += _count_squares(targets & (cannon_capturable if is_cannon else capturable))
+        attacks |= targets
+
+    for offset in LINE_DIRECTIONS:
+        reached = _slide(pieces[:, CHARIOT:CANNON + 1], empty, offset)
+        # a Cannon jumps over the first piece on its way, unless that piece is a Cannon
+        jumps = _slide(reached[:, 1] & screens, empty, offset)
+        mobility += _count_squares(reached[:, 0] & capturable)
+        mobility += _count_squares(jumps & cannon_capturable)
+        attacks |= reached[:, 0] | jumps
+
+    in_check = (pieces[:, GENERAL] & attacks[::-1]).any(axis=-2)
+    attack_words = numpy.ascontiguousarray(attacks.transpose(2, 0, 1), dtype='<u8')
+    attack_flags = numpy.unpackbits(attack_words.view(numpy.uint8), bitorder='little').reshape(
+        count, 2, BOARD_WORDS, 64)[..., :WORD_ROWS * ROW_BITS]
+    attack_maps = attack_flags.reshape(count, 2, 10, ROW_BITS)[..., :9]
+    mobility = mobility.sum(axis=-2, dtype=numpy.int64)
+    return material.T, mobility.T, attack_maps.view(bool), in_check.T
+
+
+def evaluate_batch(boards, batch_size=BATCH_SIZE):
+    """
+    Works out the material, mobility, attack maps and in-check flags of many positions at once
+    :param boards: (N, 10, 9) integer array of piece codes (0 for empty squares), or a list of such boards
+    :param batch_size: positions evaluated at a time (bounds the memory used)
+    :return: BatchEvaluation object
+    :raises ImportError: if NumPy is not installed
+    """
+    _require_numpy()
+    squares = numpy.asarray(boards).reshape(-1, 90)
+    results = [_evaluate_chunk(squares[start:start + batch_size].astype(numpy.int8))
+               for start in range(0, len(squares), batch_size)]
+    if len(results) == 0:
+        results = [_evaluate_chunk(squares.astype(numpy.int8))]
+    material, mobility, attack_maps, in_check = [numpy.concatenate(parts) for parts in zip(*results)]
+    return BatchEvaluation(material, mobility, attack_maps, in_check)
+
+
+def boards_from_games(games):
+    """
+    Stacks the boards of games or positions into the array taken by evaluate_batch
+    :param games: iterable of JanggiGame or Position objects
+    :return: (N, 10, 9) int8 array of piece codes
+    :raises ImportError: if NumPy is not installed
+    """
+    _require_numpy()
+    data = bytearray()
+    for game in games:
+        data += (game if isinstance(game, Position) else Position.from_game(game)).get_squares()
+    return numpy.frombuffer(bytes(data), dtype=numpy.int8).reshape(-1, 10, 9)
+
+
+def board_to_position(board, current_player='blue'):
+    """
+    Sets up a Position from one board of a batch
+    :param board: (10, 9) array of piece codes
+    :param current_player: 'blue' or 'red'
+    :return: Position object
+    """
+    position = Position([], current_player)
+    for square, code in enumerate(int(code) for row in board for code in row):
+        if code:
+            position.put_piece(square, (code - 1) // 7, (code - 1) % 7)
+    return position
+
+
+def evaluate_position(position):
+    """
+    Works out the same results as evaluate_batch for one position, with the Position move rules (the per-object path
+    the batch results are checked and timed against)
+    :param position: Position object
+    :return: (material, mobility, attack maps, in check) tuple of pairs (blue, red); attack maps as 90-element lists
+    """
+    material = [0, 0]
+    mobility = [0, 0]
+    attack_maps = ([False] * 90, [False] * 90)
+    for square, code in enumerate(position.get_squares()):
+        if code:
+            color = (code - 1) // 7
+            material[color] += PIECE_VALUES[(code - 1) % 7]
+            mobility[color] += len(position.piece_destinations(square))
+            attack_map = attack_maps[color]
+            for target in position.piece_destinations(square, True):
+                attack_map[target] = True
+    in_check = tuple(position.general_square(color) >= 0 and attack_maps[1 - color][position.general_square(color)]
+                     for color in [BLUE, RED])
+    return tuple(material), tuple(mobility), attack_maps, in_check
+
+
+def verify_batch(boards, evaluation=None):
+    """
+    Checks batch results against the Position move rules and is_in_check, position by position
+    :param boards: (N, 10, 9) array of piece codes
+    :param evaluation: BatchEvaluation of the boards (worked out if not given)
+    :return: list of indices of the positions whose results differ
+    """
+    evaluation = evaluate_batch(boards) if evaluation is None else evaluation
+    mismatches = []
+    for index, board in enumerate(boards):
+        position = board_to_position(board)
+        material, mobility, attack_maps, in_check = evaluate_position(position)
+        in_check = tuple(position.general_square(color) >= 0 and position.is_in_check(player)
+                         for color, player in [(BLUE, 'blue'), (RED, 'red')])
+        if (tuple(evaluation.get_material()[index]) != material or
+                tuple(evaluation.get_mobility()[index]) != mobility or
+                tuple(evaluation.get_in_check()[index]) != in_check or
+                any(list(evaluation.get_attack_maps()[index, color].reshape(90)) != attack_maps[color]
+                    for color in [BLUE, RED])):
+            mismatches.append(index)
+    return mismatches
+
+
+def random_positions(count, seed=None, max_moves=120):
+    """
+    Plays random games to collect positions to evaluate
+    :param count: number of positions
+    :param seed: random seed
+    :param max_moves: longest game to play before starting a new one
+    :return: list of Position objects
+    """
+    rng = random.Random(seed)
+    positions = []
+    position = Position()
+    while len(positions) < count:
+        moves = position.generate_legal_moves()
+        if position.get_game_state() != 'UNFINISHED' or len(moves) == 0 or \
+                len(position.get_move_history()) >= max_moves:
+            position.reset()
+            continue
+        move = moves[rng.randrange(len(moves))]
+        position.make_move(SQUARE_NAMES[move >> 7], SQUARE_NAMES[move & 127])
+        positions.append(position.copy())
+    return positions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Vectorized batch evaluation of Janggi positions')
+    parser.add_argument('--positions', type=int, default=20000, help='number of random positions to evaluate')
+    parser.add_argument('--seed', type=int, default=1, help='random seed')
+    arguments = parser.parse_args()
+
+    batch_boards = boards_from_games(random_positions(arguments.positions, arguments.seed))
+    # builds the lookup tables, which is done once
+    evaluate_batch(batch_boards[:1])
+    start_time = time.perf_counter()
+    batch_evaluation = evaluate_batch(batch_boards)
+    batch_time = time.perf_counter() - start_time
+
+    sample = batch_boards[:min(len(batch_boards), 2000)]
+    start_time = time.perf_counter()
+    for sample_board in sample:
+        evaluate_position(board_to_position(sample_board))
+    object_time = (time.perf_counter() - start_time) / len(sample) * len(batch_boards)
+
+    failures = verify_batch(batch_boards, batch_evaluation)
+    print('%d positions: batch %.3fs, one at a time %.3fs (%.0fx), %d mismatches' %
+          (len(batch_boards), batch_time, object_time, object_time / batch_time, len(failures)))
@@ -0,0 +1,206 @@
+# Description: Perft benchmark and move generation regression check. Counts the leaf nodes of the move tree from the
+#              starting setup and a few later positions, reports nodes/second, and compares the counts with stored
+#              reference values so that any speed-up to the move rules can be shown to keep the same results.
+#              Also times move validation with the MOVE_GEOMETRY lookup against working out each move's geometry from
+#              the piece's movement rules on every call.
+#
+#              python JanggiBenchmark.py [--depth 4] [--engine position|game] [--verify]
+#              python JanggiBenchmark.py --geometry [--iterations 20]
+
+import argparse
+import time
+
+from JanggiGame import JanggiGame
+from JanggiPosition import SQUARE_INDEX, SQUARE_NAMES, Position
+
+# positions to count from, each given as the moves played from the starting setup
+BENCHMARK_POSITIONS = [
+    ('start', []),
+    ('opening', [('e9', 'd8'), ('i1', 'i2'), ('i10', 'i8'), ('i2', 'g2'), ('d10', 'e10'), ('e2', 'd2'), ('h10', 'g8'),
+                 ('f1', 'e1'), ('i8', 'i10'), ('g2', 'g3'), ('d8', 'd9'), ('c4', 'b4'), ('h8', 'f8'), ('g3', 'c3'),
+                 ('c7', 'd7'), ('c3', 'c10')]),
+    ('middlegame', [('i7', 'h7'), ('g4', 'h4'), ('c10', 'd8'), ('h3', 'h7'), ('i10', 'i4'), ('h4', 'i4'),
+                    ('g7', 'h7'), ('c4', 'c5'), ('a10', 'a9'), ('a4', 'b4'), ('h8', 'h1'), ('i1', 'h1'), ('d8', 'c6'),
+                    ('c1', 'd3'), ('a9', 'a10'), ('h1', 'h4'), ('b10', 'e8'), ('h4', 'h7'), ('c6', 'e5'), ('d1', 'e1'),
+                    ('e5', 'f7'), ('c5', 'c6'), ('f7', 'h8'), ('h7', 'h8'), ('e7', 'd7'), ('b3', 'b7'), ('b8', 'h8'),
+                    ('i4', 'h4'), ('a7', 'b7'), ('c6', 'c7')]),
+    ('palace', [('f10', 'f9'), ('e4', 'f4'), ('a7', 'a6'), ('i4', 'i5'), ('a10', 'a9'), ('f4', 'f5'), ('e9', 'f8'),
+                ('i1', 'i2'), ('h8', 'e8'), ('e2', 'd2'), ('f8', 'e9'), ('g1', 'e4'), ('f9', 'f10'), ('e4', 'c7'),
+                ('a9', 'b9'), ('i2', 'e2'), ('e8', 'e2'), ('f5', 'f6'), ('g7', 'g6'), ('f1', 'e2'), ('g6', 'g5'),
+                ('d1', 'e1'), ('b9', 'a9'), ('g4', 'g5'), ('a9', 'a10'), ('d2', 'd1'), ('a10', 'a7'), ('e2', 'f2'),
+                ('a7', 'c7'), ('a1', 'a2'), ('i10', 'i9'), ('a4', 'a5'), ('e9', 'e10'), ('e1', 'e2'), ('f10', 'f9'),
+                ('e2', 'e3'), ('a6', 'a5'), ('a2', 'a5'), ('c7', 'c4'), ('f6', 'f7'), ('c4', 'c1'), ('d1', 'e2'),
+                ('c1', 'c5'), ('a5', 'c5'), ('e7', 'f7'), ('c5', 'c10'), ('e10', 'f10'), ('i5', 'i6'), ('i9', 'i10'),
+                ('c10', 'b10')]),
+]
+
+# perft counts for depths 1-4 of each benchmark position (passes are not counted)
+REFERENCE_COUNTS = {
+    'start': [31, 961, 30506, 967906],
+    'opening': [26, 963, 26272, 1002694],
+    'middlegame': [40, 1360, 49585, 1649734],
+    'palace': [15, 407, 6778, 189785],
+}
+
+ENGINES = {'position': Position, 'game': JanggiGame}
+
+
+def build_position(moves, engine='position'):
+    """
+    Plays a list of moves from the starting setup
+    :param moves: list of (from_location, to_location) tuples
+    :param engine: 'position' for the bitboard Position or 'game' for JanggiGame
+    :return: Position or JanggiGame object
+    """
+    game = ENGINES[engine]()
+    for from_location, to_location in moves:
+        if not game.make_move(from_location, to_location):
+            raise ValueError('illegal move in benchmark position: ' + from_location + ' ' + to_location)
+    return game
+
+
+def run_benchmark(max_depth=4, engine='position', positions=None, report=print):
+    """
+    Runs perft on each benchmark position for every depth up to max_depth
+    :param max_depth: deepest perft depth to run
+    :param engine: 'position' for the bitboard Position or 'game' for JanggiGame
+    :param positions: list of (name, moves) tuples (BENCHMARK_POSITIONS if not given)
+    :param report: function called with a line of text for each result (None for no output)
+    :return: list of dictionaries with the name, depth, nodes, elapsed seconds, nodes/second and whether the count
+             matches the reference count (None if there is no reference count)
+    """
+    results = []
+    for name, moves in (BENCHMARK_POSITIONS if positions is None else positions):
+        game = build_position(moves, engine)
+        for depth in range(1, max_depth + 1):
+            start = time.perf_counter()
+            nodes = game.perft(depth)
+            elapsed = time.perf_counter() - start
+            reference = REFERENCE_COUNTS.get(name, [])
+            matches = reference[depth - 1] == nodes if depth <= len(reference) else None
+            result = {'name': name, 'depth': depth, 'nodes': nodes, 'elapsed': elapsed,
+                      'nodes_per_second': nodes / elapsed if elapsed > 0 else 0.0, 'matches_reference': matches}
+            results.append(result)
+            if report is not None:
+                report('%-12s depth %d %10d nodes %8.3fs %12.0f nodes/s %s' %
+                       (name, depth, nodes, elapsed, result['nodes_per_second'],
+                        {True: 'ok', False: 'MISMATCH', None: ''}[matches]))
+    return results
+
+
+def verify_perft(max_depth=3, engine='position'):
+    """
+    Checks the perft counts of every benchmark position against the reference counts
+    :param max_depth: deepest perft depth to check
+    :param engine: 'position' for the bitboard Position or 'game' for JanggiGame
+    :return: list of (name, depth, expected, actual) tuples for each count that doesn't match (empty if all match)
+    """
+    mismatches = []
+    for result in run_benchmark(max_depth, engine, report=None):
+        if result['matches_reference'] is False:
+            expected = REFERENCE_COUNTS[result['name']][result['depth'] - 1]
+            mismatches.append((result['name'], result['depth'], expected, result['nodes']))
+    return mismatches
+
+
+def valid_move_by_move_rules(game, from_location, to_location):
+    """
+    Checks a move the way JanggiGame.valid_move did before MOVE_GEOMETRY: the move's path is worked out from the
+    piece's movement rules on each call instead of looked up
+    :param game: JanggiGame object
+    :param from_location: location of the piece to move
+    :param to_location: location to move the piece to
+    :return: True - if the move is valid (not considering whether it leaves the general in check)
+             False - if it is not
+    """
+    player = game.get_player_obj(game.get_current_player())
+    if not game.moving_own_piece(from_location, player) or to_location not in SQUARE_INDEX:
+        return False
+    if game.skipping_turn(from_location, to_location):
+        return True
+    if game.capturing_own_piece(to_location, player):
+        return False
+    piece = game.get_piece_at(from_location)
+    move_path = piece.get_move_path(game.algebraic_to_cartesian(from_location),
+                                    game.algebraic_to_cartesian(to_location))
+    return move_path is not None and not game.move_is_blocked(piece, move_path) and \
+        not game.cannon_capturing_cannon(piece, to_location)
+
+
+def candidate_moves(game):
+    """
+    Lists every move of a piece of the player to move to a location not holding one of the player's pieces (the
+    moves that get as far as the geometry test of valid_move)
+    :param game: JanggiGame object
+    :return: list of (from_location, to_location) tuples
+    """
+    player = game.get_player_obj(game.get_current_player())
+    return [(piece.get_location(), to_location) for piece in player.get_pieces()
+            if piece.get_location() != 'CAPTURED' for to_location in SQUARE_NAMES
+            if not game.capturing_own_piece(to_location, player)]
+
+
+def run_geometry_benchmark(iterations=20, positions=None, report=print):
+    """
+    Times valid_move (a MOVE_GEOMETRY lookup and an occupancy test per move) against valid_move_by_move_rules on every
+    candidate move of the player to move in each position, along with validate_moves on the same moves
+    :param iterations: number of times to check the moves per position
+    :param positions: list of (name, moves) tuples (BENCHMARK_POSITIONS if not given)
+    :param report: function called with a line of text for each result (None for no output)
+    :return: list of dictionaries with the name, the number of candidate moves, the seconds per move of each check
+             and the speedup of valid_move over valid_move_by_move_rules
+    """
+    results = []
+    for name, moves in (BENCHMARK_POSITIONS if positions is None else positions):
+        game = build_position(moves, 'game')
+        candidates = candidate_moves(game)
+
+        start = time.perf_counter()
+        for _ in range(iterations):
+            valid = [game.valid_move(from_location, to_location) for from_location, to_location in candidates]
+        table_elapsed = (time.perf_counter() - start) / iterations / len(candidates)
+
+        start = time.perf_counter()
+        for _ in range(iterations):
+            rules_valid = [valid_move_by_move_rules(game, from_location, to_location)
+                           for from_location, to_location in candidates]
+        rules_elapsed = (time.perf_counter() - start) / iterations / len(candidates)
+
+        start = time.perf_counter()
+        for _ in range(iterations):
+            game.validate_moves(candidates)
+        bulk_elapsed = (time.perf_counter() - start) / iterations / len(candidates)
+
+        if valid != rules_valid:
+            raise AssertionError('move validation disagrees in benchmark position ' + name)
+        result = {'name': name, 'moves': len(candidates), 'table_elapsed': table_elapsed,
+                  'rules_elapsed': rules_elapsed, 'bulk_elapsed': bulk_elapsed,
+                  'speedup': rules_elapsed / table_elapsed if table_elapsed > 0 else 0.0}
+        results.append(result)
+        if report is not None:
+            report('%-12s %5d moves  valid_move %6.2fus  per-call geometry %6.2fus  speedup %4.1fx  '
+                   'validate_moves %6.2fus' % (name, len(candidates), table_elapsed * 1e6, rules_elapsed * 1e6,
+                                               result['speedup'], bulk_elapsed * 1e6))
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Janggi perft benchmark')
+    parser.add_argument('--depth', type=int, default=4, help='deepest perft depth to run')
+    parser.add_argument('--engine', choices=sorted(ENGINES), default='position', help='rules engine to benchmark')
+    parser.add_argument('--verify', action='store_true', help='only check the counts against the reference counts')
+    parser.add_argument('--geometry', action='store_true', help='time move validation instead of perft')
+    parser.add_argument('--iterations', type=int, default=20, help='checks per position for --geometry')
+    arguments = parser.parse_args()
+
+    if arguments.geometry:
+        run_geometry_benchmark(arguments.iterations)
+        raise SystemExit(0)
+
+    if arguments.verify:
+        failures = verify_perft(arguments.depth, arguments.engine)
+        for failure in failures:
+            print('%s depth %d: expected %d, got %d' % failure)
+        print('perft counts match' if len(failures) == 0 else 'perft counts DO NOT match')
+        raise SystemExit(1 if failures else 0)
+    run_benchmark(arguments.depth, arguments.engine)
@@ -0,0 +1,237 @@
+# Description: Opening book mined from recorded games. Every position reached in the first plies of the games is
+#              keyed by its Zobrist hash, with the moves played from it, how often each was played and how the games
+#              ended. Games may start from any of the four Horse/Elephant arrangements (recorded with their start
+#              position, see JanggiRecord); their positions hash differently, so one book covers all of them.
+#
+#              Book file: a header (BOOK_HEADER: magic, number of entries), then one BOOK_ENTRY per (position, move):
+#              Zobrist hash, encoded move, games played, blue wins, red wins, sorted by hash and then by games played
+#              (most first). Games without a winner count as draws.
+#
+#              python JanggiBook.py build GAMES_FILE BOOK_FILE [--max-ply 20] [--min-games 2]
+#              python JanggiBook.py query BOOK_FILE [MOVE ...]        (moves as from-to, e.g. c7-c6)
+
+import argparse
+import random
+import struct
+
+from JanggiPosition import SQUARE_INDEX, SQUARE_NAMES, BLUE, Position, encode_move
+from JanggiRecord import decode_position, read_games
+
+BOOK_MAGIC = b'JGB\x01'
+BOOK_HEADER = struct.Struct('<4sI')
+BOOK_ENTRY = struct.Struct('<QHIII')
+
+# book entry fields
+MOVE = 0
+GAMES = 1
+BLUE_WINS = 2
+RED_WINS = 3
+
+
+class OpeningBook:
+    """
+    Represents an opening book: for each position hash, the moves played from the position with their statistics.
+    Lookups are one dictionary access, so a book move costs microseconds.
+    """
+
+    __slots__ = ('_entries',)
+
+    def __init__(self, entries=None):
+        """
+        Initializes the book
+        :param entries: dictionary of position hash to a list of [move, games, blue wins, red wins] lists, sorted by
+                        games played (empty if not given)
+        """
+        self._entries = {} if entries is None else entries
+
+    def get_position_count(self):
+        """
+        Getter method for the number of positions in the book
+        :return: number of positions
+        """
+        return len(self._entries)
+
+    def get_entry_count(self):
+        """
+        Getter method for the number of (position, move) entries in the book
+        :return: number of entries
+        """
+        return sum(len(moves) for moves in self._entries.values())
+
+    def get_moves(self, position_hash):
+        """
+        Looks up the moves played from a position
+        :param position_hash: Zobrist hash of the position (from get_position_hash/get_hash)
+        :return: list of [move, games, blue wins, red wins] lists, most played first (empty if the position is not in
+                 the book)
+        """
+        return self._entries.get(position_hash, [])
+
+    def get_candidates(self, position_hash):
+        """
+        Looks up the moves played from a position in algebraic notation, with their statistics
+        :param position_hash: Zobrist hash of the position, or a JanggiGame or Position object
+        :return: list of dictionaries with 'move' ((from_location, to_location) tuple), 'games', 'blue_wins',
+                 'red_wins' and 'draws', most played first
+        """
+        if not isinstance(position_hash, int):
+            position_hash = position_hash.get_hash() if isinstance(position_hash, Position) else \
+                position_hash.get_position_hash()
+        return [{'move': (SQUARE_NAMES[move >> 7], SQUARE_NAMES[move & 127]), 'games': games,
+                 'blue_wins': blue_wins, 'red_wins': red_wins, 'draws': games - blue_wins - red_wins}
+                for move, games, blue_wins, red_wins in self.get_moves(position_hash)]
+
+    def choose_move(self, position_hash, side_to_move, rng=None, best=False):
+        """
+        Picks a book move for a position
+        :param position_hash: Zobrist hash of the position
+        :param side_to_move: BLUE or RED, to score the moves from the mover's side
+        :param rng: random.Random object to pick with (the random module if not given)
+        :param best: True to pick the move with the best score (wins plus half the draws, per game) instead of
+                     picking at random weighted by how often each move was played
+        :return: encoded move, or None if the position is not in the book
+        """
+        moves = self._entries.get(position_hash)
+        if moves is None:
+            return None
+        if best:
+            wins, losses = (BLUE_WINS, RED_WINS) if side_to_move == BLUE else (RED_WINS, BLUE_WINS)
+            # (wins + draws / 2) / games ranks moves the same as (wins - losses) / games; ties go to the most played
+            return max(moves, key=lambda entry: ((entry[wins] - entry[losses]) / entry[GAMES], entry[GAMES]))[MOVE]
+        if len(moves) == 1:
+            return moves[0][MOVE]
+        return (rng or random).choices(moves, [entry[GAMES] for entry in moves])[0][MOVE]
+
+    def add_game(self, record, max_ply=20, position=None):
+        """
+        Adds the opening of a recorded game to the book
+        :param record: GameRecord object
+        :param max_ply: number of moves from the start of the game to add
+        :param position: Position object to replay on (reused between games; a new one if not given)
+        """
+        position = Position() if position is None else position
+        if record.get_start_position() is None:
+            position.reset()
+        else:
+            pieces, current_player, _, _ = decode_position(record.get_start_position())
+            position.reset(pieces, current_player)
+        result = record.get_result()
+        blue_win = 1 if result == 'BLUE_WON' else 0
+        red_win = 1 if result == 'RED_WON' else 0
+
+        entries = self._entries
+        for move in record.get_moves()[:max_ply]:
+            # a pass is not worth storing, but the position after it is
+            if move >> 7 != move & 127:
+                moves = entries.setdefault(position.get_hash(), [])
+                for entry in moves:
+                    if entry[MOVE] == move:
+                        entry[GAMES] += 1
+                        entry[BLUE_WINS] += blue_win
+                        entry[RED_WINS] += red_win
+                        break
+                else:
+                    moves.append([move, 1, blue_win, red_win])
+            position.push_move(move)
+
+    def prune(self, min_games):
+        """
+        Drops moves played in fewer than min_games games (and positions left with no moves), then sorts the moves of
+        each position by games played
+        :param min_games: fewest games a move has to have been played in to stay in the book
+        """
+        for position_hash in list(self._entries):
+            moves = [entry for entry in self._entries[position_hash] if entry[GAMES] >= min_games]
+            if len(moves) == 0:
+                del self._entries[position_hash]
+            else:
+                moves.sort(key=lambda entry: (-entry[GAMES], entry[MOVE]))
+                self._entries[position_hash] = moves
+
+    def save(self, file):
+        """
+        Writes the book to a binary file
+        :param file: binary file object open for writing
+        :return: number of entries written
+        """
+        count = self.get_entry_count()
+        file.write(BOOK_HEADER.pack(BOOK_MAGIC, count))
+        buffer = bytearray()
+        for position_hash in sorted(self._entries):
+            for move, games, blue_wins, red_wins in self._entries[position_hash]:
+                buffer += BOOK_ENTRY.pack(position_hash, move, games, blue_wins, red_wins)
+            if len(buffer) >= 1 << 20:
+                file.write(buffer)
+                buffer.clear()
+        file.write(buffer)
+        return count
+
+    @classmethod
+    def load(cls, file):
+        """
+        Reads a book written by save
+        :param file: binary file object open for reading
+        :return: OpeningBook object
+        :raises ValueError: if the file is not a book file or is cut off
+        """
+        magic, count = BOOK_HEADER.unpack(file.read(BOOK_HEADER.size))
+        if magic != BOOK_MAGIC:
+            raise ValueError('not a Janggi book file')
+        data = file.read(count * BOOK_ENTRY.size)
+        if len(data) != count * BOOK_ENTRY.size:
+            raise ValueError('book file is cut off')
+        entries = {}
+        for position_hash, move, games, blue_wins, red_wins in BOOK_ENTRY.iter_unpack(data):
+            entries.setdefault(position_hash, []).append([move, games, blue_wins, red_wins])
+        return cls(entries)
+
+
+def build_book(records, max_ply=20, min_games=1):
+    """
+    Mines the openings of recorded games into a book
+    :param records: iterable of GameRecord objects (for example read_games on a game file)
+    :param max_ply: number of moves from the start of each game to add
+    :param min_games: fewest games a move has to have been played in to be kept
+    :return: OpeningBook object
+    """
+    book = OpeningBook()
+    position = Position()
+    for record in records:
+        book.add_game(record, max_ply, position)
+    book.prune(min_games)
+    return book
+
+
+def load_book(path):
+    """
+    Reads a book file
+    :param path: path of a file written by OpeningBook.save
+    :return: OpeningBook object
+    """
+    with open(path, 'rb') as file:
+        return OpeningBook.load(file)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Janggi opening book')
+    parser.add_argument('command', choices=['build', 'query'], help='build a book or look up a position')
+    parser.add_argument('paths', nargs='+', help='GAMES_FILE BOOK_FILE to build, BOOK_FILE [MOVE ...] to query')
+    parser.add_argument('--max-ply', type=int, default=20, help='moves from the start of each game to add')
+    parser.add_argument('--min-games', type=int, default=2, help='fewest games a move has to have been played in')
+    arguments = parser.parse_args()
+
+    if arguments.command == 'build':
+        with open(arguments.paths[0], 'rb') as games_file:
+            opening_book = build_book(read_games(games_file), arguments.max_ply, arguments.min_games)
+        with open(arguments.paths[1], 'wb') as book_file:
+            entry_count = opening_book.save(book_file)
+        print('%d positions, %d moves' % (opening_book.get_position_count(), entry_count))
+    else:
+        opening_book = load_book(arguments.paths[0])
+        query_position = Position()
+        for text in arguments.paths[1:]:
+            from_location, to_location = text.split('-')
+            query_position.push_move(encode_move(SQUARE_INDEX[from_location], SQUARE_INDEX[to_location]))
+        for candidate in opening_book.get_candidates(query_position):
+            print('%s-%s  games %d  blue %d  red %d  draws %d' % (candidate['move'] + (
+                candidate['games'], candidate['blue_wins'], candidate['red_wins'], candidate['draws'])))
@@ -2,6 +2,111 @@
 # Date: 3/11/21
 # Description: Defines a 2-player game of Janggi with an interactive make_move method
 
+from JanggiPosition import (COLORS, PIECE_TYPES, SQUARE_INDEX, SQUARE_NAMES, ZOBRIST_PIECE_KEYS, ZOBRIST_RED_TO_MOVE,
+                            ARRANGEMENTS, DEFAULT_ARRANGEMENT, HORSE, ELEPHANT, piece_code, RAYS, HORSE_MOVES,
+                            ELEPHANT_MOVES, PALACE_MOVES, SOLDIER_MOVES, HORSE_ATTACKERS, ELEPHANT_ATTACKERS,
+                            SOLDIER_ATTACKERS, starting_pieces)
+
+# JanggiGame works with square indices (0-89, see JanggiPosition) internally.
+# Conversion tables for the algebraic and cartesian locations used by the public methods:
+SQUARE_CARTESIAN = [[square // 9 + 1, square % 9 + 1] for square in range(90)]
+CARTESIAN_SQUARE = [[None] * 10] + [[None] + [(row - 1) * 9 + column - 1 for column in range(1, 10)]
+                                     for row in range(1, 11)]
+
+
+def _build_move_cache_tables():
+    """
+    Precomputes which squares matter to the moves of a piece and to the safety of a general, so the legal move cache
+    only has to recompute the moves a move could have changed
+    :return: (bitboard per square of the locations whose piece's moves can depend on that square,
+              bitboard per square of the squares that decide whether a general standing there is in check)
+    """
+    affected_by = [0] * 90
+    check_zones = [0] * 90
+    for square in range(90):
+        origin_bit = 1 << square
+        for ray in RAYS[square]:
+            for other in ray:
+                affected_by[other] |= origin_bit
+                check_zones[square] |= 1 << other
+        for table in [HORSE_MOVES, ELEPHANT_MOVES]:
+            for to_square, blocking_squares in table[square]:
+                affected_by[to_square] |= origin_bit
+                for other in range(90):
+                    if blocking_squares >> other & 1:
+                        affected_by[other] |= origin_bit
+                check_zones[to_square] |= origin_bit | blocking_squares
+        for color in range(2):
+            for to_square in PALACE_MOVES[color][square] + SOLDIER_MOVES[color][square]:
+                affected_by[to_square] |= origin_bit
+            for other in SOLDIER_ATTACKERS[color][square]:
+                check_zones[square] |= 1 << other
+    return affected_by, check_zones
+
+
+AFFECTED_BY, CHECK_ZONES = _build_move_cache_tables()
+
+# cartesian coordinates (row, column) of the palace locations, shared by all pieces
+RED_PALACE = frozenset([(1, 4), (3, 4), (2, 5), (1, 6), (3, 6), (2, 4), (1, 5), (3, 5), (2, 6)])
+BLUE_PALACE = frozenset([(8, 4), (10, 4), (9, 5), (8, 6), (10, 6), (9, 4), (8, 5), (10, 5), (9, 6)])
+PALACES = {1: RED_PALACE, -1: BLUE_PALACE}
+# palace locations of either palace, and the corners and centers of the palaces (where the diagonal lines meet)
+PALACE_LOCATIONS = RED_PALACE | BLUE_PALACE
+PALACE_DIAGONAL_POINTS = frozenset([(1, 4), (3, 4), (2, 5), (1, 6), (3, 6), (8, 4), (10, 4), (9, 5), (8, 6), (10, 6)])
+
+
+
+def _build_move_geometry():
+    """
+    Precomputes the geometry of every move the movement rules allow, from the JanggiPosition move tables (the same
+    tables JanggiPosition.Position and the legal move generation use, so there is one definition of the rules)
+    :return: dictionary of (piece type, color, from square, to square) to the bitboard of the squares the move passes
+             over (the squares that must be empty, or the squares to jump over for a Cannon)
+    """
+    geometry = {}
+    for color_index, color in enumerate(COLORS):
+        for square in range(90):
+            for ray in RAYS[square]:
+                passed_squares = 0
+                for to_square in ray:
+                    geometry[('CHARIOT', color, square, to_square)] = passed_squares
+                    geometry[('CANNON', color, square, to_square)] = passed_squares
+                    passed_squares |= 1 << to_square
+            for table, piece_type in [[HORSE_MOVES, 'HORSE'], [ELEPHANT_MOVES, 'ELEPHANT']]:
+                for to_square, blocking_squares in table[square]:
+                    geometry[(piece_type, color, square, to_square)] = blocking_squares
+            for to_square in PALACE_MOVES[color_index][square]:
+                geometry[('GENERAL', color, square, to_square)] = 0
+                geometry[('GUARD', color, square, to_square)] = 0
+            for to_square in SOLDIER_MOVES[color_index][square]:
+                geometry[('SOLDIER', color, square, to_square)] = 0
+    return geometry
+
+
+# geometry of each move: (piece type, color, from square, to square) -> bitboard of the squares the move passes over
+# (moves the movement rules don't allow are left out)
+MOVE_GEOMETRY = _build_move_geometry()
+
+
+def back_rank_locations(arrangement, row):
+    """
+    Works out where the Horses and Elephants of a player start
+    :param arrangement: key of JanggiPosition.ARRANGEMENTS (for example 'EHEH')
+    :param row: the player's back rank row ('1' for red, '10' for blue)
+    :return: (list of the two Horse locations, list of the two Elephant locations) in algebraic notation
+    """
+    locations = {HORSE: [], ELEPHANT: []}
+    for letter, piece_type in zip('bcgh', ARRANGEMENTS[arrangement]):
+        locations[piece_type].append(letter + row)
+    return locations[HORSE], locations[ELEPHANT]
+
+
+# reasons validate_moves gives for rejecting a move, in the order the conditions are checked
+REJECTION_REASONS = ['GAME_OVER', 'NOT_ON_BOARD', 'NOT_OWN_PIECE', 'CAPTURES_OWN_PIECE', 'AGAINST_MOVE_RULES',
+                     'BLOCKED', 'CANNON_CAPTURES_CANNON', 'LEAVES_GENERAL_IN_CHECK']
+
+LETTER_TO_NUMBER = {'a': 1, 'b': 2, 'c': 3, 'd': 4, 'e': 5, 'f': 6, 'g': 7, 'h': 8, 'i': 9}
+
 
 class Piece:
     """
@@ -9,6 +114,8 @@ class Piece:
     Each piece type class inherits from this Piece class
     """
 
+    __slots__ = ('_piece_color', '_piece_location', '_piece_nickname')
+
     def __init__(self, location, color, nickname):
         """
         Initializes the generic piece object
@@ -19,8 +126,6 @@ class Piece:
         self._piece_color = color
         self._piece_location = location
         self._piece_nickname = nickname
-        self._blue_palace = [[8, 4], [10, 4], [9, 5], [8, 6], [10, 6], [9, 4], [8, 5], [10, 5], [9, 6]]
-        self._red_palace = [[1, 4], [3, 4], [2, 5], [1, 6], [3, 6], [2, 4], [1, 5], [3, 5], [2, 6]]
 
     def get_color(self):
         """
@@ -56,13 +161,23 @@ class Piece:
         :param directionality: directionality of the pieces (1 for red and -1 for blue)
         :return: red palace locations - if the directionality is 1
                  blue palace locations - if the directionality is -1
+                 (frozen sets of (row, column) tuples)
         """
-        if directionality == 1:
-            return self._red_palace
-        elif directionality == -1:
-            return self._blue_palace
-        else:
-            return None
+        return PALACES.get(directionality)
+
+    def get_move_path(self, from_cartesian, to_cartesian):
+        """
+        Lists the locations a move passes over, without changing the piece (safe to call from several threads). The
+        game looks moves up in MOVE_GEOMETRY instead, which test_rules.py checks against this method.
+        :param from_cartesian: the initial location (converted from algebraic to cartesian coordinates)
+        :param to_cartesian: the to-location (converted from algebraic to cartesian coordinates)
+        :return: tuple of (row, column) locations between the from- and to-location (empty for pieces that can't be
+                 blocked) - if the piece is being moved according to its movement rules
+                 None - if the proposed move violates its movement rules
+        """
+        if self.meets_move_conditions(from_cartesian, to_cartesian):
+            return ()
+        return None
 
 
 class General(Piece):
@@ -71,6 +186,9 @@ class General(Piece):
     Inherits from the Piece class
     """
 
+    __slots__ = ('_directionality',)
+    _piece_type = 'GENERAL'
+
     def __init__(self, location, color, nickname, directionality):
         """
         Initializes the General object
@@ -79,7 +197,6 @@ class General(Piece):
         :param directionality: directionality of the General piece (determines which palace it belongs to)
         """
         super().__init__(location, color, nickname)
-        self._piece_type = 'GENERAL'
         self._directionality = directionality
 
     def get_piece_type(self):
@@ -105,12 +222,13 @@ class General(Piece):
                  False - if the proposed move violates its movement rules
         """
 
-        # Attempting to move guard out of the palace
-        if to_cartesian not in self.get_palace(self.get_directionality()):
+        # Attempting to move the General out of the palace (or from outside it, in a set up position)
+        palace = self.get_palace(self.get_directionality())
+        if (to_cartesian[0], to_cartesian[1]) not in palace or (from_cartesian[0], from_cartesian[1]) not in palace:
             return False
 
         # if in one of the corners or in the center position:
-        if from_cartesian in self.get_palace(self.get_directionality())[0:5]:
+        if (from_cartesian[0], from_cartesian[1]) in PALACE_DIAGONAL_POINTS:
             if not (abs(from_cartesian[0] - to_cartesian[0]) <= 1 and abs(from_cartesian[1] - to_cartesian[1]) <= 1):
                 return False
 
@@ -129,6 +247,9 @@ class Guard(Piece):
     Inherits from the Piece class
     """
 
+    __slots__ = ('_directionality',)
+    _piece_type = 'GUARD'
+
     def __init__(self, location, color, nickname, directionality):
         """
         Initializes the Guard object
@@ -137,7 +258,6 @@ class Guard(Piece):
         :param directionality: directionality of the Guard piece (determines which palace it belongs to)
         """
         super().__init__(location, color, nickname)
-        self._piece_type = 'GUARD'
         self._directionality = directionality
 
     def get_piece_type(self):
@@ -163,12 +283,13 @@ class Guard(Piece):
                  False - if the proposed move violates its movement rules
         """
 
-        # Trying to move guard out of the palace
-        if to_cartesian not in self.get_palace(self.get_directionality()):
+        # Trying to move guard out of the palace (or from outside it, in a set up position)
+        palace = self.get_palace(self.get_directionality())
+        if (to_cartesian[0], to_cartesian[1]) not in palace or (from_cartesian[0], from_cartesian[1]) not in palace:
             return False
 
         # if in one of the corners or in the center position:
-        if from_cartesian in self.get_palace(self.get_directionality())[0:5]:
+        if (from_cartesian[0], from_cartesian[1]) in PALACE_DIAGONAL_POINTS:
             if not (abs(from_cartesian[0] - to_cartesian[0]) <= 1 and abs(from_cartesian[1] - to_cartesian[1]) <= 1):
                 return False
 
@@ -187,6 +308,9 @@ class Horse(Piece):
     Inherits from the Piece class
     """
 
+    __slots__ = ()
+    _piece_type = 'HORSE'
+
     def __init__(self, location, color, nickname):
         """
         Initializes the Horse object
@@ -194,8 +318,6 @@ class Horse(Piece):
         :param color: color of the Horse piece
         """
         super().__init__(location, color, nickname)
-        self._piece_type = 'HORSE'
-        self._intermediate_locations = []
 
     def get_piece_type(self):
         """
@@ -204,26 +326,6 @@ class Horse(Piece):
         """
         return self._piece_type
 
-    def get_intermediate_locations(self):
-        """
-        Getter method for intermediate locations
-        :return: a list of coordinates of locations the Horse piece traverses during its move
-        """
-        return self._intermediate_locations
-
-    def add_intermediate_location(self, new_location):
-        """
-        Setter method for intermediate locations
-        :param new_location: intermediate location to add to the list of intermediate locations in a piece's path
-        """
-        self._intermediate_locations.append(new_location)
-
-    def clear_intermediate_locations(self):
-        """
-        Resets the list of intermediate locations
-        """
-        self._intermediate_locations.clear()
-
     def meets_move_conditions(self, from_cartesian, to_cartesian):
         """
         Move conditions for the Horse Piece
@@ -232,20 +334,28 @@ class Horse(Piece):
         :return: True - if the piece is being moved according to it's movement rules
                  False - if the proposed move violates its movement rules
         """
+        return self.get_move_path(from_cartesian, to_cartesian) is not None
 
+    def get_move_path(self, from_cartesian, to_cartesian):
+        """
+        Lists the locations the Horse passes over during a move, without changing the piece
+        :param from_cartesian: the initial location (converted from algebraic to cartesian coordinates)
+        :param to_cartesian: the to-location (converted from algebraic to cartesian coordinates)
+        :return: tuple of (row, column) locations that must be empty - if the piece is being moved according to its
+                 movement rules
+                 None - if the proposed move violates its movement rules
+        """
         # if the Horse is moving vertically
         if abs(from_cartesian[0] - to_cartesian[0]) == 2 and abs(from_cartesian[1] - to_cartesian[1]) == 1:
-            self.add_intermediate_location([int((from_cartesian[0]+to_cartesian[0]) / 2), from_cartesian[1]])
-            return True
+            return (int((from_cartesian[0]+to_cartesian[0]) / 2), from_cartesian[1]),
 
         # if the Horse is moving horizontally
         elif abs(from_cartesian[1] - to_cartesian[1]) == 2 and abs(from_cartesian[0] - to_cartesian[0]) == 1:
-            self.add_intermediate_location([from_cartesian[0], int((from_cartesian[1] + to_cartesian[1]) / 2)])
-            return True
+            return (from_cartesian[0], int((from_cartesian[1] + to_cartesian[1]) / 2)),
 
-        # Return False in all other conditions
+        # Return None in all other conditions
         else:
-            return False
+            return None
 
 
 class Elephant(Piece):
@@ -253,6 +363,10 @@ class Elephant(Piece):
     Represents the Elephant piece
     Inherits from the Piece class
     """
+
+    __slots__ = ()
+    _piece_type = 'ELEPHANT'
+
     def __init__(self, location, color, nickname):
         """
         Initializes the Elephant object
@@ -260,8 +374,6 @@ class Elephant(Piece):
         :param color: color of the Elephant piece
         """
         super().__init__(location, color, nickname)
-        self._piece_type = 'ELEPHANT'
-        self._intermediate_locations = []
 
     def get_piece_type(self):
         """
@@ -270,26 +382,6 @@ class Elephant(Piece):
         """
         return self._piece_type
 
-    def get_intermediate_locations(self):
-        """
-        Getter method for the intermediate locations
-        :return: list of locations within the path of the Elephant's move
-        """
-        return self._intermediate_locations
-
-    def add_intermediate_location(self, new_location):
-        """
-        Adds intermediate locations to a list of locations within the Elephant's movement path
-        :param new_location: location within the Elephant's movement path to add to the intermediate location list
-        """
-        self._intermediate_locations.append(new_location)
-
-    def clear_intermediate_locations(self):
-        """
-        Resets the list of intermediate locations
-        """
-        self._intermediate_locations.clear()
-
     def meets_move_conditions(self, from_cartesian, to_cartesian):
         """
         Move conditions for the Elephant Piece
@@ -298,29 +390,36 @@ class Elephant(Piece):
         :return: True - if the piece is being moved according to it's movement rules
                  False - if the proposed move violates its movement rules
         """
+        return self.get_move_path(from_cartesian, to_cartesian) is not None
+
+    def get_move_path(self, from_cartesian, to_cartesian):
+        """
+        Lists the locations the Elephant passes over during a move, without changing the piece
+        :param from_cartesian: the initial location (converted from algebraic to cartesian coordinates)
+        :param to_cartesian: the to-location (converted from algebraic to cartesian coordinates)
+        :return: tuple of (row, column) locations that must be empty - if the piece is being moved according to its
+                 movement rules
+                 None - if the proposed move violates its movement rules
+        """
         # if the Elephant is moving north
         if from_cartesian[0] - to_cartesian[0] == 3 and abs(from_cartesian[1] - to_cartesian[1]) == 2:
-            self.add_intermediate_location([from_cartesian[0] - 1, from_cartesian[1]])
-            self.add_intermediate_location([from_cartesian[0] - 2, int((from_cartesian[1] + to_cartesian[1]) / 2)])
-            return True
+            return ((from_cartesian[0] - 1, from_cartesian[1]),
+                    (from_cartesian[0] - 2, int((from_cartesian[1] + to_cartesian[1]) / 2)))
         # if the Elephant piece is moving south
         elif (from_cartesian[0] - to_cartesian[0]) == -3 and abs(from_cartesian[1] - to_cartesian[1]) == 2:
-            self.add_intermediate_location([from_cartesian[0] + 1, from_cartesian[1]])
-            self.add_intermediate_location([from_cartesian[0] + 2, int((from_cartesian[1] + to_cartesian[1]) / 2)])
-            return True
+            return ((from_cartesian[0] + 1, from_cartesian[1]),
+                    (from_cartesian[0] + 2, int((from_cartesian[1] + to_cartesian[1]) / 2)))
         # if the Elephant piece is moving West
         elif abs(from_cartesian[0] - to_cartesian[0]) == 2 and from_cartesian[1] - to_cartesian[1] == 3:
-            self.add_intermediate_location([from_cartesian[0], from_cartesian[1] - 1])
-            self.add_intermediate_location([int((from_cartesian[0] + to_cartesian[0]) / 2), from_cartesian[1] - 2])
-            return True
+            return ((from_cartesian[0], from_cartesian[1] - 1),
+                    (int((from_cartesian[0] + to_cartesian[0]) / 2), from_cartesian[1] - 2))
         # if the Elephant piece is moving East
         elif abs(from_cartesian[0] - to_cartesian[0]) == 2 and from_cartesian[1] - to_cartesian[1] == -3:
-            self.add_intermediate_location([from_cartesian[0], from_cartesian[1] + 1])
-            self.add_intermediate_location([int((from_cartesian[0] + to_cartesian[0]) / 2), from_cartesian[1] + 2])
-            return True
-        # return False for all other conditions
+            return ((from_cartesian[0], from_cartesian[1] + 1),
+                    (int((from_cartesian[0] + to_cartesian[0]) / 2), from_cartesian[1] + 2))
+        # return None for all other conditions
         else:
-            return False
+            return None
 
 
 class Chariot(Piece):
@@ -329,6 +428,9 @@ class Chariot(Piece):
     Inherits from the Piece class
     """
 
+    __slots__ = ()
+    _piece_type = 'CHARIOT'
+
     def __init__(self, location, color, nickname):
         """
         Initializes the Chariot object
@@ -336,8 +438,6 @@ class Chariot(Piece):
         :param color: color of the Chariot piece
         """
         super().__init__(location, color, nickname)
-        self._piece_type = 'CHARIOT'
-        self._intermediate_locations = []
 
     def get_piece_type(self):
         """
@@ -346,26 +446,6 @@ class Chariot(Piece):
         """
         return self._piece_type
 
-    def get_intermediate_locations(self):
-        """
-        Getter method for the intermediate locations
-        :return: list of locations within the path of the Chariot's move
-        """
-        return self._intermediate_locations
-
-    def add_intermediate_location(self, new_location):
-        """
-        Adds intermediate locations to a list of locations within the Chariot's movement path
-        :param new_location: location within the Chariot's movement path to add to the intermediate location list
-        """
-        self._intermediate_locations.append(new_location)
-
-    def clear_intermediate_locations(self):
-        """
-        Resets the list of intermediate locations
-        """
-        self._intermediate_locations.clear()
-
     def meets_move_conditions(self, from_cartesian, to_cartesian):
         """
         Move conditions for the Chariot Piece
@@ -374,48 +454,60 @@ class Chariot(Piece):
         :return: True - if the piece is being moved according to it's movement rules
                  False - if the proposed move violates its movement rules
         """
+        return self.get_move_path(from_cartesian, to_cartesian) is not None
+
+    def get_move_path(self, from_cartesian, to_cartesian):
+        """
+        Lists the locations the Chariot passes over during a move, without changing the piece
+        :param from_cartesian: the initial location (converted from algebraic to cartesian coordinates)
+        :param to_cartesian: the to-location (converted from algebraic to cartesian coordinates)
+        :return: tuple of (row, column) locations that must be empty - if the piece is being moved according to its
+                 movement rules
+                 None - if the proposed move violates its movement rules
+        """
+        path = []
 
         # if moving in a straight line vertically
         if abs(from_cartesian[0] - to_cartesian[0]) > 0 and from_cartesian[1] - to_cartesian[1] == 0:
             # moving in the direction of decreasing rows
             if from_cartesian[0] > to_cartesian[0]:
                 for horizontal_index in range(to_cartesian[0] + 1, from_cartesian[0]):
-                    self.add_intermediate_location([horizontal_index, to_cartesian[1]])
+                    path.append((horizontal_index, to_cartesian[1]))
             # moving in the direction of increasing rows
             else:
                 for horizontal_index in range(from_cartesian[0] + 1, to_cartesian[0]):
-                    self.add_intermediate_location([horizontal_index, to_cartesian[1]])
-            return True
+                    path.append((horizontal_index, to_cartesian[1]))
+            return tuple(path)
 
         # if moving in a straight line horizontally
         elif from_cartesian[0] - to_cartesian[0] == 0 and abs(from_cartesian[1] - to_cartesian[1]) > 0:
             # moving in order of decreasing columns
             if from_cartesian[1] > to_cartesian[1]:
                 for vertical_index in range(to_cartesian[1] + 1, from_cartesian[1]):
-                    self.add_intermediate_location([to_cartesian[0], vertical_index])
+                    path.append((to_cartesian[0], vertical_index))
             # moving in order of increasing columns
             else:
                 for vertical_index in range(from_cartesian[1] + 1, to_cartesian[1]):
-                    self.add_intermediate_location([to_cartesian[0], vertical_index])
-            return True
+                    path.append((to_cartesian[0], vertical_index))
+            return tuple(path)
 
         # if moving from one of the corners or the center of one of the palaces
-        elif from_cartesian in self.get_palace(1)[0:5] or from_cartesian in self.get_palace(-1)[0:5]:
+        elif (from_cartesian[0], from_cartesian[1]) in PALACE_DIAGONAL_POINTS:
             # trying to not move in a straight line from the palace to outside the palace
-            if not (to_cartesian in self.get_palace(1) or to_cartesian in self.get_palace(-1)):
-                return False
+            if (to_cartesian[0], to_cartesian[1]) not in PALACE_LOCATIONS:
+                return None
             # not moving along the diagonal line in the palace
             if abs(from_cartesian[0] - to_cartesian[0]) != abs(from_cartesian[1] - to_cartesian[1]):
-                return False
+                return None
             # if moving to opposite corner of the palace
             if abs(from_cartesian[0] - to_cartesian[0]) == 2:
-                self.add_intermediate_location(
-                    [int((from_cartesian[0] + to_cartesian[0]) / 2), (from_cartesian[1] + to_cartesian[1])])
+                path.append(
+                    (int((from_cartesian[0] + to_cartesian[0]) / 2), int((from_cartesian[1] + to_cartesian[1]) / 2)))
         else:
-            return False
+            return None
 
-        # return True for all other conditions
-        return True
+        # return the path for all other conditions
+        return tuple(path)
 
 
 class Cannon(Piece):
@@ -423,6 +515,10 @@ class Cannon(Piece):
     Represents the Cannon piece
     Inherits from the Piece class
     """
+
+    __slots__ = ()
+    _piece_type = 'CANNON'
+
     def __init__(self, location, color, nickname):
         """
         Initializes the Cannon object
@@ -430,8 +526,6 @@ class Cannon(Piece):
         :param color: color of the Cannon piece
         """
         super().__init__(location, color, nickname)
-        self._piece_type = 'CANNON'
-        self._intermediate_locations = []
 
     def get_piece_type(self):
         """
@@ -440,27 +534,6 @@ class Cannon(Piece):
         """
         return self._piece_type
 
-    def get_intermediate_locations(self):
-        """
-        Getter method for the intermediate locations
-        :return: list of locations within the path of the Cannon's move
-        """
-        return self._intermediate_locations
-
-    def add_intermediate_location(self, new_location):
-        """
-        Adds intermediate locations to a list of locations within the Cannon's movement path
-        :param new_location: location within the Cannon's movement path to add to the intermediate location list
-        """
-        self._intermediate_locations.append(new_location)
-
-    def clear_intermediate_locations(self):
-        """
-        Resets the list of intermediate locations
-        :return:
-        """
-        self._intermediate_locations.clear()
-
     def meets_move_conditions(self, from_cartesian, to_cartesian):
         """
         Move conditions for the Cannon Piece
@@ -469,45 +542,57 @@ class Cannon(Piece):
         :return: True - if the piece is being moved according to it's movement rules
                  False - if the proposed move violates its movement rules
         """
+        return self.get_move_path(from_cartesian, to_cartesian) is not None
+
+    def get_move_path(self, from_cartesian, to_cartesian):
+        """
+        Lists the locations the Cannon passes over during a move, without changing the piece
+        :param from_cartesian: the initial location (converted from algebraic to cartesian coordinates)
+        :param to_cartesian: the to-location (converted from algebraic to cartesian coordinates)
+        :return: tuple of (row, column) locations to jump over - if the piece is being moved according to its
+                 movement rules
+                 None - if the proposed move violates its movement rules
+        """
+        path = []
 
         # if moving in a straight line vertically
         if abs(from_cartesian[0] - to_cartesian[0]) > 0 and from_cartesian[1] - to_cartesian[1] == 0:
             # moving in the direction of decreasing rows
             if from_cartesian[0] > to_cartesian[0]:
                 for row_index in range(to_cartesian[0] + 1, from_cartesian[0]):
-                    self.add_intermediate_location([row_index, to_cartesian[1]])
+                    path.append((row_index, to_cartesian[1]))
             # moving in the direction of increasing rows
             else:
                 for row_index in range(from_cartesian[0] + 1, to_cartesian[0]):
-                    self.add_intermediate_location([row_index, to_cartesian[1]])
-            return True
+                    path.append((row_index, to_cartesian[1]))
+            return tuple(path)
         # if moving in a straight line horizontally
         elif from_cartesian[0] - to_cartesian[0] == 0 and abs(from_cartesian[1] - to_cartesian[1]) > 0:
             # moving in order of decreasing columns
             if from_cartesian[1] > to_cartesian[1]:
                 for column_index in range(to_cartesian[1] + 1, from_cartesian[1]):
-                    self.add_intermediate_location([to_cartesian[0], column_index])
+                    path.append((to_cartesian[0], column_index))
             # moving in order of increasing columns
             else:
                 for column_index in range(from_cartesian[1] + 1, to_cartesian[1]):
-                    self.add_intermediate_location([to_cartesian[0], column_index])
-            return True
+                    path.append((to_cartesian[0], column_index))
+            return tuple(path)
         # if moving from one of the corners or the center of one of the palaces
-        elif from_cartesian in self.get_palace(1)[0:5] or from_cartesian in self.get_palace(-1)[0:5]:
+        elif (from_cartesian[0], from_cartesian[1]) in PALACE_DIAGONAL_POINTS:
             # trying to not move in a straight line from the palace to outside the palace
-            if not (to_cartesian in self.get_palace(1) or to_cartesian in self.get_palace(-1)):
-                return False
+            if (to_cartesian[0], to_cartesian[1]) not in PALACE_LOCATIONS:
+                return None
             # not moving along the diagonal line in the palace
             if abs(from_cartesian[0] - to_cartesian[0]) != abs(from_cartesian[1] - to_cartesian[1]):
-                return False
+                return None
             # if moving to opposite corner of the palace
             if abs(from_cartesian[0] - to_cartesian[0]) == 2:
-                self.add_intermediate_location(
-                    [int((from_cartesian[0] + to_cartesian[0]) / 2), (from_cartesian[1] + to_cartesian[1])])
+                path.append(
+                    (int((from_cartesian[0] + to_cartesian[0]) / 2), int((from_cartesian[1] + to_cartesian[1]) / 2)))
         else:
-            return False
+            return None
 
-        return True
+        return tuple(path)
 
 
 class Soldier(Piece):
@@ -518,6 +603,9 @@ class Soldier(Piece):
         > JanggiGame class will use the get_piece_type, get_move_conditions, and get_directionality methods
     """
 
+    __slots__ = ('_directionality',)
+    _piece_type = 'SOLDIER'
+
     def __init__(self, location, color, nickname, directionality):
         """
         Initializes the Soldier object
@@ -526,7 +614,6 @@ class Soldier(Piece):
         :param directionality: directionality of the Soldier piece (determines which direction it can move)
         """
         super().__init__(location, color, nickname)
-        self._piece_type = 'SOLDIER'
         self._directionality = directionality
 
     def get_piece_type(self):
@@ -561,10 +648,14 @@ class Soldier(Piece):
             return False
 
         # if in diagonals or center of palace:
-        if from_cartesian in self.get_palace(1)[0:5] or from_cartesian in self.get_palace(-1)[0:5]:
+        if (from_cartesian[0], from_cartesian[1]) in PALACE_DIAGONAL_POINTS:
             # add ability to go diagonally
             if abs(to_cartesian[0] - from_cartesian[0]) + abs(to_cartesian[1] - from_cartesian[1]) > 2:
                 return False
+            # diagonal moves have to follow the diagonal lines of the palace
+            if abs(to_cartesian[0] - from_cartesian[0]) + abs(to_cartesian[1] - from_cartesian[1]) == 2 and \
+                    (to_cartesian[0], to_cartesian[1]) not in PALACE_DIAGONAL_POINTS:
+                return False
 
         # if not:
         else:
@@ -580,6 +671,8 @@ class GameBoard:
     Represents a game board to visualize the current game state
     """
 
+    __slots__ = ('_game_board',)
+
     def __init__(self):
         """
         Initializes the visual representation of the game board with pieces at their starting locations
@@ -609,6 +702,14 @@ class GameBoard:
 
         self._game_board[row_index][column_index] = new_value
 
+    def clear_game_board(self):
+        """
+        Removes every piece from the game board representation
+        """
+        for board_row in self._game_board[1:]:
+            for column_index in range(1, 10):
+                board_row[column_index] = '      '
+
     def print_game_board(self):
         """
         Method that prints each row of the game board on a separate line.
@@ -624,15 +725,21 @@ class BluePlayer:
     Represents the Blue player
     """
 
-    def __init__(self):
-        """Initializes the blue player's pieces"""
+    __slots__ = ('_blue_pieces',)
+
+    def __init__(self, arrangement=DEFAULT_ARRANGEMENT):
+        """
+        Initializes the blue player's pieces
+        :param arrangement: setup of the Horses and Elephants, a key of JanggiPosition.ARRANGEMENTS
+        """
+        horse_locations, elephant_locations = back_rank_locations(arrangement, '10')
         self._blue_pieces = [General('e9', 'blue', ' BGen ', -1),
                              Guard('d10', 'blue', ' BGd1 ', -1),
                              Guard('f10', 'blue', ' BGd2 ', -1),
-                             Horse('c10', 'blue', ' BHs1 '),
-                             Horse('h10', 'blue', ' BHs2 '),
-                             Elephant('b10', 'blue', ' BEl1 '),
-                             Elephant('g10', 'blue', ' BEl2 '),
+                             Horse(horse_locations[0], 'blue', ' BHs1 '),
+                             Horse(horse_locations[1], 'blue', ' BHs2 '),
+                             Elephant(elephant_locations[0], 'blue', ' BEl1 '),
+                             Elephant(elephant_locations[1], 'blue', ' BEl2 '),
                              Chariot('a10', 'blue', ' BCh1 '),
                              Chariot('i10', 'blue', ' BCh2 '),
                              Cannon('b8', 'blue', ' BCn1 '),
@@ -650,21 +757,34 @@ class BluePlayer:
         """
         return self._blue_pieces
 
+    def get_color(self):
+        """
+        Getter method for the player color
+        :return: 'blue'
+        """
+        return 'blue'
+
 
 class RedPlayer:
     """
     Represents the Red player
     """
 
-    def __init__(self):
-        """Initializes the red player's pieces"""
+    __slots__ = ('_red_pieces',)
+
+    def __init__(self, arrangement=DEFAULT_ARRANGEMENT):
+        """
+        Initializes the red player's pieces
+        :param arrangement: setup of the Horses and Elephants, a key of JanggiPosition.ARRANGEMENTS
+        """
+        horse_locations, elephant_locations = back_rank_locations(arrangement, '1')
         self._red_pieces = [General('e2', 'red', ' RGen ', 1),
                             Guard('d1', 'red', ' RGd1 ', 1),
                             Guard('f1', 'red', ' RGd2 ', 1),
-                            Horse('c1', 'red', ' RHs1 '),
-                            Horse('h1', 'red', ' RHs2 '),
-                            Elephant('b1', 'red', ' REl1 '),
-                            Elephant('g1', 'red', ' REl2 '),
+                            Horse(horse_locations[0], 'red', ' RHs1 '),
+                            Horse(horse_locations[1], 'red', ' RHs2 '),
+                            Elephant(elephant_locations[0], 'red', ' REl1 '),
+                            Elephant(elephant_locations[1], 'red', ' REl2 '),
                             Chariot('a1', 'red', ' RCh1 '),
                             Chariot('i1', 'red', ' RCh2 '),
                             Cannon('b3', 'red', ' RCn1 '),
@@ -682,23 +802,66 @@ class RedPlayer:
         """
         return self._red_pieces
 
+    def get_color(self):
+        """
+        Getter method for the player color
+        :return: 'red'
+        """
+        return 'red'
+
 
 class JanggiGame:
     """
     Represents the overall Janggi gameplay
     """
 
-    def __init__(self):
+    __slots__ = ('_game_state', '_current_player', '_current_piece', '_game_board', '_blue_player', '_red_player',
+                 '_letter_to_number', '_undo_stack', '_piece_move_cache', '_legal_move_cache', '_position_hash',
+                 '_occupancy', '_occupied_squares', '_start_position', '__weakref__')
+
+    def __init__(self, blue_arrangement=DEFAULT_ARRANGEMENT, red_arrangement=DEFAULT_ARRANGEMENT):
         """
         Initializes the game of Janggi
+        :param blue_arrangement: setup of the blue Horses and Elephants, a key of JanggiPosition.ARRANGEMENTS
+        :param red_arrangement: setup of the red Horses and Elephants, a key of JanggiPosition.ARRANGEMENTS
         """
         self._game_state = 'UNFINISHED'
         self._current_player = 'blue'
         self._current_piece = None
         self._game_board = GameBoard()
-        self._blue_player = BluePlayer()
-        self._red_player = RedPlayer()
-        self._letter_to_number = {'a': 1, 'b': 2, 'c': 3, 'd': 4, 'e': 5, 'f': 6, 'g': 7, 'h': 8, 'i': 9}
+        self._blue_player = BluePlayer(blue_arrangement)
+        self._red_player = RedPlayer(red_arrangement)
+        if blue_arrangement != DEFAULT_ARRANGEMENT or red_arrangement != DEFAULT_ARRANGEMENT:
+            for piece in self._blue_player.get_pieces()[3:7] + self._red_player.get_pieces()[3:7]:
+                cartesian = SQUARE_CARTESIAN[SQUARE_INDEX[piece.get_location()]]
+                self._game_board.modify_game_board(cartesian[0], cartesian[1], piece.get_nickname())
+        self._letter_to_number = LETTER_TO_NUMBER
+
+        # position the game started from as (pieces, current player, game state), None for the starting setup
+        self._start_position = None
+        if blue_arrangement != DEFAULT_ARRANGEMENT or red_arrangement != DEFAULT_ARRANGEMENT:
+            self._start_position = (starting_pieces(blue_arrangement, red_arrangement), 'blue', 'UNFINISHED')
+
+        # one record per move made: (moved piece, from location, to location, captured piece or None,
+        # player who made the move, game state before the move, position hash before the move)
+        self._undo_stack = []
+
+        # legal moves cached per piece (piece -> list of to-locations) and per player (color -> list of moves),
+        # dropped by push_move and pop_move for the pieces whose moves may have changed
+        self._piece_move_cache = {}
+        self._legal_move_cache = {}
+
+        # Zobrist hash of the piece placement and the player to move, updated as pieces are moved
+        self._position_hash = 0
+        for piece in self._blue_player.get_pieces() + self._red_player.get_pieces():
+            self._position_hash ^= self.get_zobrist_key(piece, piece.get_location())
+
+        # occupancy index of the board: the piece on each square (None for empty squares)
+        self._occupancy = [None] * 90
+        # the same occupancy as a bitboard (bit of each occupied square set)
+        self._occupied_squares = 0
+        for piece in self._blue_player.get_pieces() + self._red_player.get_pieces():
+            self.relocate_piece(piece, piece.get_location())
 
     def get_game_state(self):
         """
@@ -793,6 +956,11 @@ class JanggiGame:
         :return: the location in cartesian coordinates
         """
 
+        # locations on the board are looked up in a table
+        square = SQUARE_INDEX.get(algebraic_location)
+        if square is not None:
+            return SQUARE_CARTESIAN[square][:]
+
         return [int(algebraic_location[1:]), self.get_letter_to_number()[algebraic_location[0]]]
 
     def cartesian_to_algebraic(self, cartesian_location):
@@ -802,6 +970,10 @@ class JanggiGame:
         :return: the location in algebraic notation
         """
 
+        # locations on the board are looked up in a table
+        if 1 <= cartesian_location[0] <= 10 and 1 <= cartesian_location[1] <= 9:
+            return SQUARE_NAMES[CARTESIAN_SQUARE[cartesian_location[0]][cartesian_location[1]]]
+
         column_letter = ''
 
         for item in self.get_letter_to_number():
@@ -810,6 +982,131 @@ class JanggiGame:
 
         return column_letter + str(cartesian_location[0])
 
+    def get_position_hash(self):
+        """
+        Getter method for the Zobrist hash of the current position (piece placement and player to move).
+        Equal positions give equal hashes, including positions from other games or processes.
+        :return: 64-bit integer
+        """
+        return self._position_hash
+
+    def get_zobrist_key(self, piece, location):
+        """
+        Looks up the Zobrist key of a piece standing on a location
+        :param piece: piece object
+        :param location: location in algebraic notation
+        :return: 64-bit integer (0 if the location is 'CAPTURED')
+        """
+        if location not in SQUARE_INDEX:
+            return 0
+        code = piece_code(COLORS.index(piece.get_color()), PIECE_TYPES.index(piece.get_piece_type()))
+        return ZOBRIST_PIECE_KEYS[code][SQUARE_INDEX[location]]
+
+    def get_hash_history(self):
+        """
+        Getter method for the hashes of the positions before each move made so far
+        :return: list of 64-bit integers, oldest first
+        """
+        return [record[6] for record in self._undo_stack]
+
+    def repetition_count(self):
+        """
+        Counts how many times the current position occurred earlier in the game
+        :return: number of earlier occurrences
+        """
+        return sum(1 for record in self._undo_stack if record[6] == self.get_position_hash())
+
+    def get_piece_at_cartesian(self, cartesian_location):
+        """
+        Looks up the piece occupying a board location
+        :param cartesian_location: location in cartesian coordinates (list of row and column indices)
+        :return: the piece object at the location
+                 None - if the location is empty or is not on the board
+        """
+        if 1 <= cartesian_location[0] <= 10 and 1 <= cartesian_location[1] <= 9:
+            return self._occupancy[CARTESIAN_SQUARE[cartesian_location[0]][cartesian_location[1]]]
+        return None
+
+    def get_piece_at_square(self, square):
+        """
+        Looks up the piece occupying a board location
+        :param square: square index (0-89) as used by JanggiPosition
+        :return: the piece object at the location
+                 None - if the location is empty
+        """
+        return self._occupancy[square]
+
+    def get_piece_at(self, location):
+        """
+        Looks up the piece occupying a board location
+        :param location: location in algebraic notation
+        :return: the piece object at the location
+                 None - if the location is empty or is not on the board
+        """
+        square = SQUARE_INDEX.get(location)
+        if square is None:
+            return None
+        return self._occupancy[square]
+
+    def relocate_piece(self, piece, new_location):
+        """
+        Sets the location of a piece and keeps the occupancy index in sync with it
+        :param piece: piece object to move
+        :param new_location: new location in algebraic notation (or 'CAPTURED')
+        """
+        old_square = SQUARE_INDEX.get(piece.get_location())
+        if old_square is not None and self._occupancy[old_square] is piece:
+            self._occupancy[old_square] = None
+            self._occupied_squares &= ~(1 << old_square)
+
+        piece.set_location(new_location)
+
+        new_square = SQUARE_INDEX.get(new_location)
+        if new_square is not None:
+            self._occupancy[new_square] = piece
+            self._occupied_squares |= 1 << new_square
+
+    def set_position(self, pieces, current_player='blue', game_state='UNFINISHED'):
+        """
+        Sets up a position other than the starting setup, clearing the moves made so far. Each piece is placed with
+        one of the player's piece objects of that type; the player's other pieces are captured.
+        :param pieces: list of (location, color, piece type) tuples with color and piece type as the indices used by
+                       JanggiPosition (BLUE/RED and GENERAL-SOLDIER)
+        :param current_player: 'blue' or 'red'
+        :param game_state: 'UNFINISHED', 'RED_WON' or 'BLUE_WON'
+        :raises ValueError: if a player has no General or more pieces of a type than the starting setup
+        """
+        for player in [self._blue_player, self._red_player]:
+            for piece in player.get_pieces():
+                self.relocate_piece(piece, 'CAPTURED')
+        self.get_game_board().clear_game_board()
+
+        for location, color, piece_type in pieces:
+            piece = None
+            for candidate in self.get_player_obj(COLORS[color]).get_pieces():
+                if candidate.get_location() == 'CAPTURED' and candidate.get_piece_type() == PIECE_TYPES[piece_type]:
+                    piece = candidate
+                    break
+            if piece is None:
+                raise ValueError('too many pieces of type %s for %s' % (PIECE_TYPES[piece_type], COLORS[color]))
+            self.relocate_piece(piece, location)
+            cartesian = SQUARE_CARTESIAN[SQUARE_INDEX[location]]
+            self.get_game_board().modify_game_board(cartesian[0], cartesian[1], piece.get_nickname())
+
+        for player in [self._blue_player, self._red_player]:
+            if player.get_pieces()[0].get_location() == 'CAPTURED':
+                raise ValueError('no General for ' + player.get_color())
+
+        self._undo_stack.clear()
+        self._start_position = (list(pieces), current_player, game_state)
+        self.set_current_player(current_player)
+        self.set_game_state(game_state)
+        self._position_hash = ZOBRIST_RED_TO_MOVE if current_player == 'red' else 0
+        for player in [self._blue_player, self._red_player]:
+            for piece in player.get_pieces():
+                self._position_hash ^= self.get_zobrist_key(piece, piece.get_location())
+        self.clear_move_cache()
+
     def moving_own_piece(self, from_location, player):
         """
         Determines if the current player is moving their own piece
@@ -819,11 +1116,8 @@ class JanggiGame:
                  False - if the current player is not moving their own piece
         """
 
-        for each_piece in player.get_pieces():
-            if each_piece.get_location() == from_location:
-                self.set_current_piece(each_piece)
-                return True
-        return False
+        piece = self.get_piece_at(from_location)
+        return piece is not None and piece.get_color() == player.get_color()
 
     def skipping_turn(self, from_location, to_location):
         """
@@ -846,71 +1140,65 @@ class JanggiGame:
         :return: True - if a player is attempting to make a move that results in a player capturing their own piece
                  False - if a player is not attempting to make a move that results in them capturing their own piece
         """
-        for each_piece in player.get_pieces():
-            if each_piece.get_location() == to_location:
-                return True
+        piece = self.get_piece_at(to_location)
+        if piece is not None and piece.get_color() == player.get_color():
+            return True
         return False
 
-    def move_is_blocked(self, current_piece):
+    def move_is_blocked(self, current_piece, move_path):
         """
         Method to determine if the move is blocked by pieces in the current location
         :param current_piece: current piece being assessed for a block
+        :param move_path: locations the move passes over (from the piece's get_move_path method)
         :return: True - if a piece is blocked due to other pieces in its movement path
                  False - if the piece is not being blocked by any other pieces in its movement path
         """
 
-        # if the piece type is a 'HORSE', 'ELEPHANT', or 'CHARIOT'
-        if (current_piece.get_piece_type() == 'HORSE' or
-            current_piece.get_piece_type() == 'ELEPHANT' or
-            current_piece.get_piece_type() == 'CHARIOT') and \
-                len(current_piece.get_intermediate_locations()) != 0:
-            # conditions for HORSE, ELEPHANT, or 'CHARIOT'
-            for intermediate_location in current_piece.get_intermediate_locations():
-                for red_piece in self.get_player_obj('red').get_pieces():
-                    if red_piece.get_location() == self.cartesian_to_algebraic(intermediate_location):
-                        current_piece.clear_intermediate_locations()
-                        return True
-                for blue_piece in self.get_player_obj('blue').get_pieces():
-                    if blue_piece.get_location() == self.cartesian_to_algebraic(intermediate_location):
-                        current_piece.clear_intermediate_locations()
-                        return True
-            current_piece.clear_intermediate_locations()
-            return False
         # if the piece type is a 'CANNON'
-        elif current_piece.get_piece_type() == 'CANNON':
-            if len(current_piece.get_intermediate_locations()) == 0:
+        if current_piece.get_piece_type() == 'CANNON':
+            intermediate_pieces = 0
+            for intermediate_location in move_path:
+                intermediate_piece = self.get_piece_at_cartesian(intermediate_location)
+                if intermediate_piece is not None:
+                    if intermediate_piece.get_piece_type() == 'CANNON':
+                        return True
+                    intermediate_pieces += 1
+            # only valid if the Cannon is jumping over a single piece (friend or Foe)
+            return intermediate_pieces != 1
+
+        # any other piece is blocked by a piece anywhere in its path
+        for intermediate_location in move_path:
+            if self.get_piece_at_cartesian(intermediate_location) is not None:
                 return True
-            # conditions for 'CANNON'
-            else:
-                intermediate_pieces = 0
-                for intermediate_location in current_piece.get_intermediate_locations():
-                    for red_piece in self.get_player_obj('red').get_pieces():
-                        if red_piece.get_location() == self.cartesian_to_algebraic(intermediate_location):
-                            if red_piece.get_piece_type() == 'CANNON':
-                                current_piece.clear_intermediate_locations()
-                                return True
-                            else:
-                                intermediate_pieces += 1
-                    for blue_piece in self.get_player_obj('blue').get_pieces():
-                        if blue_piece.get_location() == self.cartesian_to_algebraic(intermediate_location):
-                            if blue_piece.get_piece_type() == 'CANNON':
-                                current_piece.clear_intermediate_locations()
-                                return True
-                            else:
-                                intermediate_pieces += 1
-                # only valid if the Cannon is jumping over a single piece (friend or Foe)
-                if intermediate_pieces != 1:
-                    current_piece.clear_intermediate_locations()
-                    return True
+        return False
 
-                # return False for all other conditions
-                else:
-                    current_piece.clear_intermediate_locations()
-                    return False
+    def path_is_blocked(self, current_piece, blocking_squares):
+        """
+        Determines if a move is blocked, the same test as move_is_blocked made on the occupancy bitboard
+        :param current_piece: piece being moved
+        :param blocking_squares: bitboard of the squares the move passes over (from get_move_geometry)
+        :return: True - if a piece is in the way (or, for a Cannon, there isn't exactly one non-Cannon piece to
+                        jump over)
+                 False - if the path is clear
+        """
+        blocking_pieces = self._occupied_squares & blocking_squares
+        if current_piece.get_piece_type() == 'CANNON':
+            return blocking_pieces == 0 or blocking_pieces & (blocking_pieces - 1) != 0 or \
+                self._occupancy[blocking_pieces.bit_length() - 1].get_piece_type() == 'CANNON'
+        return blocking_pieces != 0
 
-        # if the piece type is not an 'HORSE', 'ELEPHANT', 'CHARIOT', or 'CANNON'
-        else:
-            return False
+    def get_move_geometry(self, piece, from_square, to_square):
+        """
+        Looks up the geometry of a move in MOVE_GEOMETRY. The geometry only depends on the piece type, color and
+        squares, so it is shared by all games.
+        :param piece: piece being moved
+        :param from_square: square index the piece moves from
+        :param to_square: square index the piece moves to
+        :return: bitboard of the squares the move passes over (the squares that must be empty, or the squares to jump
+                 over for a Cannon) - if the move follows the piece's movement rules
+                 None - if the move violates the piece's movement rules
+        """
+        return MOVE_GEOMETRY.get((piece.get_piece_type(), piece.get_color(), from_square, to_square))
 
     def cannon_capturing_cannon(self, current_piece, to_location):
         """
@@ -921,14 +1209,10 @@ class JanggiGame:
                  False - if not
         """
         if current_piece.get_piece_type() == 'CANNON':
-            for blue_piece in self.get_player_obj('blue').get_pieces():
-                if blue_piece.get_location() == to_location and blue_piece.get_piece_type() == 'CANNON':
-                    return True
-            for red_piece in self.get_player_obj('red').get_pieces():
-                if red_piece.get_location() == to_location and red_piece.get_piece_type() == 'CANNON':
-                    return True
-        else:
-            return False
+            other_piece = self.get_piece_at(to_location)
+            if other_piece is not None and other_piece.get_piece_type() == 'CANNON':
+                return True
+        return False
 
     def is_in_check(self, player_color):
         """
@@ -939,17 +1223,152 @@ class JanggiGame:
         """
 
         # find location of player's general
-        general_location = self.get_player_obj(player_color).get_pieces()[0].get_location()
-
-        # for each of alternate player's pieces:
-        for opponent_piece in self.get_opposite_player(player_color).get_pieces():
-            if opponent_piece.get_location() != 'CAPTURED':
-                if opponent_piece.meets_move_conditions(self.algebraic_to_cartesian(opponent_piece.get_location()),
-                                                        self.algebraic_to_cartesian(general_location)):
-                    if not self.move_is_blocked(opponent_piece):
+        general_square = SQUARE_INDEX[self.get_player_obj(player_color).get_pieces()[0].get_location()]
+        opponent_color = self.get_opposite_player(player_color).get_color()
+
+        # looking up the locations an attacker would have to stand on to reach the general
+        # Soldiers next to the general
+        for origin in SOLDIER_ATTACKERS[COLORS.index(opponent_color)][general_square]:
+            piece = self.get_piece_at_square(origin)
+            if piece is not None and piece.get_color() == opponent_color and piece.get_piece_type() == 'SOLDIER':
+                return True
+
+        # Horses and Elephants with nothing in the way
+        for attackers, piece_type in [[HORSE_ATTACKERS, 'HORSE'], [ELEPHANT_ATTACKERS, 'ELEPHANT']]:
+            for origin, blocking_squares in attackers[general_square]:
+                if self._occupied_squares & blocking_squares:
+                    continue
+                piece = self.get_piece_at_square(origin)
+                if piece is not None and piece.get_color() == opponent_color and piece.get_piece_type() == piece_type:
+                    return True
+
+        # Chariots (first piece along a line) and Cannons (second piece along a line, jumping over a non-Cannon)
+        for ray in RAYS[general_square]:
+            jumped = False
+            for square in ray:
+                piece = self.get_piece_at_square(square)
+                if piece is None:
+                    continue
+                if not jumped:
+                    if piece.get_color() == opponent_color and piece.get_piece_type() == 'CHARIOT':
+                        return True
+                    if piece.get_piece_type() == 'CANNON':
+                        break
+                    jumped = True
+                else:
+                    if piece.get_color() == opponent_color and piece.get_piece_type() == 'CANNON':
                         return True
+                    break
+
         return False
 
+    def in_check_after_move(self, from_square, to_square):
+        """
+        Determines if a move would leave the mover's general in check, without making it (the same result as
+        test_move, worked out on the occupancy of the current position)
+        :param from_square: square index of the piece to move
+        :param to_square: square index the piece would move to (capturing any piece there)
+        :return: True - if the mover's general would be in check after the move
+                 False - if it would not
+        """
+        occupancy = self._occupancy
+        mover = occupancy[from_square]
+        color = mover.get_color()
+        general = self.get_player_obj(color).get_pieces()[0]
+        general_square = to_square if mover is general else SQUARE_INDEX[general.get_location()]
+        opponent_color = self.get_opposite_player(color).get_color()
+        occupied = self._occupied_squares & ~(1 << from_square) | 1 << to_square
+
+        # a piece on the to-square after the move is the mover, so an attacker there has been captured
+        for origin in SOLDIER_ATTACKERS[COLORS.index(opponent_color)][general_square]:
+            piece = occupancy[origin]
+            if origin != to_square and piece is not None and piece.get_color() == opponent_color and \
+                    piece.get_piece_type() == 'SOLDIER':
+                return True
+
+        for attackers, piece_type in [[HORSE_ATTACKERS, 'HORSE'], [ELEPHANT_ATTACKERS, 'ELEPHANT']]:
+            for origin, blocking_squares in attackers[general_square]:
+                if origin == to_square or occupied & blocking_squares:
+                    continue
+                piece = occupancy[origin]
+                if piece is not None and piece.get_color() == opponent_color and piece.get_piece_type() == piece_type:
+                    return True
+
+        for ray in RAYS[general_square]:
+            jumped = False
+            for square in ray:
+                if not occupied >> square & 1:
+                    continue
+                piece = mover if square == to_square else occupancy[square]
+                if not jumped:
+                    if piece.get_color() == opponent_color and piece.get_piece_type() == 'CHARIOT':
+                        return True
+                    if piece.get_piece_type() == 'CANNON':
+                        break
+                    jumped = True
+                else:
+                    if piece.get_color() == opponent_color and piece.get_piece_type() == 'CANNON':
+                        return True
+                    break
+
+        return False
+
+    def validate_moves(self, moves):
+        """
+        Checks many candidate moves of the current player against the current position at once, with the same
+        result for each as make_move would give. The game is not changed (not even the current piece), and the
+        check state and the squares that matter to the general's safety are worked out once for all the moves.
+        :param moves: iterable of (from_location, to_location) tuples (equal locations to pass the turn)
+        :return: (list of True/False legality of each move, list of the reason each move was rejected - one of
+                 REJECTION_REASONS, or None for a legal move) tuple
+        """
+        moves = list(moves)
+        if self._game_state != 'UNFINISHED':
+            return [False] * len(moves), ['GAME_OVER'] * len(moves)
+
+        occupancy = self._occupancy
+        color = self._current_player
+        general = self.get_player_obj(color).get_pieces()[0]
+        general_square = SQUARE_INDEX[general.get_location()]
+        in_check = self.is_in_check(color)
+        # a move by any other piece can only change whether the general is in check if it leaves or enters one of
+        # these squares
+        check_zone = CHECK_ZONES[general_square]
+
+        legal = []
+        reasons = []
+        for from_location, to_location in moves:
+            from_square = SQUARE_INDEX.get(from_location)
+            to_square = SQUARE_INDEX.get(to_location)
+            piece = None if from_square is None else occupancy[from_square]
+            target = None if to_square is None else occupancy[to_square]
+            if from_square is None or to_square is None:
+                reason = 'NOT_ON_BOARD' if piece is None or piece.get_color() == color else 'NOT_OWN_PIECE'
+            elif piece is None or piece.get_color() != color:
+                reason = 'NOT_OWN_PIECE'
+            elif from_square == to_square:
+                reason = 'LEAVES_GENERAL_IN_CHECK' if in_check else None
+            elif target is not None and target.get_color() == color:
+                reason = 'CAPTURES_OWN_PIECE'
+            else:
+                blocking_squares = self.get_move_geometry(piece, from_square, to_square)
+                if blocking_squares is None:
+                    reason = 'AGAINST_MOVE_RULES'
+                elif self.path_is_blocked(piece, blocking_squares):
+                    reason = 'BLOCKED'
+                elif target is not None and piece.get_piece_type() == 'CANNON' and \
+                        target.get_piece_type() == 'CANNON':
+                    reason = 'CANNON_CAPTURES_CANNON'
+                elif piece is not general and not (1 << from_square | 1 << to_square) & check_zone:
+                    reason = 'LEAVES_GENERAL_IN_CHECK' if in_check else None
+                elif self.in_check_after_move(from_square, to_square):
+                    reason = 'LEAVES_GENERAL_IN_CHECK'
+                else:
+                    reason = None
+            legal.append(reason is None)
+            reasons.append(reason)
+        return legal, reasons
+
     def test_move(self, current_piece, from_location, temp_to_location):
         """
         Temporarily moves a players piece to a new location so is_in_check can be called to assess if the move
@@ -960,42 +1379,155 @@ class JanggiGame:
                  False - if the move has resulted in the player's general being put in or remaining in check
         """
 
-        # if there's a player that will be captured, change their location to 'CAPTURED'
-        other_piece = False
-
-        # determining if other pieces would be captured as a result of this move
-        if from_location != temp_to_location:
-            for piece in self.get_player_obj('blue').get_pieces():
-                if piece.get_location() == temp_to_location:
-                    other_piece = True
-                    opponent_piece = piece
-                    piece.set_location('CAPTURED')
-
-            for piece in self.get_player_obj('red').get_pieces():
-                if piece.get_location() == temp_to_location:
-                    other_piece = True
-                    opponent_piece = piece
-                    piece.set_location('CAPTURED')
-
-        # change the current piece's location to the temp_to_location
-        current_piece.set_location(temp_to_location)
-
-        # assessing if the move puts the current player in check
-        piece_color = current_piece.get_color()
-        if self.is_in_check(piece_color):
-            current_piece.set_location(from_location)
-            if other_piece:
-                opponent_piece.set_location(temp_to_location)
+        # make the move, assess if it puts the current player in check, then take it back
+        self.push_move(from_location, temp_to_location, False)
+        in_check = self.is_in_check(current_piece.get_color())
+        self.pop_move(False)
+
+        return not in_check
+
+    def push_move(self, from_location, to_location, update_move_cache=True):
+        """
+        Moves a piece (capturing any piece at the to-location) and passes the turn to the other player, recording what
+        is needed to take the move back with pop_move. The move is not validated.
+        :param from_location: location of the piece to move
+        :param to_location: location to move the piece to (the same as from_location to pass the turn)
+        :param update_move_cache: False to leave the legal move cache alone (only when the move is taken back with
+                                  pop_move(False) before the cache is used again, as test_move does)
+        """
+        piece = self.get_piece_at(from_location)
+
+        # determining if an opponent piece is captured as a result of this move
+        captured_piece = None
+        if not self.skipping_turn(from_location, to_location):
+            captured_piece = self.get_piece_at(to_location)
+
+        self._undo_stack.append((piece, from_location, to_location, captured_piece,
+                                 self.get_current_player(), self.get_game_state(), self.get_position_hash()))
+
+        # setting location for any captured pieces to 'CAPTURED'
+        if captured_piece is not None:
+            self._position_hash ^= self.get_zobrist_key(captured_piece, to_location)
+            self.relocate_piece(captured_piece, 'CAPTURED')
+        self._position_hash ^= self.get_zobrist_key(piece, from_location) ^ self.get_zobrist_key(piece, to_location)
+        self._position_hash ^= ZOBRIST_RED_TO_MOVE
+        self.relocate_piece(piece, to_location)
+
+        # Update the game board
+        from_cartesian = SQUARE_CARTESIAN[SQUARE_INDEX[from_location]]
+        to_cartesian = SQUARE_CARTESIAN[SQUARE_INDEX[to_location]]
+        self.get_game_board().modify_game_board(from_cartesian[0], from_cartesian[1], '      ')
+        self.get_game_board().modify_game_board(to_cartesian[0], to_cartesian[1], piece.get_nickname())
+
+        if self.get_current_player() == 'blue':
+            self.set_current_player('red')
+        else:
+            self.set_current_player('blue')
+
+        if update_move_cache:
+            self.update_move_cache(from_location, to_location, piece, captured_piece)
+
+    def pop_move(self, update_move_cache=True):
+        """
+        Takes back the most recent move made by push_move or make_move, restoring any captured piece, the current
+        player and the game state
+        :param update_move_cache: False to leave the legal move cache alone (only for moves pushed with
+                                  push_move(..., False))
+        :return: True - if a move was taken back
+                 False - if there are no moves to take back
+        """
+        if len(self._undo_stack) == 0:
             return False
+
+        piece, from_location, to_location, captured_piece, previous_player, previous_state, previous_hash = \
+            self._undo_stack.pop()
+
+        self.relocate_piece(piece, from_location)
+        if captured_piece is not None:
+            self.relocate_piece(captured_piece, to_location)
+
+        # Update the game board (the to-location first in case the move was a pass)
+        from_cartesian = SQUARE_CARTESIAN[SQUARE_INDEX[from_location]]
+        to_cartesian = SQUARE_CARTESIAN[SQUARE_INDEX[to_location]]
+        if captured_piece is not None:
+            self.get_game_board().modify_game_board(to_cartesian[0], to_cartesian[1], captured_piece.get_nickname())
         else:
-            current_piece.set_location(from_location)
-            if other_piece:
-                opponent_piece.set_location(temp_to_location)
-            return True
+            self.get_game_board().modify_game_board(to_cartesian[0], to_cartesian[1], '      ')
+        self.get_game_board().modify_game_board(from_cartesian[0], from_cartesian[1], piece.get_nickname())
+
+        self.set_current_player(previous_player)
+        self.set_game_state(previous_state)
+        self._position_hash = previous_hash
+
+        if update_move_cache:
+            self.update_move_cache(from_location, to_location, piece, captured_piece)
+        return True
+
+    def update_move_cache(self, from_location, to_location, moved_piece, captured_piece):
+        """
+        Drops the cached legal moves that a move (or taking a move back) may have changed: the moves of the pieces
+        involved, of pieces whose paths, legs, screens or destinations include either location, and all moves of a
+        player whose general moved or whose general's safety depends on either location
+        :param from_location: location the piece moved from
+        :param to_location: location the piece moved to
+        :param moved_piece: piece that moved
+        :param captured_piece: piece that was captured (or restored), or None
+        """
+        piece_move_cache = self._piece_move_cache
+        from_square = SQUARE_INDEX[from_location]
+        to_square = SQUARE_INDEX[to_location]
+        changed_squares = (1 << from_square) | (1 << to_square)
+
+        piece_move_cache.pop(moved_piece, None)
+        if captured_piece is not None:
+            piece_move_cache.pop(captured_piece, None)
+
+        # pieces whose own moves may have changed
+        affected = (AFFECTED_BY[from_square] | AFFECTED_BY[to_square]) & self._occupied_squares
+        while affected:
+            lowest_bit = affected & -affected
+            piece_move_cache.pop(self._occupancy[lowest_bit.bit_length() - 1], None)
+            affected ^= lowest_bit
+
+        # moves whose legality may have changed
+        for player in [self._blue_player, self._red_player]:
+            pieces = player.get_pieces()
+            general = pieces[0]
+            general_square = SQUARE_INDEX.get(general.get_location())
+            if general is moved_piece or general_square is None or CHECK_ZONES[general_square] & changed_squares:
+                for piece in pieces:
+                    piece_move_cache.pop(piece, None)
+            else:
+                # a general's own moves depend on the safety of the locations it could move to
+                piece_move_cache.pop(general, None)
+
+        self._legal_move_cache.clear()
+
+    def get_move_history(self):
+        """
+        Getter method for the moves made so far (including moves made with push_move)
+        :return: list of (from_location, to_location) tuples in the order they were made
+        """
+        return [(record[1], record[2]) for record in self._undo_stack]
+
+    def get_start_position(self):
+        """
+        Getter method for the position the game started from (the Horse/Elephant setups or the set_position input)
+        :return: (pieces, current player, game state) tuple with pieces as taken by set_position, or None if the game
+                 started from the starting setup
+        """
+        return self._start_position
+
+    def get_move_count(self):
+        """
+        Getter method for the number of moves made so far (including moves made with push_move)
+        :return: number of moves
+        """
+        return len(self._undo_stack)
 
     def valid_move(self, from_location, to_location):
         """
-        Method to determine if a move is valid
+        Method to determine if a move is valid. Only reads the game, so it can be called from several threads at once.
         :param from_location: initial location of the piece
         :param to_location: final location of the piece
         :return: True - if the move is valid
@@ -1005,35 +1537,181 @@ class JanggiGame:
         # If the from_location does not have a current player's piece
         if not self.moving_own_piece(from_location, self.get_player_obj(self.get_current_player())):
             return False
+        piece = self.get_piece_at(from_location)
 
-        # If the piece to be moved is captured:
-        if self.get_current_piece().get_location() == 'CAPTURED':
+        # If the to_location is not on the board
+        if to_location not in SQUARE_INDEX:
             return False
 
+        # If the player is skipping their turn
+        if self.skipping_turn(from_location, to_location):
+            return True
+
         # If the to_location has another of the current player's pieces
-        if not self.skipping_turn(from_location, to_location) and \
-                self.capturing_own_piece(to_location, self.get_player_obj(self.get_current_player())):
+        if self.capturing_own_piece(to_location, self.get_player_obj(self.get_current_player())):
             return False
 
-        # If the player is not skipping their turn
-        if not self.skipping_turn(from_location, to_location):
-
-            # If the indicated move is not legal due to movement rules of piece
-            if not self.get_current_piece().meets_move_conditions(self.algebraic_to_cartesian(from_location),
-                                                                  self.algebraic_to_cartesian(to_location)):
-                return False
+        # If the indicated move is not legal due to movement rules of piece
+        blocking_squares = self.get_move_geometry(piece, SQUARE_INDEX[from_location], SQUARE_INDEX[to_location])
+        if blocking_squares is None:
+            return False
 
-            # if the move is blocked by another piece in the movement path
-            if self.move_is_blocked(self.get_current_piece()):
-                return False
+        # if the move is blocked by another piece in the movement path
+        if self.path_is_blocked(piece, blocking_squares):
+            return False
 
-            # if a cannon is attempting to capture another cannon
-            if self.cannon_capturing_cannon(self.get_current_piece(), to_location):
-                return False
+        # if a cannon is attempting to capture another cannon
+        if self.cannon_capturing_cannon(piece, to_location):
+            return False
 
         # return True for all other conditions
         return True
 
+    def generate_piece_moves(self, piece):
+        """
+        Lists every location a piece can move to according to its movement rules and the pieces in its way.
+        Does not consider whether the move would leave the player's own general in check (see legal_moves).
+        :param piece: piece to generate moves for
+        :return: list of locations in algebraic notation
+        """
+        square = SQUARE_INDEX.get(piece.get_location())
+        if square is None:
+            return []
+
+        occupancy = self._occupancy
+        color = piece.get_color()
+        piece_type = piece.get_piece_type()
+        destinations = []
+
+        # the Chariot slides along its paths until it reaches the first piece in the way
+        if piece_type == 'CHARIOT':
+            for ray in RAYS[square]:
+                for to_square in ray:
+                    other_piece = occupancy[to_square]
+                    if other_piece is None:
+                        destinations.append(to_square)
+                    else:
+                        if other_piece.get_color() != color:
+                            destinations.append(to_square)
+                        break
+
+        # the Cannon has to jump over exactly one piece (which can't be a Cannon) and can't capture a Cannon
+        elif piece_type == 'CANNON':
+            for ray in RAYS[square]:
+                jumped = False
+                for to_square in ray:
+                    other_piece = occupancy[to_square]
+                    if not jumped:
+                        if other_piece is not None:
+                            if other_piece.get_piece_type() == 'CANNON':
+                                break
+                            jumped = True
+                    elif other_piece is None:
+                        destinations.append(to_square)
+                    else:
+                        if other_piece.get_color() != color and other_piece.get_piece_type() != 'CANNON':
+                            destinations.append(to_square)
+                        break
+
+        # the Horse and Elephant need the squares along the way to be empty
+        elif piece_type == 'HORSE' or piece_type == 'ELEPHANT':
+            for to_square, blocking_squares in (HORSE_MOVES if piece_type == 'HORSE' else ELEPHANT_MOVES)[square]:
+                if not self._occupied_squares & blocking_squares:
+                    other_piece = occupancy[to_square]
+                    if other_piece is None or other_piece.get_color() != color:
+                        destinations.append(to_square)
+
+        # the General, Guards and Soldiers only step to neighboring locations
+        else:
+            table = SOLDIER_MOVES if piece_type == 'SOLDIER' else PALACE_MOVES
+            for to_square in table[COLORS.index(color)][square]:
+                other_piece = occupancy[to_square]
+                if other_piece is None or other_piece.get_color() != color:
+                    destinations.append(to_square)
+
+        return [SQUARE_NAMES[to_square] for to_square in destinations]
+
+    def clear_move_cache(self):
+        """
+        Drops every cached legal move, so the next legal_moves or checkmate_detected call works them all out again
+        """
+        self._piece_move_cache.clear()
+        self._legal_move_cache.clear()
+
+    def piece_legal_moves(self, piece):
+        """
+        Lists the locations a piece can legally move to (kept in the legal move cache until a move changes them)
+        :param piece: piece on the board
+        :return: list of locations in algebraic notation (not to be modified)
+        """
+        destinations = self._piece_move_cache.get(piece)
+        if destinations is None:
+            from_location = piece.get_location()
+            destinations = [to_location for to_location in self.generate_piece_moves(piece)
+                            if self.test_move(piece, from_location, to_location)]
+            self._piece_move_cache[piece] = destinations
+        return destinations
+
+    def legal_moves(self, player_color):
+        """
+        Lists every legal move for a player (moves that don't leave the player's general in check).
+        Passing a turn is not included, although make_move accepts it.
+        :param player_color: 'red' or 'blue'
+        :return: list of (from_location, to_location) tuples in algebraic notation
+        """
+        moves = self._legal_move_cache.get(player_color)
+        if moves is None:
+            moves = []
+            for piece in self.get_player_obj(player_color).get_pieces():
+                from_location = piece.get_location()
+                if from_location == 'CAPTURED':
+                    continue
+                for to_location in self.piece_legal_moves(piece):
+                    moves.append((from_location, to_location))
+            self._legal_move_cache[player_color] = moves
+        return moves[:]
+
+    def get_book_move(self, book, rng=None, best=False):
+        """
+        Looks up a move for the current player in an opening book, without searching
+        :param book: JanggiBook.OpeningBook object
+        :param rng: random.Random object to pick with (the random module if not given)
+        :param best: True to pick the book move with the best results instead of picking by how often moves were played
+        :return: (from_location, to_location) tuple to pass to make_move, or None if the position is not in the book
+                 or the game is over
+        """
+        if self._game_state != 'UNFINISHED':
+            return None
+        move = book.choose_move(self._position_hash, COLORS.index(self._current_player), rng, best)
+        if move is None:
+            return None
+        from_location, to_location = SQUARE_NAMES[move >> 7], SQUARE_NAMES[move & 127]
+        # guards against hash collisions and books built from other rules
+        if not self.valid_move(from_location, to_location):
+            return None
+        return from_location, to_location
+
+    def perft(self, depth):
+        """
+        Counts the legal move sequences of a given length from the current position (the leaf nodes of the move
+        tree, not counting passes). Used to check that changes to the move rules keep giving the same results.
+        :param depth: number of moves in each sequence
+        :return: number of move sequences
+        """
+        if depth == 0:
+            return 1
+
+        moves = self.legal_moves(self.get_current_player())
+        if depth == 1:
+            return len(moves)
+
+        nodes = 0
+        for from_location, to_location in moves:
+            self.push_move(from_location, to_location)
+            nodes += self.perft(depth - 1)
+            self.pop_move()
+        return nodes
+
     def checkmate_detected(self, player):
         """
         Determines if a checkmate state has been reached
@@ -1042,14 +1720,13 @@ class JanggiGame:
                  False - if the player's general has not been checkmated
         """
 
-        # Whoever is in check, run through each piece and try to move them to each position on the board
-        for pieces in player.get_pieces():
-            self.set_current_piece(pieces)
-            for letter in ['a', 'b', 'c', 'd', 'e', 'f', 'g', 'h', 'i']:
-                for number in range(1, 11):
-                    if self.valid_move(pieces.get_location(), letter + str(number)) and \
-                            self.test_move(pieces, pieces.get_location(), letter + str(number)):
-                        return False
+        # Whoever is in check, see if any of their pieces has a legal move (kept in the legal move cache)
+        moves = self._legal_move_cache.get(player.get_color())
+        if moves is not None:
+            return len(moves) == 0
+        for piece in player.get_pieces():
+            if piece.get_location() != 'CAPTURED' and len(self.piece_legal_moves(piece)) != 0:
+                return False
         return True
 
     def make_move(self, from_location, to_location):
@@ -1070,34 +1747,21 @@ class JanggiGame:
             return False
 
         # if the test_move results in the player being put in check
+        self.set_current_piece(self.get_piece_at(from_location))
         if not self.test_move(self.get_current_piece(), from_location, to_location):
             return False
 
-        #   Make the indicated move
-        self.get_current_piece().set_location(to_location)
-
-        # Update the game board
-        self.get_game_board().modify_game_board(self.algebraic_to_cartesian(from_location)[0],
-                                                self.algebraic_to_cartesian(from_location)[1], '      ')
-        self.get_game_board().modify_game_board(self.algebraic_to_cartesian(to_location)[0],
-                                                self.algebraic_to_cartesian(to_location)[1],
-                                                self.get_current_piece().get_nickname())
-
-        # setting location for any captured pieces to 'CAPTURED'
-        for other_pieces in self.get_opposite_player(self.get_current_player()).get_pieces():
-            if other_pieces.get_location() == to_location:
-                other_pieces.set_location('CAPTURED')
+        #   Make the indicated move (updates the game board and passes the turn to the other player)
+        self.push_move(from_location, to_location)
 
-        # conditions if current player is blue
-        if self.get_current_player() == 'blue':
-            self.set_current_player('red')
+        # conditions if the blue player made the move
+        if self.get_current_player() == 'red':
             if self.is_in_check(self.get_current_player()):
                 if self.checkmate_detected(self.get_player_obj(self.get_current_player())):
                     self.set_game_state('BLUE_WON')
 
-        # conditions if current player is red
+        # conditions if the red player made the move
         else:
-            self.set_current_player('blue')
             if self.is_in_check(self.get_current_player()):
                 if self.checkmate_detected(self.get_player_obj(self.get_current_player())):
                     self.set_game_state('RED_WON')
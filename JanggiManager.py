@@ -0,0 +1,490 @@
+# Description: Hosts many Janggi games at once for an online server. GameManager keeps games by ID, runs the moves of
+#              each game one at a time and in the order they were submitted on a shared thread pool, packs games that
+#              have been idle for a while into a compact move list (restored on their next use), and keeps throughput
+#              and latency metrics for sizing servers.
+#
+#              The thread pool keeps each game's moves in order and lets moves of other games go on while one game's
+#              move waits; it doesn't spread the work over several cores, as the moves are pure Python and hold the
+#              GIL. A manager makes about as many moves per second with one worker as with eight, so the metrics
+#              measure what one core can do, and a server uses more cores by running one process (with its own
+#              GameManager) per core and sending each game ID to the same process.
+
+import itertools
+import threading
+import time
+from array import array
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from JanggiGame import JanggiGame
+from JanggiPosition import SQUARE_INDEX, SQUARE_NAMES, encode_move
+
+
+class GameSession:
+    """
+    Represents one hosted game: the JanggiGame while it is active, or its moves packed into bytes while it is evicted.
+    The session's lock has to be held to use any of its methods.
+    """
+
+    __slots__ = ('_game_id', '_game', '_packed_moves', '_packed_state', '_pending_moves', '_running', '_last_used',
+                 'lock')
+
+    def __init__(self, game_id):
+        """
+        Initializes the session with a new game
+        :param game_id: ID of the game
+        """
+        self._game_id = game_id
+        self._game = JanggiGame()
+        self._packed_moves = None
+        self._packed_state = None
+        # moves waiting to be made: (from_location, to_location, Future, submit time)
+        self._pending_moves = deque()
+        self._running = False
+        self._last_used = time.monotonic()
+        self.lock = threading.Lock()
+
+    def get_game_id(self):
+        """
+        Getter method for the ID of the game
+        :return: game ID
+        """
+        return self._game_id
+
+    def get_game(self):
+        """
+        Getter method for the game, restoring it from its packed moves if it was evicted
+        :return: JanggiGame object
+        """
+        if self._game is None:
+            moves = array('H')
+            moves.frombytes(self._packed_moves)
+            game = JanggiGame()
+            # the moves were validated when they were first made
+            for move in moves:
+                game.push_move(SQUARE_NAMES[move >> 7], SQUARE_NAMES[move & 127])
+            game.set_game_state(self._packed_state)
+            self._game = game
+            self._packed_moves = None
+            self._packed_state = None
+        self._last_used = time.monotonic()
+        return self._game
+
+    def is_evicted(self):
+        """
+        Determines if the game is only held in its packed form
+        :return: True - if the game is evicted
+                 False - if the game is active
+        """
+        return self._game is None
+
+    def is_busy(self):
+        """
+        Determines if the session has moves waiting or being made (busy sessions are not evicted)
+        :return: True - if moves are waiting or being made
+                 False - if not
+        """
+        return self._running or len(self._pending_moves) != 0
+
+    def get_last_used(self):
+        """
+        Getter method for the time the game was last used
+        :return: time.monotonic() value
+        """
+        return self._last_used
+
+    def evict(self):
+        """
+        Packs the game into its move list (2 bytes per move) and game state, and drops the JanggiGame object
+        :return: number of bytes the packed game takes
+        """
+        if self._game is not None:
+            moves = array('H', [encode_move(SQUARE_INDEX[from_location], SQUARE_INDEX[to_location])
+                                for from_location, to_location in self._game.get_move_history()])
+            self._packed_moves = moves.tobytes()
+            self._packed_state = self._game.get_game_state()
+            self._game = None
+        return len(self._packed_moves)
+
+    def add_pending_move(self, from_location, to_location, future, submitted):
+        """
+        Queues a move to be made
+        :param from_location: location to move from
+        :param to_location: location to move to
+        :param future: Future to set the make_move result on
+        :param submitted: time.perf_counter() value when the move was submitted
+        :return: True - if the caller has to schedule the session to run its moves
+                 False - if the session is already running its moves
+        """
+        self._pending_moves.append((from_location, to_location, future, submitted))
+        if self._running:
+            return False
+        self._running = True
+        return True
+
+    def next_pending_move(self):
+        """
+        Takes the next queued move, marking the session idle when there are none left
+        :return: (from_location, to_location, Future, submit time) tuple, or None if no moves are waiting
+        """
+        if len(self._pending_moves) == 0:
+            self._running = False
+            return None
+        return self._pending_moves.popleft()
+
+
+class ManagerMetrics:
+    """
+    Represents the throughput and latency metrics of a GameManager. Latencies are measured from when a move is
+    submitted to when its result is ready, over the most recent moves.
+    """
+
+    def __init__(self, sample_size=10000):
+        """
+        Initializes the metrics
+        :param sample_size: number of most recent move latencies kept for the percentiles
+        """
+        self._lock = threading.Lock()
+        self._sample_size = sample_size
+        self.reset()
+
+    def reset(self):
+        """
+        Starts counting again from now
+        """
+        with self._lock:
+            self._start = time.perf_counter()
+            self._moves = 0
+            self._accepted_moves = 0
+            self._latencies = deque(maxlen=self._sample_size)
+
+    def record_move(self, latency, accepted):
+        """
+        Records a finished make_move call
+        :param latency: seconds from submitting the move to its result
+        :param accepted: result of make_move
+        """
+        with self._lock:
+            self._moves += 1
+            if accepted:
+                self._accepted_moves += 1
+            self._latencies.append(latency)
+
+    def get_moves(self):
+        """
+        Getter method for the number of make_move calls since the metrics were reset
+        :return: number of moves
+        """
+        return self._moves
+
+    def get_moves_per_second(self):
+        """
+        Works out the make_move throughput since the metrics were reset
+        :return: moves per second
+        """
+        elapsed = time.perf_counter() - self._start
+        return self._moves / elapsed if elapsed > 0 else 0.0
+
+    def get_latency_percentile(self, percentile):
+        """
+        Works out a percentile of the recent make_move latencies
+        :param percentile: percentile from 0 to 100 (99 for the p99 latency)
+        :return: latency in seconds (0.0 if no moves have been made)
+        """
+        with self._lock:
+            latencies = sorted(self._latencies)
+        if len(latencies) == 0:
+            return 0.0
+        index = min(len(latencies) - 1, int(len(latencies) * percentile / 100))
+        return latencies[index]
+
+    def get_summary(self):
+        """
+        Collects the metrics in a dictionary
+        :return: dictionary with the moves, accepted moves, moves per second and p50/p99 latencies in seconds
+        """
+        return {'moves': self._moves, 'accepted_moves': self._accepted_moves,
+                'moves_per_second': self.get_moves_per_second(), 'p50_latency': self.get_latency_percentile(50),
+                'p99_latency': self.get_latency_percentile(99)}
+
+
+class GameManager:
+    """
+    Represents a host of many concurrent games. Every method can be called from any thread. Moves for the same game
+    are made one at a time in the order they were submitted; moves for different games run on the thread pool,
+    taking turns on one core (see the notes at the top of the module).
+    """
+
+    def __init__(self, workers=4, max_active_games=None, idle_timeout=None, sample_size=10000):
+        """
+        Initializes the game manager
+        :param workers: number of threads that make moves (more threads let more games' moves take turns, so a slow
+                        checkmate probe holds up fewer other games, but don't make more moves per second)
+        :param max_active_games: number of games kept as JanggiGame objects before the least recently used ones are
+                                 evicted (None for no limit)
+        :param idle_timeout: seconds without use after which evict_idle_games evicts a game (None to only evict
+                             for max_active_games)
+        :param sample_size: number of most recent move latencies kept for the latency percentiles
+        """
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='janggi-move')
+        self._max_active_games = max_active_games
+        self._idle_timeout = idle_timeout
+        self._lock = threading.Lock()
+        self._sessions = {}
+        # active (not evicted) sessions, least recently used first
+        self._active_sessions = OrderedDict()
+        self._game_ids = itertools.count(1)
+        self._metrics = ManagerMetrics(sample_size)
+
+    def close(self):
+        """
+        Waits for the submitted moves to be made and shuts down the thread pool
+        """
+        self._executor.shutdown(wait=True)
+
+    def __enter__(self):
+        """
+        Allows the manager to be used in a with statement so the thread pool is shut down afterwards
+        :return: the manager
+        """
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """
+        Shuts down the thread pool at the end of a with statement
+        """
+        self.close()
+
+    def get_metrics(self):
+        """
+        Getter method for the throughput and latency metrics
+        :return: ManagerMetrics object
+        """
+        return self._metrics
+
+    def create_game(self, game_id=None):
+        """
+        Starts a new game
+        :param game_id: ID for the game (a new numeric string ID if not given)
+        :return: ID of the game
+        """
+        with self._lock:
+            if game_id is None:
+                game_id = str(next(self._game_ids))
+                while game_id in self._sessions:
+                    game_id = str(next(self._game_ids))
+            elif game_id in self._sessions:
+                raise ValueError('game already exists: ' + str(game_id))
+            session = GameSession(game_id)
+            self._sessions[game_id] = session
+            self._active_sessions[game_id] = session
+        self.evict_excess_games()
+        return game_id
+
+    def remove_game(self, game_id):
+        """
+        Stops hosting a game
+        :param game_id: ID of the game
+        :return: True - if the game was removed
+                 False - if there is no game with the ID
+        """
+        with self._lock:
+            self._active_sessions.pop(game_id, None)
+            return self._sessions.pop(game_id, None) is not None
+
+    def get_game_ids(self):
+        """
+        Lists the IDs of the hosted games
+        :return: list of game IDs
+        """
+        with self._lock:
+            return list(self._sessions)
+
+    def get_game_count(self):
+        """
+        Counts the hosted games
+        :return: (number of games, number of them that are active rather than evicted) tuple
+        """
+        with self._lock:
+            return len(self._sessions), len(self._active_sessions)
+
+    def get_session(self, game_id):
+        """
+        Looks up the session of a game
+        :param game_id: ID of the game
+        :return: GameSession object
+        :raises KeyError: if there is no game with the ID
+        """
+        with self._lock:
+            return self._sessions[game_id]
+
+    def use_game(self, session):
+        """
+        Gets the game of a session, restoring it if it was evicted (the session's lock has to be held)
+        :param session: GameSession object
+        :return: JanggiGame object
+        """
+        game_id = session.get_game_id()
+        with self._lock:
+            if game_id in self._active_sessions:
+                self._active_sessions.move_to_end(game_id)
+            elif game_id in self._sessions:
+                self._active_sessions[game_id] = session
+        return session.get_game()
+
+    def submit_move(self, game_id, from_location, to_location):
+        """
+        Queues a move to be made on the thread pool after any moves already submitted for the game
+        :param game_id: ID of the game
+        :param from_location: location to move from
+        :param to_location: location to move to
+        :return: Future with the make_move result (True if the move was made, False if it was rejected)
+        :raises KeyError: if there is no game with the ID
+        """
+        session = self.get_session(game_id)
+        future = Future()
+        with session.lock:
+            schedule = session.add_pending_move(from_location, to_location, future, time.perf_counter())
+        if schedule:
+            self._executor.submit(self.run_pending_moves, session)
+        return future
+
+    def run_pending_moves(self, session):
+        """
+        Makes the queued moves of a session in order (runs on the thread pool)
+        :param session: GameSession object
+        """
+        while True:
+            with session.lock:
+                pending_move = session.next_pending_move()
+                if pending_move is None:
+                    break
+                from_location, to_location, future, submitted = pending_move
+                try:
+                    result = self.use_game(session).make_move(from_location, to_location)
+                except Exception as error:
+                    future.set_exception(error)
+                    continue
+            self._metrics.record_move(time.perf_counter() - submitted, result)
+            future.set_result(result)
+        self.evict_excess_games()
+
+    def make_move(self, game_id, from_location, to_location):
+        """
+        Makes a move and waits for the result (see submit_move)
+        :param game_id: ID of the game
+        :param from_location: location to move from
+        :param to_location: location to move to
+        :return: True - if the move was made
+                 False - if the move was rejected
+        :raises KeyError: if there is no game with the ID
+        """
+        return self.submit_move(game_id, from_location, to_location).result()
+
+    def get_game_state(self, game_id):
+        """
+        Getter method for the state of a game
+        :param game_id: ID of the game
+        :return: 'UNFINISHED', 'RED_WON' or 'BLUE_WON'
+        :raises KeyError: if there is no game with the ID
+        """
+        session = self.get_session(game_id)
+        with session.lock:
+            return self.use_game(session).get_game_state()
+
+    def get_current_player(self, game_id):
+        """
+        Getter method for the player whose turn it is in a game
+        :param game_id: ID of the game
+        :return: 'blue' or 'red'
+        :raises KeyError: if there is no game with the ID
+        """
+        session = self.get_session(game_id)
+        with session.lock:
+            return self.use_game(session).get_current_player()
+
+    def legal_moves(self, game_id, player_color=None):
+        """
+        Lists the legal moves of a player in a game
+        :param game_id: ID of the game
+        :param player_color: 'blue' or 'red' (the player whose turn it is if not given)
+        :return: list of (from_location, to_location) tuples
+        :raises KeyError: if there is no game with the ID
+        """
+        session = self.get_session(game_id)
+        with session.lock:
+            game = self.use_game(session)
+            return game.legal_moves(player_color or game.get_current_player())
+
+    def validate_moves(self, game_id, moves):
+        """
+        Checks many candidate moves of the player whose turn it is in a game at once (see JanggiGame.validate_moves)
+        :param game_id: ID of the game
+        :param moves: list of (from_location, to_location) tuples
+        :return: (list of True/False legality of each move, list of rejection reasons or None) tuple
+        :raises KeyError: if there is no game with the ID
+        """
+        session = self.get_session(game_id)
+        with session.lock:
+            return self.use_game(session).validate_moves(moves)
+
+    def get_move_history(self, game_id):
+        """
+        Getter method for the moves made in a game
+        :param game_id: ID of the game
+        :return: list of (from_location, to_location) tuples
+        :raises KeyError: if there is no game with the ID
+        """
+        session = self.get_session(game_id)
+        with session.lock:
+            return self.use_game(session).get_move_history()
+
+    def evict_session(self, session):
+        """
+        Evicts the game of a session unless moves are waiting for it or it is in use
+        :param session: GameSession object
+        :return: True - if the game was evicted
+                 False - if the game is busy
+        """
+        if not session.lock.acquire(blocking=False):
+            return False
+        try:
+            if session.is_busy() or session.is_evicted():
+                return False
+            session.evict()
+            with self._lock:
+                self._active_sessions.pop(session.get_game_id(), None)
+            return True
+        finally:
+            session.lock.release()
+
+    def evict_excess_games(self):
+        """
+        Evicts the least recently used games while there are more active games than max_active_games
+        :return: number of games evicted
+        """
+        if self._max_active_games is None:
+            return 0
+        with self._lock:
+            excess = len(self._active_sessions) - self._max_active_games
+            candidates = list(itertools.islice(self._active_sessions.values(), max(0, excess)))
+        return sum(1 for session in candidates if self.evict_session(session))
+
+    def evict_idle_games(self, idle_timeout=None):
+        """
+        Evicts the games that haven't been used for a while (meant to be called periodically)
+        :param idle_timeout: seconds without use (the manager's idle_timeout if not given)
+        :return: number of games evicted
+        """
+        idle_timeout = self._idle_timeout if idle_timeout is None else idle_timeout
+        if idle_timeout is None:
+            return 0
+        cutoff = time.monotonic() - idle_timeout
+        with self._lock:
+            candidates = []
+            # the sessions are in least recently used order, so stop at the first one used since the cutoff
+            for session in self._active_sessions.values():
+                if session.get_last_used() > cutoff:
+                    break
+                candidates.append(session)
+        return sum(1 for session in candidates if self.evict_session(session))
@@ -0,0 +1,778 @@
+# Description: Compact bitboard representation of a Janggi position. Implements the same rules as JanggiGame
+#              (make_move, get_game_state, is_in_check, legal_moves) using precomputed square tables so it can be
+#              used as a lightweight drop-in backend when many games are hosted at once.
+
+import random
+
+
+# Squares are numbered 0-89: square = (row - 1) * 9 + (column - 1) using JanggiGame's cartesian coordinates,
+# so 'a1' is 0, 'i1' is 8 and 'i10' is 89.
+COLORS = ['blue', 'red']
+BLUE = 0
+RED = 1
+
+PIECE_TYPES = ['GENERAL', 'GUARD', 'HORSE', 'ELEPHANT', 'CHARIOT', 'CANNON', 'SOLDIER']
+GENERAL = 0
+GUARD = 1
+HORSE = 2
+ELEPHANT = 3
+CHARIOT = 4
+CANNON = 5
+SOLDIER = 6
+
+GAME_STATES = ['UNFINISHED', 'BLUE_WON', 'RED_WON']
+
+# directionality of each color's Soldiers (red moves towards increasing rows, blue towards decreasing rows)
+DIRECTIONALITY = [-1, 1]
+
+SQUARE_NAMES = [letter + str(row) for row in range(1, 11) for letter in 'abcdefghi']
+SQUARE_INDEX = {name: square for square, name in enumerate(SQUARE_NAMES)}
+
+
+def square_of(row, column):
+    """
+    Converts cartesian coordinates to a square index
+    :param row: row index (1-10)
+    :param column: column index (1-9)
+    :return: square index (0-89)
+    """
+    return (row - 1) * 9 + (column - 1)
+
+
+def on_board(row, column):
+    """
+    Determines if cartesian coordinates are on the board
+    :param row: row index
+    :param column: column index
+    :return: True - if the location is on the board
+             False - if the location is off the board
+    """
+    return 1 <= row <= 10 and 1 <= column <= 9
+
+
+def piece_code(color, piece_type):
+    """
+    Packs a color and a piece type into the code stored in the square array (0 is reserved for empty squares)
+    :param color: BLUE or RED
+    :param piece_type: one of the piece type indices (GENERAL ... SOLDIER)
+    :return: piece code (1-14)
+    """
+    return 1 + color * 7 + piece_type
+
+
+def _mask(squares):
+    """
+    Builds a bitboard from a list of squares
+    :param squares: iterable of square indices
+    :return: integer with the bit of each square set
+    """
+    mask = 0
+    for square in squares:
+        mask |= 1 << square
+    return mask
+
+
+def _build_tables():
+    """
+    Precomputes the move geometry for every square. Called once when the module is imported.
+    """
+    # palace corners and center (where the diagonal lines are) and the complete palaces
+    palace_lines = [[square_of(8, 4), square_of(10, 4), square_of(9, 5), square_of(8, 6), square_of(10, 6)],
+                    [square_of(1, 4), square_of(3, 4), square_of(2, 5), square_of(1, 6), square_of(3, 6)]]
+    palaces = [[square_of(row, column) for row in range(8, 11) for column in range(4, 7)],
+               [square_of(row, column) for row in range(1, 4) for column in range(4, 7)]]
+    diagonal_squares = set(palace_lines[BLUE]) | set(palace_lines[RED])
+
+    rays = []
+    horse_moves = []
+    elephant_moves = []
+    palace_moves = [[], []]
+    soldier_moves = [[], []]
+
+    for square in range(90):
+        row, column = square // 9 + 1, square % 9 + 1
+
+        # straight lines plus the palace diagonals (used by the Chariot and the Cannon)
+        square_rays = []
+        for row_step, column_step in [(-1, 0), (1, 0), (0, -1), (0, 1)]:
+            ray = []
+            next_row, next_column = row + row_step, column + column_step
+            while on_board(next_row, next_column):
+                ray.append(square_of(next_row, next_column))
+                next_row, next_column = next_row + row_step, next_column + column_step
+            if ray:
+                square_rays.append(ray)
+        for lines in palace_lines:
+            if square in lines:
+                for row_step, column_step in [(-1, -1), (-1, 1), (1, -1), (1, 1)]:
+                    ray = []
+                    next_row, next_column = row + row_step, column + column_step
+                    while on_board(next_row, next_column) and square_of(next_row, next_column) in lines:
+                        ray.append(square_of(next_row, next_column))
+                        next_row, next_column = next_row + row_step, next_column + column_step
+                    if ray:
+                        square_rays.append(ray)
+        rays.append(square_rays)
+
+        # Horse: one orthogonal step (the leg, which must be empty) then one diagonal step
+        moves = []
+        for row_step, column_step in [(-2, -1), (-2, 1), (2, -1), (2, 1), (-1, -2), (1, -2), (-1, 2), (1, 2)]:
+            if on_board(row + row_step, column + column_step):
+                if abs(row_step) == 2:
+                    leg = square_of(row + row_step // 2, column)
+                else:
+                    leg = square_of(row, column + column_step // 2)
+                moves.append((square_of(row + row_step, column + column_step), 1 << leg))
+        horse_moves.append(moves)
+
+        # Elephant: one orthogonal step then two diagonal steps (both intermediate squares must be empty)
+        moves = []
+        for row_step, column_step in [(-3, -2), (-3, 2), (3, -2), (3, 2), (-2, -3), (2, -3), (-2, 3), (2, 3)]:
+            if on_board(row + row_step, column + column_step):
+                row_sign = 1 if row_step > 0 else -1
+                column_sign = 1 if column_step > 0 else -1
+                if abs(row_step) == 3:
+                    legs = [square_of(row + row_sign, column), square_of(row + 2 * row_sign, column + column_sign)]
+                else:
+                    legs = [square_of(row, column + column_sign), square_of(row + row_sign, column + 2 * column_sign)]
+                moves.append((square_of(row + row_step, column + column_step), _mask(legs)))
+        elephant_moves.append(moves)
+
+        # General and Guard: one step along the palace lines
+        for color in [BLUE, RED]:
+            moves = []
+            if square in palaces[color]:
+                for row_step in [-1, 0, 1]:
+                    for column_step in [-1, 0, 1]:
+                        if row_step == 0 and column_step == 0:
+                            continue
+                        if not on_board(row + row_step, column + column_step):
+                            continue
+                        destination = square_of(row + row_step, column + column_step)
+                        if destination not in palaces[color]:
+                            continue
+                        if row_step != 0 and column_step != 0 and square not in palace_lines[color]:
+                            continue
+                        moves.append(destination)
+            palace_moves[color].append(moves)
+
+        # Soldier: sideways or forwards, and diagonally forwards along the palace lines
+        for color in [BLUE, RED]:
+            moves = []
+            forward = DIRECTIONALITY[color]
+            for row_step, column_step in [(0, -1), (0, 1), (forward, 0), (forward, -1), (forward, 1)]:
+                if not on_board(row + row_step, column + column_step):
+                    continue
+                destination = square_of(row + row_step, column + column_step)
+                if row_step != 0 and column_step != 0 and \
+                        not (square in diagonal_squares and destination in diagonal_squares):
+                    continue
+                moves.append(destination)
+            soldier_moves[color].append(moves)
+
+    # reverse lookups used by check detection: where an attacker has to stand to reach a square
+    horse_attackers = [[] for _ in range(90)]
+    elephant_attackers = [[] for _ in range(90)]
+    soldier_attackers = [[[] for _ in range(90)], [[] for _ in range(90)]]
+    for square in range(90):
+        for destination, legs in horse_moves[square]:
+            horse_attackers[destination].append((square, legs))
+        for destination, legs in elephant_moves[square]:
+            elephant_attackers[destination].append((square, legs))
+        for color in [BLUE, RED]:
+            for destination in soldier_moves[color][square]:
+                soldier_attackers[color][destination].append(square)
+
+    ray_masks = [_mask(square for ray in rays[square] for square in ray) for square in range(90)]
+    horse_attack_masks = [_mask(origin for origin, _ in horse_attackers[square]) for square in range(90)]
+    elephant_attack_masks = [_mask(origin for origin, _ in elephant_attackers[square]) for square in range(90)]
+    soldier_attack_masks = [[_mask(soldier_attackers[color][square]) for square in range(90)]
+                            for color in [BLUE, RED]]
+
+    return (rays, horse_moves, elephant_moves, palace_moves, soldier_moves, horse_attackers, elephant_attackers,
+            soldier_attackers, ray_masks, horse_attack_masks, elephant_attack_masks, soldier_attack_masks,
+            [_mask(palace) for palace in palaces])
+
+
+(RAYS, HORSE_MOVES, ELEPHANT_MOVES, PALACE_MOVES, SOLDIER_MOVES, HORSE_ATTACKERS, ELEPHANT_ATTACKERS,
+ SOLDIER_ATTACKERS, RAY_MASKS, HORSE_ATTACK_MASKS, ELEPHANT_ATTACK_MASKS, SOLDIER_ATTACK_MASKS,
+ PALACE_MASKS) = _build_tables()
+
+# Zobrist keys: one 64-bit key per piece code (1-14) and square, plus a key for red to move.
+# Generated from a fixed seed so position hashes are the same in every process and can be stored.
+_zobrist_random = random.Random(0x4A616E676769)
+ZOBRIST_PIECE_KEYS = [[0] * 90] + [[_zobrist_random.getrandbits(64) for _ in range(90)] for _ in range(14)]
+ZOBRIST_RED_TO_MOVE = _zobrist_random.getrandbits(64)
+del _zobrist_random
+
+# starting setup, matching BluePlayer and RedPlayer
+STARTING_PIECES = [
+    ('e9', BLUE, GENERAL), ('d10', BLUE, GUARD), ('f10', BLUE, GUARD), ('c10', BLUE, HORSE), ('h10', BLUE, HORSE),
+    ('b10', BLUE, ELEPHANT), ('g10', BLUE, ELEPHANT), ('a10', BLUE, CHARIOT), ('i10', BLUE, CHARIOT),
+    ('b8', BLUE, CANNON), ('h8', BLUE, CANNON), ('a7', BLUE, SOLDIER), ('c7', BLUE, SOLDIER), ('e7', BLUE, SOLDIER),
+    ('g7', BLUE, SOLDIER), ('i7', BLUE, SOLDIER),
+    ('e2', RED, GENERAL), ('d1', RED, GUARD), ('f1', RED, GUARD), ('c1', RED, HORSE), ('h1', RED, HORSE),
+    ('b1', RED, ELEPHANT), ('g1', RED, ELEPHANT), ('a1', RED, CHARIOT), ('i1', RED, CHARIOT),
+    ('b3', RED, CANNON), ('h3', RED, CANNON), ('a4', RED, SOLDIER), ('c4', RED, SOLDIER), ('e4', RED, SOLDIER),
+    ('g4', RED, SOLDIER), ('i4', RED, SOLDIER)]
+
+# the four ways a player may set up the Horses and Elephants on their back rank: the piece types on columns b, c, g
+# and h (E for Elephant, H for Horse), named in that order; 'EHEH' is the setup of STARTING_PIECES
+ARRANGEMENTS = {
+    'EHEH': (ELEPHANT, HORSE, ELEPHANT, HORSE),
+    'HEHE': (HORSE, ELEPHANT, HORSE, ELEPHANT),
+    'EHHE': (ELEPHANT, HORSE, HORSE, ELEPHANT),
+    'HEEH': (HORSE, ELEPHANT, ELEPHANT, HORSE),
+}
+DEFAULT_ARRANGEMENT = 'EHEH'
+
+
+def starting_pieces(blue_arrangement=DEFAULT_ARRANGEMENT, red_arrangement=DEFAULT_ARRANGEMENT):
+    """
+    Lists the pieces of a starting setup with the given Horse and Elephant arrangements
+    :param blue_arrangement: key of ARRANGEMENTS for the blue player
+    :param red_arrangement: key of ARRANGEMENTS for the red player
+    :return: list of (location, color, piece type) tuples in the order of STARTING_PIECES
+    """
+    back_rank_types = {}
+    for color, row, arrangement in [(BLUE, '10', blue_arrangement), (RED, '1', red_arrangement)]:
+        for letter, piece_type in zip('bcgh', ARRANGEMENTS[arrangement]):
+            back_rank_types[letter + row] = piece_type
+    return [(location, color, back_rank_types.get(location, piece_type))
+            for location, color, piece_type in STARTING_PIECES]
+
+
+def encode_move(from_square, to_square):
+    """
+    Packs a move into a single integer
+    :param from_square: square index the piece moves from
+    :param to_square: square index the piece moves to
+    :return: encoded move
+    """
+    return from_square << 7 | to_square
+
+
+def decode_move(move):
+    """
+    Unpacks a move encoded by encode_move
+    :param move: encoded move
+    :return: (from_square, to_square)
+    """
+    return move >> 7, move & 127
+
+
+class Position:
+    """
+    Represents a Janggi position as one bitboard per color and piece type plus a 90-byte square array.
+    Offers the same gameplay methods as JanggiGame.
+    """
+
+    __slots__ = ('_bitboards', '_colors', '_squares', '_side', '_game_state', '_undo_stack', '_hash')
+
+    def __init__(self, pieces=None, current_player='blue'):
+        """
+        Initializes the position
+        :param pieces: list of (location, color, piece type) tuples with color BLUE/RED and piece type GENERAL-SOLDIER
+                       (the starting setup if not given; see starting_pieces for the other Horse/Elephant setups)
+        :param current_player: 'blue' or 'red'
+        """
+        self._bitboards = [0] * 14
+        self._colors = [0, 0]
+        self._squares = bytearray(90)
+        self._undo_stack = []
+        self.reset(pieces, current_player)
+
+    def reset(self, pieces=None, current_player='blue'):
+        """
+        Sets up the pieces again, reusing the position's storage (so one Position can be used for many games)
+        :param pieces: list of (location, color, piece type) tuples with color BLUE/RED and piece type GENERAL-SOLDIER
+                       (the starting setup if not given)
+        :param current_player: 'blue' or 'red'
+        """
+        bitboards = self._bitboards
+        for index in range(14):
+            bitboards[index] = 0
+        self._colors[BLUE] = 0
+        self._colors[RED] = 0
+        self._squares[:] = bytes(90)
+        self._undo_stack.clear()
+        self._side = COLORS.index(current_player)
+        self._game_state = 'UNFINISHED'
+        self._hash = ZOBRIST_RED_TO_MOVE if self._side == RED else 0
+
+        for location, color, piece_type in (STARTING_PIECES if pieces is None else pieces):
+            self.put_piece(SQUARE_INDEX[location], color, piece_type)
+
+    @classmethod
+    def from_game(cls, game):
+        """
+        Builds a position from a JanggiGame object
+        :param game: JanggiGame object
+        :return: Position with the same pieces, player to move and game state
+        """
+        pieces = []
+        for color_name in COLORS:
+            for piece in game.get_player_obj(color_name).get_pieces():
+                if piece.get_location() != 'CAPTURED':
+                    pieces.append((piece.get_location(), COLORS.index(color_name),
+                                   PIECE_TYPES.index(piece.get_piece_type())))
+        position = cls(pieces, game.get_current_player())
+        position.set_game_state(game.get_game_state())
+        return position
+
+    def encode(self):
+        """
+        Encodes the position compactly (for sending to other processes): the piece code of every square followed by the
+        side to move and the game state. The undo stack is not included.
+        :return: 92 bytes
+        """
+        return bytes(self._squares) + bytes([self._side, GAME_STATES.index(self._game_state)])
+
+    @classmethod
+    def decode(cls, data):
+        """
+        Rebuilds a position encoded by encode
+        :param data: bytes returned by encode
+        :return: Position object
+        """
+        pieces = []
+        for square in range(90):
+            if data[square]:
+                pieces.append((SQUARE_NAMES[square], (data[square] - 1) // 7, (data[square] - 1) % 7))
+        position = cls(pieces, COLORS[data[90]])
+        position.set_game_state(GAME_STATES[data[91]])
+        return position
+
+    def copy(self):
+        """
+        Creates an independent copy of the position
+        :return: new Position object
+        """
+        position = Position.__new__(Position)
+        position._bitboards = self._bitboards[:]
+        position._colors = self._colors[:]
+        position._squares = bytearray(self._squares)
+        position._side = self._side
+        position._game_state = self._game_state
+        position._undo_stack = self._undo_stack[:]
+        position._hash = self._hash
+        return position
+
+    def put_piece(self, square, color, piece_type):
+        """
+        Places a piece on an empty square
+        :param square: square index
+        :param color: BLUE or RED
+        :param piece_type: piece type index
+        """
+        bit = 1 << square
+        self._bitboards[color * 7 + piece_type] |= bit
+        self._colors[color] |= bit
+        self._squares[square] = piece_code(color, piece_type)
+        self._hash ^= ZOBRIST_PIECE_KEYS[piece_code(color, piece_type)][square]
+
+    def get_piece_at(self, square):
+        """
+        Looks up the piece on a square
+        :param square: square index
+        :return: (color, piece type) - if the square is occupied
+                 None - if the square is empty
+        """
+        code = self._squares[square]
+        if code == 0:
+            return None
+        return (code - 1) // 7, (code - 1) % 7
+
+    def get_hash(self):
+        """
+        Getter method for the Zobrist hash of the position (piece placement and side to move)
+        :return: 64-bit integer
+        """
+        return self._hash
+
+    def get_hash_history(self):
+        """
+        Getter method for the hashes of the positions before each move recorded on the undo stack
+        :return: list of 64-bit integers, oldest first
+        """
+        return [record[4] for record in self._undo_stack]
+
+    def repetition_count(self):
+        """
+        Counts how many times the current position occurred earlier in the moves recorded on the undo stack
+        :return: number of earlier occurrences
+        """
+        return sum(1 for record in self._undo_stack if record[4] == self._hash)
+
+    def get_squares(self):
+        """
+        Getter method for the square array (piece code of each square, 0 for empty squares). Not to be modified.
+        :return: bytearray of 90 piece codes
+        """
+        return self._squares
+
+    def get_bitboard(self, color, piece_type):
+        """
+        Getter method for the bitboard of one color and piece type
+        :param color: BLUE or RED
+        :param piece_type: piece type index
+        :return: integer with a bit set for each square holding such a piece
+        """
+        return self._bitboards[color * 7 + piece_type]
+
+    def get_occupied(self):
+        """
+        Getter method for the bitboard of all occupied squares
+        :return: integer with a bit set for each occupied square
+        """
+        return self._colors[BLUE] | self._colors[RED]
+
+    def get_side_to_move(self):
+        """
+        Getter method for the side to move
+        :return: BLUE or RED
+        """
+        return self._side
+
+    def get_current_player(self):
+        """
+        Getter method for the current player
+        :return: 'blue' or 'red'
+        """
+        return COLORS[self._side]
+
+    def get_game_state(self):
+        """
+        Getter method for the current game state
+        :return: 'UNFINISHED', 'RED_WON' or 'BLUE_WON'
+        """
+        return self._game_state
+
+    def set_game_state(self, new_state):
+        """
+        Setter method for the game state
+        :param new_state: 'UNFINISHED', 'RED_WON' or 'BLUE_WON'
+        """
+        self._game_state = new_state
+
+    def general_square(self, color):
+        """
+        Finds the square of a player's General
+        :param color: BLUE or RED
+        :return: square index, or -1 if the General is not on the board
+        """
+        return self._bitboards[color * 7 + GENERAL].bit_length() - 1
+
+    def square_attacked(self, square, attacker):
+        """
+        Determines if any piece of the attacking color could move to a square
+        :param square: square index being attacked
+        :param attacker: BLUE or RED
+        :return: True - if the square is attacked
+                 False - if the square is not attacked
+        """
+        bitboards = self._bitboards
+        base = attacker * 7
+        occupied = self._colors[BLUE] | self._colors[RED]
+
+        soldiers = bitboards[base + SOLDIER]
+        if soldiers & SOLDIER_ATTACK_MASKS[attacker][square]:
+            return True
+
+        horses = bitboards[base + HORSE]
+        if horses & HORSE_ATTACK_MASKS[square]:
+            for origin, legs in HORSE_ATTACKERS[square]:
+                if horses >> origin & 1 and not occupied & legs:
+                    return True
+
+        elephants = bitboards[base + ELEPHANT]
+        if elephants & ELEPHANT_ATTACK_MASKS[square]:
+            for origin, legs in ELEPHANT_ATTACKERS[square]:
+                if elephants >> origin & 1 and not occupied & legs:
+                    return True
+
+        chariots = bitboards[base + CHARIOT]
+        cannons = bitboards[base + CANNON]
+        if (chariots | cannons) & RAY_MASKS[square]:
+            squares = self._squares
+            chariot_code = piece_code(attacker, CHARIOT)
+            cannon_code = piece_code(attacker, CANNON)
+            for ray in RAYS[square]:
+                screened = False
+                for other in ray:
+                    code = squares[other]
+                    if code == 0:
+                        continue
+                    if not screened:
+                        if code == chariot_code:
+                            return True
+                        # a Cannon can't jump over another Cannon
+                        if (code - 1) % 7 == CANNON:
+                            break
+                        screened = True
+                    else:
+                        if code == cannon_code:
+                            return True
+                        break
+        return False
+
+    def is_in_check(self, player_color):
+        """
+        Determines if the player is in check
+        :param player_color: 'red' or 'blue'
+        :return: True - if the player is in check
+                 False - if the player is not in check
+        """
+        color = COLORS.index(player_color)
+        return self.square_attacked(self.general_square(color), 1 - color)
+
+    def piece_destinations(self, square, defended=False):
+        """
+        Lists the squares the piece on a square can move to according to its movement rules and the pieces in its
+        way, without considering whether the move leaves its own General in check
+        :param square: square index of the piece
+        :param defended: True to also list the squares it would reach but can't capture on (its own pieces, and for a
+                         Cannon the Cannons), which makes the list the squares it attacks as square_attacked tests them
+        :return: list of square indices
+        """
+        code = self._squares[square]
+        if code == 0:
+            return []
+        color, piece_type = (code - 1) // 7, (code - 1) % 7
+        own = 0 if defended else self._colors[color]
+        squares = self._squares
+        destinations = []
+
+        if piece_type == CHARIOT:
+            for ray in RAYS[square]:
+                for other in ray:
+                    if squares[other] == 0:
+                        destinations.append(other)
+                    else:
+                        if not own >> other & 1:
+                            destinations.append(other)
+                        break
+        elif piece_type == CANNON:
+            for ray in RAYS[square]:
+                screened = False
+                for other in ray:
+                    other_code = squares[other]
+                    if not screened:
+                        if other_code != 0:
+                            if (other_code - 1) % 7 == CANNON:
+                                break
+                            screened = True
+                    elif other_code == 0:
+                        destinations.append(other)
+                    else:
+                        if defended or not own >> other & 1 and (other_code - 1) % 7 != CANNON:
+                            destinations.append(other)
+                        break
+        elif piece_type == HORSE or piece_type == ELEPHANT:
+            occupied = self._colors[BLUE] | self._colors[RED]
+            for other, legs in (HORSE_MOVES if piece_type == HORSE else ELEPHANT_MOVES)[square]:
+                if not occupied & legs and not own >> other & 1:
+                    destinations.append(other)
+        else:
+            table = SOLDIER_MOVES if piece_type == SOLDIER else PALACE_MOVES
+            for other in table[color][square]:
+                if not own >> other & 1:
+                    destinations.append(other)
+        return destinations
+
+    def pseudo_legal_moves(self, color=None):
+        """
+        Lists every move allowed by the movement rules, without considering whether it leaves the General in check
+        :param color: BLUE or RED (the side to move if not given)
+        :return: list of encoded moves
+        """
+        if color is None:
+            color = self._side
+        moves = []
+        pieces = self._colors[color]
+        while pieces:
+            low_bit = pieces & -pieces
+            square = low_bit.bit_length() - 1
+            pieces ^= low_bit
+            for destination in self.piece_destinations(square):
+                moves.append(square << 7 | destination)
+        return moves
+
+    def do_move(self, move):
+        """
+        Moves a piece on the board (does not change the side to move or validate the move)
+        :param move: encoded move
+        :return: code of the captured piece (0 if nothing was captured)
+        """
+        from_square, to_square = move >> 7, move & 127
+        squares = self._squares
+        code = squares[from_square]
+        captured = squares[to_square]
+        from_bit = 1 << from_square
+        to_bit = 1 << to_square
+        color = (code - 1) // 7
+        keys = ZOBRIST_PIECE_KEYS[code]
+        if captured:
+            self._bitboards[captured - 1] ^= to_bit
+            self._colors[1 - color] ^= to_bit
+            self._hash ^= ZOBRIST_PIECE_KEYS[captured][to_square]
+        self._bitboards[code - 1] ^= from_bit | to_bit
+        self._colors[color] ^= from_bit | to_bit
+        self._hash ^= keys[from_square] ^ keys[to_square]
+        squares[to_square] = code
+        squares[from_square] = 0
+        return captured
+
+    def undo_move(self, move, captured):
+        """
+        Reverses do_move
+        :param move: encoded move
+        :param captured: code returned by do_move
+        """
+        from_square, to_square = move >> 7, move & 127
+        squares = self._squares
+        code = squares[to_square]
+        from_bit = 1 << from_square
+        to_bit = 1 << to_square
+        color = (code - 1) // 7
+        keys = ZOBRIST_PIECE_KEYS[code]
+        self._bitboards[code - 1] ^= from_bit | to_bit
+        self._colors[color] ^= from_bit | to_bit
+        self._hash ^= keys[from_square] ^ keys[to_square]
+        squares[from_square] = code
+        squares[to_square] = captured
+        if captured:
+            self._bitboards[captured - 1] ^= to_bit
+            self._colors[1 - color] ^= to_bit
+            self._hash ^= ZOBRIST_PIECE_KEYS[captured][to_square]
+
+    def push_move(self, move):
+        """
+        Makes a move and passes the turn to the other player, recording what is needed to take it back with pop_move.
+        The move is not validated.
+        :param move: encoded move (from and to squares the same to pass the turn)
+        """
+        previous_hash = self._hash
+        captured = 0
+        if move >> 7 != move & 127:
+            captured = self.do_move(move)
+        self._undo_stack.append((move, captured, self._side, self._game_state, previous_hash))
+        self._side = 1 - self._side
+        self._hash ^= ZOBRIST_RED_TO_MOVE
+
+    def pop_move(self):
+        """
+        Takes back the most recent move made by push_move or make_move
+        :return: True - if a move was taken back
+                 False - if there are no moves to take back
+        """
+        if not self._undo_stack:
+            return False
+        move, captured, self._side, self._game_state, previous_hash = self._undo_stack.pop()
+        if move >> 7 != move & 127:
+            self.undo_move(move, captured)
+        self._hash = previous_hash
+        return True
+
+    def get_move_history(self):
+        """
+        Getter method for the moves made so far
+        :return: list of encoded moves in the order they were made
+        """
+        return [record[0] for record in self._undo_stack]
+
+    def move_is_legal(self, move):
+        """
+        Determines if a pseudo-legal move keeps the mover's General out of check
+        :param move: encoded move
+        :return: True - if the move is legal
+                 False - if the move leaves the General in check
+        """
+        color = (self._squares[move >> 7] - 1) // 7
+        captured = self.do_move(move)
+        in_check = self.square_attacked(self.general_square(color), 1 - color)
+        self.undo_move(move, captured)
+        return not in_check
+
+    def generate_legal_moves(self, color=None):
+        """
+        Lists every legal move (moves that don't leave the player's General in check). Passing is not included.
+        :param color: BLUE or RED (the side to move if not given)
+        :return: list of encoded moves
+        """
+        return [move for move in self.pseudo_legal_moves(color) if self.move_is_legal(move)]
+
+    def has_legal_move(self, color):
+        """
+        Determines if a player has at least one legal move
+        :param color: BLUE or RED
+        :return: True - if a legal move exists
+                 False - if the player has no legal moves
+        """
+        for move in self.pseudo_legal_moves(color):
+            if self.move_is_legal(move):
+                return True
+        return False
+
+    def perft(self, depth):
+        """
+        Counts the legal move sequences of a given length from the current position (same result as
+        JanggiGame.perft)
+        :param depth: number of moves in each sequence
+        :return: number of move sequences
+        """
+        if depth == 0:
+            return 1
+
+        moves = self.generate_legal_moves()
+        if depth == 1:
+            return len(moves)
+
+        nodes = 0
+        for move in moves:
+            self.push_move(move)
+            nodes += self.perft(depth - 1)
+            self.pop_move()
+        return nodes
+
+    def legal_moves(self, player_color):
+        """
+        Lists every legal move for a player in algebraic notation (same result as JanggiGame.legal_moves)
+        :param player_color: 'red' or 'blue'
+        :return: list of (from_location, to_location) tuples
+        """
+        return [(SQUARE_NAMES[move >> 7], SQUARE_NAMES[move & 127])
+                for move in self.generate_legal_moves(COLORS.index(player_color))]
+
+    def make_move(self, from_location, to_location):
+        """
+        Performs the move of the player's turn (same behavior as JanggiGame.make_move)
+        :param from_location: location to move from
+        :param to_location: location to move to
+        :return: False - if the move cannot be performed
+                 True - if the indicated move is performed
+        """
+        if self._game_state != 'UNFINISHED':
+            return False
+        if from_location not in SQUARE_INDEX or to_location not in SQUARE_INDEX:
+            return False
+
+        color = self._side
+        from_square = SQUARE_INDEX[from_location]
+        to_square = SQUARE_INDEX[to_location]
+        code = self._squares[from_square]
+        if code == 0 or (code - 1) // 7 != color:
+            return False
+
+        # passing the turn is allowed as long as the player isn't in check
+        move = encode_move(from_square, to_square)
+        if from_square == to_square:
+            if self.square_attacked(self.general_square(color), 1 - color):
+                return False
+        elif to_square not in self.piece_destinations(from_square) or not self.move_is_legal(move):
+            return False
+
+        self.push_move(move)
+        if self.square_attacked(self.general_square(self._side), color) and not self.has_legal_move(self._side):
+            self._game_state = 'BLUE_WON' if color == BLUE else 'RED_WON'
+        return True
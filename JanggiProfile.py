@@ -0,0 +1,351 @@
+# Description: Opt-in instrumentation of the rules engine. While enabled, calls to the hot JanggiGame methods
+#              (INSTRUMENTED_METHODS) are counted and timed, globally and per game, into latency histograms with
+#              power-of-two buckets, and the slowest calls are kept with the position they were made in. When
+#              disabled the original methods are back in place, so there is no overhead at all.
+#
+#              with capture() as scope:                    # enables instrumentation for the with block
+#                  game.make_move('c7', 'c6')
+#              print(scope.get_stats().get_summary())
+#
+#              Times are inclusive (make_move includes the valid_move and test_move calls it makes). A scope only
+#              records the calls made by the thread that entered it, while the global and per-game statistics record
+#              the calls of every thread. Counters are updated without locks, so counts from several threads at once
+#              may be slightly low.
+
+import functools
+import heapq
+import threading
+import time
+import weakref
+
+from JanggiGame import JanggiGame
+
+INSTRUMENTED_METHODS = ('make_move', 'valid_move', 'path_is_blocked', 'test_move', 'is_in_check',
+                        'checkmate_detected')
+
+# histogram bucket i holds calls that took less than 2**i nanoseconds (and at least 2**(i - 1))
+HISTOGRAM_BUCKETS = 40
+
+# slowest calls kept by each set of statistics
+SLOWEST_CALLS = 20
+
+
+class LatencyHistogram:
+    """
+    Represents the latencies of the calls to one method, in power-of-two nanosecond buckets
+    """
+
+    __slots__ = ('_buckets', '_count', '_total', '_max')
+
+    def __init__(self):
+        """
+        Initializes an empty histogram
+        """
+        self._buckets = [0] * HISTOGRAM_BUCKETS
+        self._count = 0
+        self._total = 0
+        self._max = 0
+
+    def record(self, nanoseconds):
+        """
+        Adds one call to the histogram
+        :param nanoseconds: time the call took
+        """
+        self._buckets[min(nanoseconds.bit_length(), HISTOGRAM_BUCKETS - 1)] += 1
+        self._count += 1
+        self._total += nanoseconds
+        if nanoseconds > self._max:
+            self._max = nanoseconds
+
+    def get_count(self):
+        """
+        Getter method for the number of calls recorded
+        :return: number of calls
+        """
+        return self._count
+
+    def get_total(self):
+        """
+        Getter method for the total time of the calls recorded
+        :return: nanoseconds
+        """
+        return self._total
+
+    def get_max(self):
+        """
+        Getter method for the slowest call recorded
+        :return: nanoseconds
+        """
+        return self._max
+
+    def get_mean(self):
+        """
+        Works out the average time of the calls recorded
+        :return: nanoseconds (0 if nothing was recorded)
+        """
+        return self._total / self._count if self._count else 0
+
+    def get_buckets(self):
+        """
+        Getter method for the bucket counts
+        :return: list of (upper bound in nanoseconds, number of calls) tuples for the buckets holding calls
+        """
+        return [(1 << index, count) for index, count in enumerate(self._buckets) if count]
+
+    def get_percentile(self, percentile):
+        """
+        Estimates a latency percentile as the upper bound of the bucket holding it
+        :param percentile: percentile to estimate (0-100)
+        :return: nanoseconds (0 if nothing was recorded)
+        """
+        if self._count == 0:
+            return 0
+        rank = self._count * percentile / 100
+        seen = 0
+        for index, count in enumerate(self._buckets):
+            seen += count
+            if seen >= rank and count:
+                return min(1 << index, self._max)
+        return self._max
+
+
+class CallStats:
+    """
+    Represents the histograms of every instrumented method and the slowest calls, for one scope or game
+    """
+
+    __slots__ = ('_histograms', '_slowest')
+
+    def __init__(self):
+        """
+        Initializes empty statistics
+        """
+        self._histograms = {name: LatencyHistogram() for name in INSTRUMENTED_METHODS}
+        self._slowest = []
+
+    def record(self, name, nanoseconds, game):
+        """
+        Adds one call
+        :param name: name of the method called
+        :param nanoseconds: time the call took
+        :param game: JanggiGame object the call was made on
+        """
+        self._histograms[name].record(nanoseconds)
+        slowest = self._slowest
+        if len(slowest) < SLOWEST_CALLS:
+            heapq.heappush(slowest, (nanoseconds, name, game.get_position_hash(), game.get_move_count()))
+        elif nanoseconds > slowest[0][0]:
+            heapq.heapreplace(slowest, (nanoseconds, name, game.get_position_hash(), game.get_move_count()))
+
+    def get_histogram(self, name):
+        """
+        Getter method for the histogram of one method
+        :param name: one of INSTRUMENTED_METHODS
+        :return: LatencyHistogram object
+        """
+        return self._histograms[name]
+
+    def get_slowest_calls(self):
+        """
+        Lists the slowest calls recorded, with the position each was made in (after the call)
+        :return: list of (nanoseconds, method name, position hash, number of moves made in the game) tuples,
+                 slowest first
+        """
+        return sorted(self._slowest, reverse=True)
+
+    def get_summary(self):
+        """
+        Summarizes the statistics of every method that was called
+        :return: dictionary of method name to a dictionary with 'calls', 'total_ms', 'mean_us', 'p50_us', 'p99_us'
+                 and 'max_us'
+        """
+        summary = {}
+        for name, histogram in self._histograms.items():
+            if histogram.get_count():
+                summary[name] = {'calls': histogram.get_count(), 'total_ms': histogram.get_total() / 1e6,
+                                 'mean_us': histogram.get_mean() / 1e3,
+                                 'p50_us': histogram.get_percentile(50) / 1e3,
+                                 'p99_us': histogram.get_percentile(99) / 1e3, 'max_us': histogram.get_max() / 1e3}
+        return summary
+
+
+class Profiler:
+    """
+    Represents the instrumentation of JanggiGame: global statistics, statistics per game (dropped when the game is)
+    and the scopes currently capturing
+    """
+
+    def __init__(self):
+        """
+        Initializes the profiler (disabled)
+        """
+        self._lock = threading.Lock()
+        self._enabled = 0
+        self._originals = {}
+        self._stats = CallStats()
+        self._game_stats = weakref.WeakKeyDictionary()
+        self._captures = []
+
+    def is_enabled(self):
+        """
+        Determines if calls are being instrumented
+        :return: True - if instrumentation is on
+                 False - if it is off
+        """
+        return self._enabled > 0
+
+    def enable(self):
+        """
+        Turns instrumentation on by putting timing wrappers in place of the instrumented methods (calls nest, so
+        each enable needs a disable)
+        """
+        with self._lock:
+            self._enabled += 1
+            if self._enabled == 1:
+                for name in INSTRUMENTED_METHODS:
+                    self._originals[name] = JanggiGame.__dict__[name]
+                    setattr(JanggiGame, name, self._wrap(name, self._originals[name]))
+
+    def disable(self):
+        """
+        Turns instrumentation off once every enable has been matched, restoring the original methods
+        """
+        with self._lock:
+            if self._enabled == 0:
+                return
+            self._enabled -= 1
+            if self._enabled == 0:
+                for name, method in self._originals.items():
+                    setattr(JanggiGame, name, method)
+                self._originals.clear()
+
+    def _wrap(self, name, method):
+        """
+        Builds the timing wrapper of a method
+        :param name: method name
+        :param method: original function
+        :return: wrapper function
+        """
+        perf_counter_ns = time.perf_counter_ns
+
+        @functools.wraps(method)
+        def wrapper(game, *args):
+            start = perf_counter_ns()
+            try:
+                return method(game, *args)
+            finally:
+                self.record(name, perf_counter_ns() - start, game)
+        return wrapper
+
+    def record(self, name, nanoseconds, game):
+        """
+        Adds one call to the global statistics, the game's statistics and every scope capturing on the calling thread
+        :param name: name of the method called
+        :param nanoseconds: time the call took
+        :param game: JanggiGame object the call was made on
+        """
+        self._stats.record(name, nanoseconds, game)
+        game_stats = self._game_stats.get(game)
+        if game_stats is None:
+            game_stats = self._game_stats[game] = CallStats()
+        game_stats.record(name, nanoseconds, game)
+        captures = self._captures
+        if captures:
+            thread_id = threading.get_ident()
+            for scope in captures:
+                if scope.get_thread_id() == thread_id:
+                    scope.get_stats().record(name, nanoseconds, game)
+
+    def get_stats(self):
+        """
+        Getter method for the statistics of every call recorded since the last reset
+        :return: CallStats object
+        """
+        return self._stats
+
+    def get_game_stats(self, game):
+        """
+        Getter method for the statistics of the calls made on one game
+        :param game: JanggiGame object
+        :return: CallStats object (empty if nothing was recorded for the game)
+        """
+        return self._game_stats.get(game) or CallStats()
+
+    def reset(self):
+        """
+        Forgets the global and per-game statistics
+        """
+        self._stats = CallStats()
+        self._game_stats = weakref.WeakKeyDictionary()
+
+    def start_capture(self, scope):
+        """
+        Enables instrumentation and starts recording into a scope
+        :param scope: CaptureScope object
+        """
+        self._captures = self._captures + [scope]
+        self.enable()
+
+    def stop_capture(self, scope):
+        """
+        Stops recording into a scope and drops the enable made by start_capture
+        :param scope: CaptureScope object
+        """
+        self._captures = [other for other in self._captures if other is not scope]
+        self.disable()
+
+
+class CaptureScope:
+    """
+    Represents a scoped capture: the calls made by one thread between entering and leaving a with block
+    """
+
+    def __init__(self, profiler):
+        """
+        Initializes the scope
+        :param profiler: Profiler object to capture from
+        """
+        self._profiler = profiler
+        self._stats = CallStats()
+        self._thread_id = None
+
+    def __enter__(self):
+        """
+        Starts capturing the calls made by the current thread
+        :return: the scope
+        """
+        self._thread_id = threading.get_ident()
+        self._profiler.start_capture(self)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """
+        Stops capturing (the statistics stay readable)
+        """
+        self._profiler.stop_capture(self)
+
+    def get_stats(self):
+        """
+        Getter method for the statistics of the calls made in the scope
+        :return: CallStats object
+        """
+        return self._stats
+
+    def get_thread_id(self):
+        """
+        Getter method for the thread the scope captures
+        :return: threading.get_ident() of the thread that entered the scope (None before it is entered)
+        """
+        return self._thread_id
+
+
+# profiler used by the module functions
+PROFILER = Profiler()
+
+
+def capture():
+    """
+    Instruments the calls the current thread makes in a with block
+    :return: CaptureScope object to use in a with statement
+    """
+    return CaptureScope(PROFILER)
@@ -0,0 +1,315 @@
+# Description: Compact binary formats for positions and game records, for archiving and sending games.
+#
+#              Position (13-29 bytes): a 12-byte bitboard of the occupied squares (little-endian, bit = square index),
+#              the piece code - 1 of each occupied square in square order as 4-bit values (low nibble first), and a
+#              byte holding the side to move (bit 0) and the game state (bits 1-2).
+#
+#              Game file: the 4-byte MAGIC, then one record per game: a flags byte (result in bits 0-1, bit 2 set if
+#              the game starts from its own position), the number of moves as a varint, the start position if there
+#              is one, and 2 bytes per move (little-endian JanggiPosition.encode_move values; a pass has equal from and
+#              to squares). Files are read and written one game at a time, so they can be larger than memory.
+
+import sys
+from array import array
+
+from JanggiGame import JanggiGame
+from JanggiPosition import COLORS, GAME_STATES, SQUARE_INDEX, SQUARE_NAMES, Position, encode_move
+
+MAGIC = b'JGR\x01'
+
+# result of a game that ended without a winner (reached a move limit or was stopped)
+DRAW = 'DRAW'
+RESULTS = GAME_STATES + [DRAW]
+
+# flags byte of a game record
+RESULT_MASK = 3
+HAS_START_POSITION = 4
+
+# bytes read from a game file at a time
+READ_SIZE = 1 << 16
+
+
+class GameRecord:
+    """
+    Represents a game: the moves played, the result and the position the game started from
+    """
+
+    __slots__ = ('_moves', '_result', '_seed', '_start')
+
+    def __init__(self, moves, result, seed=None, start=None):
+        """
+        Initializes the game record
+        :param moves: array('H') of encoded moves (see JanggiPosition.encode_move); a pass has equal from and to squares
+        :param result: 'UNFINISHED', 'BLUE_WON', 'RED_WON' or 'DRAW'
+        :param seed: random seed the game was played with (None if unknown; not stored in game files)
+        :param start: start position encoded by encode_position (None for the starting setup)
+        """
+        self._moves = moves
+        self._result = result
+        self._seed = seed
+        self._start = start
+
+    def get_moves(self):
+        """
+        Getter method for the moves of the game
+        :return: array('H') of encoded moves
+        """
+        return self._moves
+
+    def get_move_list(self):
+        """
+        Getter method for the moves of the game in algebraic notation
+        :return: list of (from_location, to_location) tuples
+        """
+        return [(SQUARE_NAMES[move >> 7], SQUARE_NAMES[move & 127]) for move in self._moves]
+
+    def get_result(self):
+        """
+        Getter method for the result of the game
+        :return: 'UNFINISHED', 'BLUE_WON', 'RED_WON' or 'DRAW'
+        """
+        return self._result
+
+    def get_seed(self):
+        """
+        Getter method for the random seed the game was played with
+        :return: integer seed, or None
+        """
+        return self._seed
+
+    def get_start_position(self):
+        """
+        Getter method for the position the game started from
+        :return: position encoded by encode_position, or None for the starting setup
+        """
+        return self._start
+
+
+def encode_position(game):
+    """
+    Encodes the piece placement, side to move and game state of a position
+    :param game: JanggiGame or Position object
+    :return: bytes
+    """
+    if not isinstance(game, Position):
+        game = Position.from_game(game)
+    squares = game.get_squares()
+    codes = [code - 1 for code in squares if code]
+    nibbles = bytearray((len(codes) + 1) // 2)
+    for index, code in enumerate(codes):
+        nibbles[index >> 1] |= code << (4 * (index & 1))
+    state = GAME_STATES.index(game.get_game_state()) << 1 | game.get_side_to_move()
+    return game.get_occupied().to_bytes(12, 'little') + bytes(nibbles) + bytes([state])
+
+
+def decode_position(data, offset=0):
+    """
+    Decodes a position encoded by encode_position
+    :param data: bytes-like object holding the position
+    :param offset: index of the position's first byte in data
+    :return: (pieces, current player, game state, offset after the position) tuple, with pieces as a list of
+             (location, color, piece type) tuples as taken by Position and JanggiGame.set_position
+    :raises EOFError: if data ends before the position does
+    """
+    if offset + 12 > len(data):
+        raise EOFError('position is cut off')
+    occupied = int.from_bytes(data[offset:offset + 12], 'little')
+    count = bin(occupied).count('1')
+    end = offset + 12 + (count + 1) // 2 + 1
+    if end > len(data):
+        raise EOFError('position is cut off')
+
+    pieces = []
+    index = 0
+    while occupied:
+        lowest_bit = occupied & -occupied
+        code = data[offset + 12 + (index >> 1)] >> (4 * (index & 1)) & 15
+        pieces.append((SQUARE_NAMES[lowest_bit.bit_length() - 1], code // 7, code % 7))
+        occupied ^= lowest_bit
+        index += 1
+    state = data[end - 1]
+    return pieces, COLORS[state & 1], GAME_STATES[state >> 1], end
+
+
+# the starting setup, encoded (records starting from it don't store a start position)
+STARTING_POSITION = encode_position(Position())
+
+
+def position_to_game(data):
+    """
+    Sets up a JanggiGame from an encoded position
+    :param data: bytes returned by encode_position
+    :return: JanggiGame object
+    """
+    pieces, current_player, game_state, _ = decode_position(data)
+    game = JanggiGame()
+    game.set_position(pieces, current_player, game_state)
+    return game
+
+
+def encode_start_position(game):
+    """
+    Encodes the position a game started from
+    :param game: JanggiGame or Position object
+    :return: position encoded by encode_position, or None if the game started from the starting setup
+    """
+    if isinstance(game, JanggiGame):
+        start = game.get_start_position()
+        if start is None:
+            return None
+        position = Position(start[0], start[1])
+        position.set_game_state(start[2])
+    else:
+        # taking back every move of a copy leaves the position the moves were made from
+        position = game.copy()
+        while position.pop_move():
+            pass
+    data = encode_position(position)
+    return None if data == STARTING_POSITION else data
+
+
+def record_from_game(game, result=None, start=None):
+    """
+    Makes a game record of the moves made in a game
+    :param game: JanggiGame or Position object
+    :param result: result to record (the game's state if not given)
+    :param start: position the game started from, encoded by encode_position (the position the game was set up with
+                  if not given, see encode_start_position)
+    :return: GameRecord object
+    """
+    moves = game.get_move_history()
+    if isinstance(game, JanggiGame):
+        moves = [encode_move(SQUARE_INDEX[from_location], SQUARE_INDEX[to_location])
+                 for from_location, to_location in moves]
+    return GameRecord(array('H', moves), game.get_game_state() if result is None else result,
+                      start=encode_start_position(game) if start is None else start)
+
+
+def record_to_game(record):
+    """
+    Replays a game record into a JanggiGame. The moves are not validated.
+    :param record: GameRecord object
+    :return: JanggiGame object after the last move, with the recorded result as its state (UNFINISHED for a draw)
+    """
+    game = JanggiGame() if record.get_start_position() is None else position_to_game(record.get_start_position())
+    for move in record.get_moves():
+        game.push_move(SQUARE_NAMES[move >> 7], SQUARE_NAMES[move & 127])
+    if record.get_result() in GAME_STATES:
+        game.set_game_state(record.get_result())
+    return game
+
+
+def encode_record(record):
+    """
+    Encodes a game record as stored in game files
+    :param record: GameRecord object
+    :return: bytes
+    """
+    start = record.get_start_position()
+    header = bytearray([RESULTS.index(record.get_result()) | (HAS_START_POSITION if start is not None else 0)])
+    count = len(record.get_moves())
+    # varint: 7 bits per byte, high bit set on all but the last byte
+    while count >= 128:
+        header.append(count & 127 | 128)
+        count >>= 7
+    header.append(count)
+    if start is not None:
+        header += start
+    moves = array('H', record.get_moves())
+    if sys.byteorder == 'big':
+        moves.byteswap()
+    return bytes(header) + moves.tobytes()
+
+
+def decode_record_header(data, offset=0):
+    """
+    Decodes the part of a game record before its moves, so the moves can be read in place (from a memory-mapped file,
+    for example) without copying the record
+    :param data: bytes-like object
+    :param offset: index of the record's first byte in data
+    :return: (result, (start, end) offsets of the start position or None, offset of the moves, number of moves) tuple
+    :raises EOFError: if data ends before the record does
+    """
+    if offset >= len(data):
+        raise EOFError('record is cut off')
+    flags = data[offset]
+    position = offset + 1
+    count = 0
+    shift = 0
+    while True:
+        if position >= len(data):
+            raise EOFError('record is cut off')
+        byte = data[position]
+        position += 1
+        count |= (byte & 127) << shift
+        shift += 7
+        if byte < 128:
+            break
+
+    start = None
+    if flags & HAS_START_POSITION:
+        end = decode_position(data, position)[3]
+        start = (position, end)
+        position = end
+
+    if position + 2 * count > len(data):
+        raise EOFError('record is cut off')
+    return RESULTS[flags & RESULT_MASK], start, position, count
+
+
+def decode_record(data, offset=0):
+    """
+    Decodes a game record stored at an offset in a buffer (bytes, or a memoryview of a memory-mapped file)
+    :param data: bytes-like object
+    :param offset: index of the record's first byte in data
+    :return: (GameRecord object, offset after the record) tuple
+    :raises EOFError: if data ends before the record does
+    """
+    result, start, position, count = decode_record_header(data, offset)
+    end = position + 2 * count
+    moves = array('H')
+    moves.frombytes(data[position:end])
+    if sys.byteorder == 'big':
+        moves.byteswap()
+    return GameRecord(moves, result, start=None if start is None else bytes(data[start[0]:start[1]])), end
+
+
+def write_games(file, records):
+    """
+    Writes game records to a binary file, one at a time
+    :param file: binary file object open for writing (at the start of the file)
+    :param records: iterable of GameRecord objects
+    :return: number of games written
+    """
+    file.write(MAGIC)
+    count = 0
+    for record in records:
+        file.write(encode_record(record))
+        count += 1
+    return count
+
+
+def read_games(file):
+    """
+    Reads the game records of a binary file one at a time, holding only a small part of the file in memory
+    :param file: binary file object open for reading (at the start of the file)
+    :return: generator of GameRecord objects
+    :raises ValueError: if the file is not a game file or ends partway through a game
+    """
+    if file.read(len(MAGIC)) != MAGIC:
+        raise ValueError('not a Janggi game file')
+    buffer = b''
+    offset = 0
+    while True:
+        try:
+            record, offset = decode_record(buffer, offset)
+        except EOFError:
+            data = file.read(READ_SIZE)
+            if not data:
+                if offset < len(buffer):
+                    raise ValueError('game file ends partway through a game')
+                return
+            buffer = buffer[offset:] + data
+            offset = 0
+            continue
+        yield record
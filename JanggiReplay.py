@@ -0,0 +1,201 @@
+# Description: Streaming replay and validation of recorded games. Games given as lists of algebraic move pairs are
+#              replayed with the rules engine one at a time, optionally on a pool of worker processes, and a result is
+#              yielded for each game in input order, with the first illegal move if there is one. Only a bounded
+#              number of games is held in memory at once, so move logs of any size can be checked.
+#
+#              python JanggiReplay.py MOVE_LOG [--workers 4] [--engine position|game]
+#
+#              Move logs have one game per line, moves separated by spaces and written from-to (c7-c6); blank lines
+#              and lines starting with # are skipped.
+
+import argparse
+import itertools
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from JanggiGame import JanggiGame
+from JanggiPosition import Position
+
+
+class ReplayResult:
+    """
+    Represents the outcome of replaying one recorded game
+    """
+
+    __slots__ = ('_index', '_move_count', '_first_illegal_ply', '_game_state')
+
+    def __init__(self, index, move_count, first_illegal_ply, game_state):
+        """
+        Initializes the replay result
+        :param index: position of the game in the input (0 for the first game)
+        :param move_count: number of moves in the recorded game
+        :param first_illegal_ply: index in the game's move list of the first move the engine rejected (None if every
+                                  move was accepted)
+        :param game_state: game state after the last accepted move
+        """
+        self._index = index
+        self._move_count = move_count
+        self._first_illegal_ply = first_illegal_ply
+        self._game_state = game_state
+
+    def get_index(self):
+        """
+        Getter method for the position of the game in the input
+        :return: game index
+        """
+        return self._index
+
+    def get_move_count(self):
+        """
+        Getter method for the number of moves in the recorded game
+        :return: number of moves
+        """
+        return self._move_count
+
+    def get_first_illegal_ply(self):
+        """
+        Getter method for the first move the engine rejected
+        :return: index of the move in the game's move list, or None if every move was accepted
+        """
+        return self._first_illegal_ply
+
+    def get_game_state(self):
+        """
+        Getter method for the game state after the last accepted move
+        :return: 'UNFINISHED', 'BLUE_WON' or 'RED_WON'
+        """
+        return self._game_state
+
+    def is_valid(self):
+        """
+        Determines if every move of the game was accepted
+        :return: True - if the game is valid
+                 False - if a move was rejected
+        """
+        return self._first_illegal_ply is None
+
+
+def replay_game(game, moves):
+    """
+    Replays a recorded game on a fresh game, stopping at the first move that is rejected
+    :param game: Position or JanggiGame object to replay on (a Position is reset first)
+    :param moves: list of (from_location, to_location) moves
+    :return: (index of the first rejected move or None, game state after the last accepted move) tuple
+    """
+    if isinstance(game, Position):
+        game.reset()
+    for ply, (from_location, to_location) in enumerate(moves):
+        if not game.make_move(from_location, to_location):
+            return ply, game.get_game_state()
+    return None, game.get_game_state()
+
+
+def replay_chunk(task):
+    """
+    Replays a chunk of games on one reused Position (run in a worker process)
+    :param task: (index of the first game, list of games as move lists, engine) tuple
+    :return: list of ReplayResult objects
+    """
+    first_index, games, engine = task
+    position = Position() if engine == 'position' else None
+    results = []
+    for index, moves in enumerate(games, first_index):
+        first_illegal_ply, game_state = replay_game(position if position is not None else JanggiGame(), moves)
+        results.append(ReplayResult(index, len(moves), first_illegal_ply, game_state))
+    return results
+
+
+def chunk_games(games, chunk_size, engine):
+    """
+    Groups a stream of games into replay tasks
+    :param games: iterable of move lists
+    :param chunk_size: number of games per task
+    :param engine: 'position' or 'game'
+    :return: generator of (index of the first game, list of move lists, engine) tuples
+    """
+    iterator = iter(games)
+    for first_index in itertools.count(0, chunk_size):
+        chunk = [list(moves) for moves in itertools.islice(iterator, chunk_size)]
+        if len(chunk) == 0:
+            return
+        yield first_index, chunk, engine
+
+
+def replay_games(games, workers=1, chunk_size=256, engine='position', max_pending_chunks=None):
+    """
+    Replays a stream of recorded games and yields a result for each, in input order. The games are read from the
+    input only as fast as they are replayed, so at most max_pending_chunks chunks are in memory at once.
+    :param games: iterable of games, each a list of (from_location, to_location) moves (a generator is fine)
+    :param workers: number of worker processes (1 to replay in this process)
+    :param chunk_size: number of games sent to a worker at a time
+    :param engine: 'position' to replay on the bitboard Position or 'game' to replay on JanggiGame (same rules)
+    :param max_pending_chunks: chunks being replayed or waiting at once (twice the number of workers if not given)
+    :return: generator of ReplayResult objects
+    """
+    tasks = chunk_games(games, chunk_size, engine)
+    if workers <= 1:
+        for task in tasks:
+            yield from replay_chunk(task)
+        return
+
+    max_pending_chunks = max_pending_chunks or 2 * workers
+    with ProcessPoolExecutor(workers) as executor:
+        pending = []
+        for task in itertools.islice(tasks, max_pending_chunks):
+            pending.append(executor.submit(replay_chunk, task))
+        while len(pending) != 0:
+            results = pending.pop(0).result()
+            # top up the pipeline before handing results to the caller
+            for task in itertools.islice(tasks, 1):
+                pending.append(executor.submit(replay_chunk, task))
+            yield from results
+
+
+def read_move_log(file):
+    """
+    Reads the games of a text move log one at a time
+    :param file: text file object with one game per line, moves written from-to and separated by spaces
+    :return: generator of lists of (from_location, to_location) moves
+    """
+    for line in file:
+        line = line.strip()
+        if len(line) == 0 or line.startswith('#'):
+            continue
+        yield [tuple(move.split('-', 1)) if '-' in move else (move, '') for move in line.split()]
+
+
+def write_move_log(file, games):
+    """
+    Writes games as a text move log (the format read by read_move_log)
+    :param file: text file object
+    :param games: iterable of lists of (from_location, to_location) moves
+    :return: number of games written
+    """
+    count = 0
+    for moves in games:
+        file.write(' '.join(from_location + '-' + to_location for from_location, to_location in moves) + '\n')
+        count += 1
+    return count
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Replay and validate a Janggi move log')
+    parser.add_argument('move_log', help='text file with one game per line (moves written from-to)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='worker processes')
+    parser.add_argument('--engine', choices=['position', 'game'], default='position', help='rules engine to use')
+    parser.add_argument('--chunk-size', type=int, default=256, help='games sent to a worker at a time')
+    arguments = parser.parse_args()
+
+    start = time.perf_counter()
+    game_count = move_count = invalid_count = 0
+    with open(arguments.move_log) as log:
+        for result in replay_games(read_move_log(log), arguments.workers, arguments.chunk_size, arguments.engine):
+            game_count += 1
+            move_count += result.get_move_count()
+            if not result.is_valid():
+                invalid_count += 1
+                print('game %d: illegal move at ply %d' % (result.get_index(), result.get_first_illegal_ply()))
+    elapsed = time.perf_counter() - start
+    print('%d games, %d moves, %d invalid in %.2fs (%.0f moves/hour)' %
+          (game_count, move_count, invalid_count, elapsed, move_count / elapsed * 3600 if elapsed > 0 else 0))
@@ -0,0 +1,645 @@
+# Description: asyncio game server. Clients send one JSON request per line over TCP or a Unix socket and get one JSON
+#              response per line; games are hosted by a GameManager. Spectators receive batched game updates, and
+#              move validation and computer-player searches run on executors so the event loop never waits on them.
+#              LocalClient speaks the same protocol in-process for tests and load testing.
+#
+#              python JanggiServer.py [--host 127.0.0.1] [--port 8765 | --unix PATH] [--workers 4]
+#              python JanggiServer.py --load-test 1000 [--moves 20]
+#
+#              Requests:  {"id": 1, "op": "create_game"}
+#                         {"id": 2, "op": "make_move", "game": "1", "from": "c7", "to": "c6"}
+#                         {"id": 3, "op": "get_game_state", "game": "1"}
+#                         {"id": 4, "op": "legal_moves", "game": "1"}            ("player": "red" is optional)
+#                         {"id": 5, "op": "get_move_history", "game": "1"}
+#                         {"id": 6, "op": "watch", "game": "1"}                  (and "unwatch")
+#                         {"id": 7, "op": "best_move", "game": "1", "depth": 3}
+#                         {"id": 8, "op": "validate_moves", "game": "1", "moves": [["c7", "c6"], ["a10", "a5"]]}
+#              Responses: {"id": 2, "ok": true, "result": true}  or  {"id": 2, "ok": false, "error": "..."}
+#              Updates:   {"event": "update", "game": "1", "state": "UNFINISHED", "current_player": "red",
+#                          "ply": 1, "moves": [["c7", "c6"]]}
+
+import argparse
+import asyncio
+import itertools
+import json
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from JanggiManager import GameManager
+from JanggiPosition import SQUARE_INDEX, Position, encode_move
+
+# longest request line accepted from a client
+MAX_LINE_LENGTH = 4096
+# requests of one connection that may be in progress at once
+MAX_PENDING_REQUESTS = 32
+# spectators whose unsent output grows past this many bytes are disconnected
+MAX_WRITE_BUFFER = 1 << 20
+# deepest search a client may ask best_move for
+MAX_SEARCH_DEPTH = 5
+
+
+class ServerError(Exception):
+    """
+    Raised for a request the server can't carry out; the message is sent back to the client
+    """
+    pass
+
+
+def search_best_move(moves, depth):
+    """
+    Finds the computer player's move after a list of moves (runs in a worker process)
+    :param moves: list of (from_location, to_location) moves played from the starting setup
+    :param depth: search depth in plies
+    :return: (from_location, to_location) tuple, or None if the game is over
+    """
+    from JanggiAI import SearchEngine
+
+    position = Position()
+    for from_location, to_location in moves:
+        position.push_move(encode_move(SQUARE_INDEX[from_location], SQUARE_INDEX[to_location]))
+    return SearchEngine(table_size=1 << 16).best_move(position, depth)
+
+
+class Connection:
+    """
+    Represents a client connected over a socket
+    """
+
+    def __init__(self, writer):
+        """
+        Initializes the connection
+        :param writer: asyncio.StreamWriter of the connection
+        """
+        self._writer = writer
+        self._watching = set()
+        self._pending_requests = asyncio.Semaphore(MAX_PENDING_REQUESTS)
+
+    def get_watching(self):
+        """
+        Getter method for the games the client is watching
+        :return: set of game IDs
+        """
+        return self._watching
+
+    def get_pending_requests(self):
+        """
+        Getter method for the semaphore limiting the requests in progress
+        :return: asyncio.Semaphore object
+        """
+        return self._pending_requests
+
+    def send(self, message):
+        """
+        Queues a message to the client without waiting for it to be sent
+        :param message: JSON-serializable dictionary
+        """
+        self._writer.write(json.dumps(message, separators=(',', ':')).encode() + b'\n')
+
+    async def drain(self):
+        """
+        Waits until the queued messages have been handed to the socket
+        """
+        await self._writer.drain()
+
+    def is_slow(self):
+        """
+        Determines if the client is not reading its messages fast enough
+        :return: True - if too much output is waiting to be sent
+                 False - if not
+        """
+        return self._writer.transport.get_write_buffer_size() > MAX_WRITE_BUFFER
+
+    def close(self):
+        """
+        Closes the connection
+        """
+        self._writer.close()
+
+
+class LocalConnection(Connection):
+    """
+    Represents an in-process client: messages are JSON-encoded as over a socket but kept in a queue
+    """
+
+    def __init__(self):
+        """
+        Initializes the connection
+        """
+        super().__init__(None)
+        self._messages = asyncio.Queue()
+        self._closed = False
+
+    def send(self, message):
+        """
+        Queues a message to the client
+        :param message: JSON-serializable dictionary
+        """
+        if not self._closed:
+            self._messages.put_nowait(json.dumps(message, separators=(',', ':')))
+
+    async def drain(self):
+        """
+        Nothing to wait for in-process
+        """
+        pass
+
+    def is_slow(self):
+        """
+        Determines if the client is not reading its messages fast enough
+        :return: True - if too many messages are waiting
+                 False - if not
+        """
+        return self._messages.qsize() > MAX_PENDING_REQUESTS * 32
+
+    def close(self):
+        """
+        Stops queueing messages
+        """
+        self._closed = True
+
+    async def receive(self):
+        """
+        Waits for the next message to the client
+        :return: decoded message
+        """
+        return json.loads(await self._messages.get())
+
+
+class JanggiServer:
+    """
+    Represents the game server: decodes requests, runs them against a GameManager and batches spectator updates
+    """
+
+    def __init__(self, manager=None, workers=4, search_workers=1, broadcast_interval=0.05):
+        """
+        Initializes the server
+        :param manager: GameManager hosting the games (a new one with the given number of workers if not given)
+        :param workers: number of threads for moves and for reading games (they share one core, see JanggiManager)
+        :param search_workers: number of processes for best_move searches
+        :param broadcast_interval: seconds between batches of spectator updates
+        """
+        self._manager = manager if manager is not None else GameManager(workers)
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='janggi-read')
+        self._search_workers = search_workers
+        self._search_executor = None
+        self._broadcast_interval = broadcast_interval
+        # game ID -> set of spectating connections, and the number of moves already sent to them
+        self._spectators = {}
+        self._broadcast_plies = {}
+        # games with moves not yet sent to their spectators
+        self._updated_games = set()
+        self._broadcast_task = None
+        self._servers = []
+        # connection handler task -> Connection of each connected socket client
+        self._connections = {}
+        self._operations = {'create_game': self.create_game, 'make_move': self.make_move,
+                            'get_game_state': self.get_game_state, 'legal_moves': self.legal_moves,
+                            'get_move_history': self.get_move_history, 'watch': self.watch, 'unwatch': self.unwatch,
+                            'best_move': self.best_move, 'validate_moves': self.validate_moves}
+
+    def get_manager(self):
+        """
+        Getter method for the game manager
+        :return: GameManager object
+        """
+        return self._manager
+
+    async def start(self, host='127.0.0.1', port=8765):
+        """
+        Starts listening on a TCP port
+        :param host: address to listen on
+        :param port: port to listen on
+        """
+        self.start_broadcasting()
+        self._servers.append(await asyncio.start_server(self.handle_connection, host, port,
+                                                        limit=MAX_LINE_LENGTH))
+
+    async def start_unix(self, path):
+        """
+        Starts listening on a Unix socket
+        :param path: path of the socket
+        """
+        self.start_broadcasting()
+        self._servers.append(await asyncio.start_unix_server(self.handle_connection, path, limit=MAX_LINE_LENGTH))
+
+    def start_broadcasting(self):
+        """
+        Starts the task that sends batched updates to spectators (started by start and start_unix)
+        """
+        if self._broadcast_task is None:
+            self._broadcast_task = asyncio.get_running_loop().create_task(self.broadcast_updates())
+
+    async def serve_forever(self):
+        """
+        Serves clients until the server is closed
+        """
+        await asyncio.gather(*[server.serve_forever() for server in self._servers])
+
+    async def close(self):
+        """
+        Stops listening, stops the spectator updates and shuts down the executors and the game manager
+        """
+        for server in self._servers:
+            server.close()
+            await server.wait_closed()
+        self._servers = []
+        # closing the connections ends their handlers
+        for connection in list(self._connections.values()):
+            connection.close()
+        if len(self._connections) != 0:
+            await asyncio.gather(*self._connections, return_exceptions=True)
+        if self._broadcast_task is not None:
+            self._broadcast_task.cancel()
+            try:
+                await self._broadcast_task
+            except asyncio.CancelledError:
+                pass
+            self._broadcast_task = None
+        self._executor.shutdown(wait=True)
+        if self._search_executor is not None:
+            self._search_executor.shutdown(wait=True)
+        self._manager.close()
+
+    async def run_in_executor(self, function, *arguments):
+        """
+        Runs a blocking GameManager call on the server's thread pool
+        :param function: function to call
+        :param arguments: arguments of the function
+        :return: result of the function
+        """
+        return await asyncio.get_running_loop().run_in_executor(self._executor, function, *arguments)
+
+    async def handle_connection(self, reader, writer):
+        """
+        Serves one socket client: each request line is handled in its own task, so a slow request doesn't hold up
+        the ones after it (responses carry the request's id)
+        :param reader: asyncio.StreamReader of the connection
+        :param writer: asyncio.StreamWriter of the connection
+        """
+        connection = Connection(writer)
+        handler_task = asyncio.current_task()
+        self._connections[handler_task] = connection
+        tasks = set()
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except (ValueError, ConnectionError):
+                    break
+                if not line:
+                    break
+                await connection.get_pending_requests().acquire()
+                task = asyncio.get_running_loop().create_task(self.respond(line, connection))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        finally:
+            for game_id in list(connection.get_watching()):
+                self.remove_spectator(game_id, connection)
+            for task in tasks:
+                task.cancel()
+            connection.close()
+            del self._connections[handler_task]
+
+    async def respond(self, line, connection):
+        """
+        Handles a request line and sends the response
+        :param line: request line
+        :param connection: Connection object of the client
+        """
+        try:
+            connection.send(await self.handle_line(line, connection))
+            await connection.drain()
+        except ConnectionError:
+            pass
+        finally:
+            connection.get_pending_requests().release()
+
+    async def handle_line(self, line, connection):
+        """
+        Decodes a request line and carries out the request
+        :param line: request line (str or bytes)
+        :param connection: Connection object of the client
+        :return: response dictionary
+        """
+        try:
+            request = json.loads(line)
+        except ValueError:
+            return {'id': None, 'ok': False, 'error': 'request is not valid JSON'}
+        if not isinstance(request, dict):
+            return {'id': None, 'ok': False, 'error': 'request is not a JSON object'}
+
+        operation = self._operations.get(request.get('op'))
+        if operation is None:
+            return {'id': request.get('id'), 'ok': False, 'error': 'unknown op: ' + str(request.get('op'))}
+        try:
+            return {'id': request.get('id'), 'ok': True, 'result': await operation(request, connection)}
+        except ServerError as error:
+            return {'id': request.get('id'), 'ok': False, 'error': str(error)}
+        except KeyError:
+            return {'id': request.get('id'), 'ok': False, 'error': 'unknown game: ' + str(request.get('game'))}
+        except Exception as error:
+            # any other failure still gets a response, so the client isn't left waiting for one
+            message = 'internal error: %s: %s' % (type(error).__name__, error)
+            return {'id': request.get('id'), 'ok': False, 'error': message}
+
+    def get_request_field(self, request, name):
+        """
+        Reads a required string field of a request
+        :param request: request dictionary
+        :param name: name of the field
+        :return: value of the field
+        :raises ServerError: if the field is missing or not a string
+        """
+        value = request.get(name)
+        if not isinstance(value, str):
+            raise ServerError('missing or invalid field: ' + name)
+        return value
+
+    async def create_game(self, request, connection):
+        """
+        Starts a new game
+        :return: ID of the game
+        """
+        return await self.run_in_executor(self._manager.create_game)
+
+    async def make_move(self, request, connection):
+        """
+        Makes a move in a game and schedules an update for its spectators
+        :return: True if the move was made, False if it was rejected
+        """
+        game_id = self.get_request_field(request, 'game')
+        # submit_move waits for the game's lock, which is held while earlier moves of the game are being made
+        future = await self.run_in_executor(self._manager.submit_move, game_id, self.get_request_field(request, 'from'),
+                                            self.get_request_field(request, 'to'))
+        result = await asyncio.wrap_future(future)
+        if result and game_id in self._spectators:
+            self._updated_games.add(game_id)
+        return result
+
+    async def get_game_state(self, request, connection):
+        """
+        Looks up the state of a game
+        :return: 'UNFINISHED', 'RED_WON' or 'BLUE_WON'
+        """
+        return await self.run_in_executor(self._manager.get_game_state, self.get_request_field(request, 'game'))
+
+    async def legal_moves(self, request, connection):
+        """
+        Lists the legal moves of a player in a game (the player whose turn it is if no player is given)
+        :return: list of [from_location, to_location] lists
+        """
+        player = request.get('player')
+        if player not in [None, 'blue', 'red']:
+            raise ServerError('player must be "blue" or "red"')
+        return await self.run_in_executor(self._manager.legal_moves, self.get_request_field(request, 'game'), player)
+
+    async def validate_moves(self, request, connection):
+        """
+        Checks many candidate moves of the player whose turn it is in a game at once
+        :return: {"legal": list of true/false, "reasons": list of rejection reasons or null} dictionary
+        """
+        moves = request.get('moves')
+        if not isinstance(moves, list) or not all(isinstance(move, list) and len(move) == 2 and
+                                                  all(isinstance(location, str) for location in move)
+                                                  for move in moves):
+            raise ServerError('moves must be a list of [from, to] lists')
+        legal, reasons = await self.run_in_executor(self._manager.validate_moves,
+                                                    self.get_request_field(request, 'game'), moves)
+        return {'legal': legal, 'reasons': reasons}
+
+    async def get_move_history(self, request, connection):
+        """
+        Lists the moves made in a game
+        :return: list of [from_location, to_location] lists
+        """
+        return await self.run_in_executor(self._manager.get_move_history, self.get_request_field(request, 'game'))
+
+    async def watch(self, request, connection):
+        """
+        Subscribes the client to the updates of a game
+        :return: the game's current state, player to move and moves (as in an update)
+        """
+        game_id = self.get_request_field(request, 'game')
+        snapshot = await self.run_in_executor(self.get_snapshot, game_id, 0)
+        self._spectators.setdefault(game_id, set()).add(connection)
+        self._broadcast_plies.setdefault(game_id, snapshot['ply'])
+        connection.get_watching().add(game_id)
+        return snapshot
+
+    async def unwatch(self, request, connection):
+        """
+        Unsubscribes the client from the updates of a game
+        :return: True if the client was watching the game
+        """
+        game_id = self.get_request_field(request, 'game')
+        watching = game_id in connection.get_watching()
+        self.remove_spectator(game_id, connection)
+        return watching
+
+    async def best_move(self, request, connection):
+        """
+        Searches for the computer player's move in a game on the search process pool
+        :return: [from_location, to_location], or None if the game is over
+        """
+        depth = request.get('depth', 3)
+        if not isinstance(depth, int) or not 1 <= depth <= MAX_SEARCH_DEPTH:
+            raise ServerError('depth must be from 1 to ' + str(MAX_SEARCH_DEPTH))
+        moves = await self.run_in_executor(self._manager.get_move_history, self.get_request_field(request, 'game'))
+        if self._search_executor is None:
+            self._search_executor = ProcessPoolExecutor(self._search_workers)
+        return await asyncio.get_running_loop().run_in_executor(self._search_executor, search_best_move, moves, depth)
+
+    def remove_spectator(self, game_id, connection):
+        """
+        Unsubscribes a connection from a game's updates
+        :param game_id: ID of the game
+        :param connection: Connection object
+        """
+        connection.get_watching().discard(game_id)
+        spectators = self._spectators.get(game_id)
+        if spectators is not None:
+            spectators.discard(connection)
+            if len(spectators) == 0:
+                del self._spectators[game_id]
+                self._broadcast_plies.pop(game_id, None)
+                self._updated_games.discard(game_id)
+
+    def get_snapshot(self, game_id, first_ply):
+        """
+        Collects a game's state and the moves made since a ply (runs on the thread pool)
+        :param game_id: ID of the game
+        :param first_ply: number of moves the spectators already have
+        :return: update dictionary
+        """
+        moves = self._manager.get_move_history(game_id)
+        return {'event': 'update', 'game': game_id, 'state': self._manager.get_game_state(game_id),
+                'current_player': self._manager.get_current_player(game_id), 'ply': len(moves),
+                'moves': moves[first_ply:]}
+
+    async def broadcast_updates(self):
+        """
+        Sends each watched game's new moves to its spectators once per broadcast interval, so a burst of moves costs
+        one message per spectator. Spectators that fall too far behind are disconnected.
+        """
+        while True:
+            await asyncio.sleep(self._broadcast_interval)
+            updated_games = self._updated_games
+            self._updated_games = set()
+            for game_id in updated_games:
+                if game_id not in self._spectators:
+                    continue
+                try:
+                    snapshot = await self.run_in_executor(self.get_snapshot, game_id,
+                                                          self._broadcast_plies.get(game_id, 0))
+                except KeyError:
+                    continue
+                if game_id not in self._spectators:
+                    continue
+                self._broadcast_plies[game_id] = snapshot['ply']
+                for connection in list(self._spectators[game_id]):
+                    if connection.is_slow():
+                        for watched_game_id in list(connection.get_watching()):
+                            self.remove_spectator(watched_game_id, connection)
+                        connection.close()
+                    else:
+                        connection.send(snapshot)
+
+
+class LocalClient:
+    """
+    Represents an in-process client of a JanggiServer, for tests and load testing. Requests and responses go
+    through the same JSON encoding and request handling as socket clients.
+    """
+
+    def __init__(self, server):
+        """
+        Initializes the client
+        :param server: JanggiServer object
+        """
+        self._server = server
+        self._connection = LocalConnection()
+        self._request_ids = itertools.count(1)
+
+    async def request(self, op, **fields):
+        """
+        Sends a request and waits for its response
+        :param op: name of the operation
+        :param fields: other fields of the request
+        :return: result of the request
+        :raises ServerError: if the server rejected the request
+        """
+        request = dict(fields, id=next(self._request_ids), op=op)
+        response = json.loads(json.dumps(await self._server.handle_line(json.dumps(request), self._connection)))
+        if not response['ok']:
+            raise ServerError(response['error'])
+        return response['result']
+
+    async def next_update(self):
+        """
+        Waits for the next update of a watched game
+        :return: update dictionary
+        """
+        return await self._connection.receive()
+
+    def close(self):
+        """
+        Unsubscribes the client from the games it watches
+        """
+        for game_id in list(self._connection.get_watching()):
+            self._server.remove_spectator(game_id, self._connection)
+        self._connection.close()
+
+
+async def play_random_game(client, moves, rng, latencies):
+    """
+    Plays random legal moves in a new game through a client, timing each request
+    :param client: LocalClient object
+    :param moves: number of moves to play (fewer if the game ends)
+    :param rng: random.Random object
+    :param latencies: list the request latencies in seconds are added to
+    :return: ID of the game
+    """
+    start = time.perf_counter()
+    game_id = await client.request('create_game')
+    latencies.append(time.perf_counter() - start)
+    for _ in range(moves):
+        start = time.perf_counter()
+        legal_moves = await client.request('legal_moves', game=game_id)
+        latencies.append(time.perf_counter() - start)
+        if len(legal_moves) == 0:
+            break
+        from_location, to_location = rng.choice(legal_moves)
+        start = time.perf_counter()
+        await client.request('make_move', game=game_id, **{'from': from_location, 'to': to_location})
+        latencies.append(time.perf_counter() - start)
+    return game_id
+
+
+async def run_load_test(players=1000, moves=20, seed=0, server=None):
+    """
+    Has many in-process clients play random games at once and measures the request latencies
+    :param players: number of clients, each playing its own game
+    :param moves: moves each client plays
+    :param seed: random seed
+    :param server: JanggiServer to test (a new one, closed afterwards, if not given)
+    :return: dictionary with the requests, requests per second, p50/p99/max latency in seconds and the game
+             manager's metrics
+    """
+    own_server = server is None
+    if own_server:
+        server = JanggiServer()
+        server.start_broadcasting()
+    latencies = []
+    clients = [LocalClient(server) for _ in range(players)]
+    start = time.perf_counter()
+    await asyncio.gather(*[play_random_game(client, moves, random.Random((seed << 32) ^ index), latencies)
+                           for index, client in enumerate(clients)])
+    elapsed = time.perf_counter() - start
+    for client in clients:
+        client.close()
+
+    latencies.sort()
+    result = {'requests': len(latencies), 'elapsed': elapsed,
+              'requests_per_second': len(latencies) / elapsed if elapsed > 0 else 0.0,
+              'p50_latency': latencies[len(latencies) // 2] if latencies else 0.0,
+              'p99_latency': latencies[min(len(latencies) - 1, len(latencies) * 99 // 100)] if latencies else 0.0,
+              'max_latency': latencies[-1] if latencies else 0.0,
+              'manager': server.get_manager().get_metrics().get_summary()}
+    if own_server:
+        await server.close()
+    return result
+
+
+async def main(arguments):
+    """
+    Runs the server or the load test from the command line arguments
+    :param arguments: parsed command line arguments
+    """
+    if arguments.load_test:
+        result = await run_load_test(arguments.load_test, arguments.moves)
+        print('%d requests in %.2fs (%.0f/s), p50 %.2fms, p99 %.2fms, max %.2fms' %
+              (result['requests'], result['elapsed'], result['requests_per_second'], result['p50_latency'] * 1000,
+               result['p99_latency'] * 1000, result['max_latency'] * 1000))
+        return
+
+    server = JanggiServer(workers=arguments.workers)
+    if arguments.unix:
+        await server.start_unix(arguments.unix)
+    else:
+        await server.start(arguments.host, arguments.port)
+    try:
+        await server.serve_forever()
+    finally:
+        await server.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Janggi game server')
+    parser.add_argument('--host', default='127.0.0.1', help='address to listen on')
+    parser.add_argument('--port', type=int, default=8765, help='TCP port to listen on')
+    parser.add_argument('--unix', help='path of a Unix socket to listen on instead of a TCP port')
+    parser.add_argument('--workers', type=int, default=4, help='threads for moves and for reading games')
+    parser.add_argument('--load-test', type=int, metavar='PLAYERS', help='run an in-process load test instead')
+    parser.add_argument('--moves', type=int, default=20, help='moves per player in the load test')
+    asyncio.run(main(parser.parse_args()))
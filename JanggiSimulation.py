@@ -0,0 +1,145 @@
+# Description: Batch self-play for generating game datasets. Plays many games with a move-choosing policy on reused
+#              Position objects, optionally spread over a pool of worker processes, and returns compact game records.
+
+import multiprocessing
+import random
+from array import array
+
+from JanggiPosition import BLUE, SQUARE_INDEX, Position, encode_move
+from JanggiRecord import DRAW, GameRecord
+
+
+def random_policy(position, moves, rng):
+    """
+    Chooses a legal move at random
+    :param position: Position object
+    :param moves: legal encoded moves
+    :param rng: random.Random object of the game
+    :return: encoded move
+    """
+    return rng.choice(moves)
+
+
+def capture_policy(position, moves, rng):
+    """
+    Chooses a random capture if there is one, otherwise a random legal move
+    :param position: Position object
+    :param moves: legal encoded moves
+    :param rng: random.Random object of the game
+    :return: encoded move
+    """
+    squares = position.get_squares()
+    captures = [move for move in moves if squares[move & 127]]
+    return rng.choice(captures if captures else moves)
+
+
+class SearchPolicy:
+    """
+    Chooses moves with a fixed-depth search (a SearchEngine is created in each process that uses the policy)
+    """
+
+    def __init__(self, depth=2):
+        """
+        Initializes the policy
+        :param depth: search depth in plies
+        """
+        self._depth = depth
+        self._engine = None
+
+    def __getstate__(self):
+        """
+        Leaves the search engine out when the policy is sent to a worker process
+        """
+        return {'_depth': self._depth, '_engine': None}
+
+    def __call__(self, position, moves, rng):
+        """
+        Chooses the move the search engine finds best
+        :param position: Position object
+        :param moves: legal encoded moves
+        :param rng: random.Random object of the game (unused)
+        :return: encoded move
+        """
+        if self._engine is None:
+            from JanggiAI import SearchEngine
+            self._engine = SearchEngine()
+        from_location, to_location = self._engine.search(position, self._depth, root_moves=moves).get_move()
+        return encode_move(SQUARE_INDEX[from_location], SQUARE_INDEX[to_location])
+
+
+def game_seed(seed, index):
+    """
+    Derives the seed of one game of a batch, so each game is reproducible no matter how the batch is split up
+    :param seed: seed of the batch
+    :param index: index of the game within the batch
+    :return: integer seed
+    """
+    return (seed << 32) ^ index
+
+
+def play_game(position, policy, seed, max_moves=200):
+    """
+    Plays one game from the starting setup
+    :param position: Position object to play on (reset at the start of the game)
+    :param policy: function choosing a move, called as policy(position, legal moves, rng)
+    :param seed: random seed of the game
+    :param max_moves: number of moves after which the game is a draw
+    :return: GameRecord object
+    """
+    rng = random.Random(seed)
+    position.reset()
+    moves = array('H')
+    result = DRAW
+    for _ in range(max_moves):
+        side = position.get_side_to_move()
+        legal_moves = position.generate_legal_moves()
+        if len(legal_moves) == 0:
+            general = position.general_square(side)
+            if position.square_attacked(general, 1 - side):
+                result = 'RED_WON' if side == BLUE else 'BLUE_WON'
+                break
+            # with no moves available (and not in check) the player passes
+            move = encode_move(general, general)
+        else:
+            move = policy(position, legal_moves, rng)
+        position.push_move(move)
+        moves.append(move)
+    else:
+        # the last move may have been checkmate
+        side = position.get_side_to_move()
+        if position.square_attacked(position.general_square(side), 1 - side) and not position.has_legal_move(side):
+            result = 'RED_WON' if side == BLUE else 'BLUE_WON'
+    return GameRecord(moves, result, seed)
+
+
+def _simulate_range(task):
+    """
+    Plays a range of games of a batch on a single reused Position (run in a worker process)
+    :param task: (first game index, last game index + 1, policy, seed, max_moves)
+    :return: list of GameRecord objects
+    """
+    first, last, policy, seed, max_moves = task
+    position = Position()
+    return [play_game(position, policy, game_seed(seed, index), max_moves) for index in range(first, last)]
+
+
+def simulate_games(n, policy=random_policy, seed=0, max_moves=200, workers=1, chunk_size=16):
+    """
+    Plays a batch of games. Each game is seeded from the batch seed and its index, so results are the same for any
+    number of workers.
+    :param n: number of games
+    :param policy: function choosing a move, called as policy(position, legal moves, rng); has to be picklable
+                   (a module-level function or a SearchPolicy) when workers is more than 1
+    :param seed: seed of the batch
+    :param max_moves: number of moves after which a game is a draw
+    :param workers: number of worker processes (1 to play in this process)
+    :param chunk_size: number of games handed to a worker at a time
+    :return: list of GameRecord objects in game index order
+    """
+    tasks = [(first, min(first + chunk_size, n), policy, seed, max_moves) for first in range(0, n, chunk_size)]
+    if workers <= 1:
+        chunks = map(_simulate_range, tasks)
+        return [record for chunk in chunks for record in chunk]
+
+    with multiprocessing.Pool(workers) as pool:
+        return [record for chunk in pool.imap(_simulate_range, tasks) for record in chunk]
@@ -0,0 +1,605 @@
+# Description: Endgame tablebases for positions with few pieces, generated by retrograde analysis. A table holds the
+#              result with best play (win, loss or draw for the side to move, and the number of plies to checkmate)
+#              of every placement of one set of material, so endgames are looked up instead of searched. Generals and
+#              Guards are only placed inside their own palace and Soldiers only on rows they can reach. Passing the
+#              turn is allowed when not in check, as in make_move, so a player can only lose by being checkmated.
+#
+#              Material is named by piece letters, blue first: K General, A Guard, H Horse, E Elephant, R Chariot,
+#              C Cannon, P Soldier (KR-KAA is blue General and Chariot against red General and two Guards).
+#
+#              Table file (NAME.jtb): a header (TABLE_HEADER: magic, blue piece types, red piece types, number of
+#              entries), then one unsigned 16-bit little-endian entry per position: 0 for a draw, INVALID for a
+#              placement that can't occur, otherwise the distance to mate in plies + 1 (even distances are losses
+#              for the side to move, odd distances wins). Positions are numbered by the index of each piece's square
+#              within the squares it may stand on, in mixed radix, times 2, plus the side to move.
+#
+#              python JanggiTablebase.py generate KR-KAA [--directory tablebases] [--workers 4]
+#              python JanggiTablebase.py probe KR-KAA e9 a5 e2 d1 f1 [--red-to-move]   (squares in material order)
+
+import argparse
+import mmap
+import os
+import struct
+import sys
+import time
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+
+from JanggiPosition import BLUE, RED, GENERAL, GUARD, SOLDIER, PALACE_MASKS, SQUARE_INDEX, Position
+
+TABLE_MAGIC = b'JGT\x01'
+TABLE_HEADER = struct.Struct('<4s6s6sI')
+TABLE_SUFFIX = '.jtb'
+INVALID = 0xFFFF
+
+# most pieces of each color besides the General
+MAX_SIDE_PIECES = 6
+
+# letters of the piece types in material names, indexed by piece type
+PIECE_LETTERS = 'KAHERCP'
+
+# results returned by probe, for the side to move
+WIN = 1
+DRAW = 0
+LOSS = -1
+
+# generate_table flags, one byte per position
+_INVALID_FLAG = 1
+_TERMINAL_FLAG = 2
+_BLOCKED_FLAG = 4
+
+# positions handed to a worker process at a time
+CHUNK_SIZE = 1 << 14
+
+
+def parse_material(name):
+    """
+    Reads a material name
+    :param name: blue and red pieces separated by '-', each starting with K (for example 'KR-KAA')
+    :return: (blue piece types, red piece types) tuple of sorted tuples, without the Generals
+    :raises ValueError: if the name is not valid material
+    """
+    sides = name.upper().split('-')
+    if len(sides) != 2 or not all(side.startswith('K') for side in sides):
+        raise ValueError('material has to be written like KR-KAA')
+    material = []
+    for side in sides:
+        if any(letter not in PIECE_LETTERS[1:] for letter in side[1:]) or len(side) - 1 > MAX_SIDE_PIECES:
+            raise ValueError('material has to be written like KR-KAA')
+        material.append(tuple(sorted(PIECE_LETTERS.index(letter) for letter in side[1:])))
+    return tuple(material)
+
+
+def material_name(material):
+    """
+    Writes a material name
+    :param material: (blue piece types, red piece types) tuple
+    :return: name such as 'KR-KAA'
+    """
+    return '-'.join('K' + ''.join(PIECE_LETTERS[piece_type] for piece_type in sorted(types)) for types in material)
+
+
+def material_of(position):
+    """
+    Works out the material of a position
+    :param position: Position object
+    :return: (blue piece types, red piece types) tuple of sorted tuples, without the Generals
+    """
+    material = []
+    for color in [BLUE, RED]:
+        types = []
+        for piece_type in range(GUARD, SOLDIER + 1):
+            types.extend([piece_type] * bin(position.get_bitboard(color, piece_type)).count('1'))
+        material.append(tuple(types))
+    return tuple(material)
+
+
+def piece_domain(color, piece_type):
+    """
+    Lists the squares a piece may stand on
+    :param color: BLUE or RED
+    :param piece_type: piece type index
+    :return: list of square indices in ascending order
+    """
+    if piece_type == GENERAL or piece_type == GUARD:
+        return [square for square in range(90) if PALACE_MASKS[color] >> square & 1]
+    if piece_type == SOLDIER:
+        # Soldiers never move backwards: blue ones stay on rows 1-7, red ones on rows 4-10
+        return list(range(63)) if color == BLUE else list(range(27, 90))
+    return list(range(90))
+
+
+class TableLayout:
+    """
+    Represents how the positions of one set of material are numbered
+    """
+
+    __slots__ = ('_material', '_pieces', '_domains', '_domain_index', '_strides', '_size')
+
+    def __init__(self, material):
+        """
+        Initializes the layout
+        :param material: (blue piece types, red piece types) tuple, without the Generals
+        """
+        self._material = material
+        self._pieces = [(BLUE, GENERAL)] + [(BLUE, piece_type) for piece_type in material[BLUE]] + \
+                       [(RED, GENERAL)] + [(RED, piece_type) for piece_type in material[RED]]
+        self._domains = [piece_domain(color, piece_type) for color, piece_type in self._pieces]
+        self._domain_index = []
+        for domain in self._domains:
+            index = [-1] * 90
+            for number, square in enumerate(domain):
+                index[square] = number
+            self._domain_index.append(index)
+        # the side to move is the lowest digit, so passing the turn flips bit 0
+        self._strides = []
+        stride = 2
+        for domain in reversed(self._domains):
+            self._strides.append(stride)
+            stride *= len(domain)
+        self._strides.reverse()
+        self._size = stride
+
+    def get_material(self):
+        """
+        Getter method for the material of the layout
+        :return: (blue piece types, red piece types) tuple
+        """
+        return self._material
+
+    def get_pieces(self):
+        """
+        Getter method for the pieces in numbering order
+        :return: list of (color, piece type) tuples
+        """
+        return self._pieces
+
+    def get_size(self):
+        """
+        Getter method for the number of positions
+        :return: number of positions (including placements that can't occur)
+        """
+        return self._size
+
+    def get_stride(self, slot):
+        """
+        Getter method for how much the position number changes when a piece moves one square along its domain
+        :param slot: index of the piece in get_pieces
+        :return: stride
+        """
+        return self._strides[slot]
+
+    def get_domain_index(self, slot):
+        """
+        Getter method for the number of each square within a piece's domain
+        :param slot: index of the piece in get_pieces
+        :return: list indexed by square of numbers (-1 for squares outside the domain)
+        """
+        return self._domain_index[slot]
+
+    def decode(self, index):
+        """
+        Works out the position with a number
+        :param index: position number
+        :return: (list of squares in piece order, side to move) tuple
+        """
+        side = index & 1
+        index >>= 1
+        squares = []
+        for domain in reversed(self._domains):
+            index, number = divmod(index, len(domain))
+            squares.append(domain[number])
+        squares.reverse()
+        return squares, side
+
+    def encode(self, position):
+        """
+        Numbers a position
+        :param position: Position object with this layout's material
+        :return: position number, or None if a piece stands outside its domain
+        """
+        index = position.get_side_to_move()
+        slot = 0
+        pieces = self._pieces
+        while slot < len(pieces):
+            color, piece_type = pieces[slot]
+            # like pieces take the squares of their bitboard in ascending order
+            bitboard = position.get_bitboard(color, piece_type)
+            while bitboard:
+                low_bit = bitboard & -bitboard
+                bitboard ^= low_bit
+                number = self._domain_index[slot][low_bit.bit_length() - 1]
+                if number < 0:
+                    return None
+                index += number * self._strides[slot]
+                slot += 1
+        return index
+
+
+def table_path(directory, material):
+    """
+    Works out where a table is stored
+    :param directory: tablebase directory
+    :param material: (blue piece types, red piece types) tuple
+    :return: path of the table file
+    """
+    return os.path.join(directory, material_name(material) + TABLE_SUFFIX)
+
+
+class Tablebase:
+    """
+    Represents one memory-mapped table. Probing reads one entry, so it is cheap enough to do inside a search.
+    """
+
+    def __init__(self, path):
+        """
+        Opens a table file
+        :param path: path of a file written by generate_table
+        :raises ValueError: if the file is not a Janggi tablebase
+        """
+        self._file = open(path, 'rb')
+        self._data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, blue_types, red_types, count = TABLE_HEADER.unpack_from(self._data, 0)
+        if magic != TABLE_MAGIC:
+            self.close()
+            raise ValueError('not a Janggi tablebase')
+        self._layout = TableLayout((tuple(piece_type for piece_type in blue_types if piece_type != 255),
+                                    tuple(piece_type for piece_type in red_types if piece_type != 255)))
+        if sys.byteorder == 'little':
+            self._values = memoryview(self._data)[TABLE_HEADER.size:TABLE_HEADER.size + 2 * count].cast('H')
+        else:
+            self._values = None
+
+    def close(self):
+        """
+        Unmaps and closes the table file
+        """
+        if getattr(self, '_values', None) is not None:
+            self._values.release()
+        self._data.close()
+        self._file.close()
+
+    def get_layout(self):
+        """
+        Getter method for the numbering of the table's positions
+        :return: TableLayout object
+        """
+        return self._layout
+
+    def get_value(self, index):
+        """
+        Reads the entry of a position
+        :param index: position number
+        :return: 0 for a draw, INVALID, or the distance to mate + 1
+        """
+        if self._values is not None:
+            return self._values[index]
+        return struct.unpack_from('<H', self._data, TABLE_HEADER.size + 2 * index)[0]
+
+    def probe(self, position):
+        """
+        Looks up the result of a position with the table's material
+        :param position: Position object
+        :return: (WIN, LOSS or DRAW for the side to move, plies to mate or None for a draw) tuple, or None if the
+                 position is not in the table
+        """
+        index = self._layout.encode(position)
+        if index is None:
+            return None
+        return decode_value(self.get_value(index))
+
+
+def decode_value(value):
+    """
+    Interprets a table entry
+    :param value: entry read from a table
+    :return: (WIN, LOSS or DRAW, plies to mate or None) tuple, or None for a placement that can't occur
+    """
+    if value == INVALID:
+        return None
+    if value == 0:
+        return DRAW, None
+    distance = value - 1
+    return (LOSS if distance % 2 == 0 else WIN), distance
+
+
+class Tablebases:
+    """
+    Represents the tables of a directory, opened as positions with their material are probed
+    """
+
+    def __init__(self, directory):
+        """
+        Finds the tables in a directory
+        :param directory: directory holding .jtb files
+        """
+        self._directory = directory
+        self._tables = {}
+        self._available = set()
+        self._max_pieces = 0
+        if os.path.isdir(directory):
+            for file_name in os.listdir(directory):
+                if file_name.endswith(TABLE_SUFFIX):
+                    material = parse_material(file_name[:-len(TABLE_SUFFIX)])
+                    self._available.add(material)
+                    self._max_pieces = max(self._max_pieces, 2 + len(material[BLUE]) + len(material[RED]))
+
+    def close(self):
+        """
+        Closes every opened table
+        """
+        for table in self._tables.values():
+            table.close()
+        self._tables.clear()
+
+    def __enter__(self):
+        """
+        Allows the tablebases to be used in a with statement so their files are closed afterwards
+        :return: the tablebases
+        """
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """
+        Closes the tables at the end of a with statement
+        """
+        self.close()
+
+    def get_max_pieces(self):
+        """
+        Getter method for the most pieces (Generals included) of any available table
+        :return: number of pieces
+        """
+        return self._max_pieces
+
+    def has_table(self, material):
+        """
+        Determines if a table is available
+        :param material: (blue piece types, red piece types) tuple
+        :return: True - if the table is available
+                 False - if it isn't
+        """
+        return material in self._available
+
+    def get_table(self, material):
+        """
+        Opens a table
+        :param material: (blue piece types, red piece types) tuple
+        :return: Tablebase object, or None if the table is not available
+        """
+        table = self._tables.get(material)
+        if table is None and material in self._available:
+            table = self._tables[material] = Tablebase(table_path(self._directory, material))
+        return table
+
+    def probe(self, position):
+        """
+        Looks up the result of a position
+        :param position: Position or JanggiGame object
+        :return: (WIN, LOSS or DRAW for the side to move, plies to mate or None for a draw) tuple, or None if there is
+                 no table for the position
+        """
+        if not isinstance(position, Position):
+            position = Position.from_game(position)
+        if bin(position.get_occupied()).count('1') > self._max_pieces:
+            return None
+        table = self.get_table(material_of(position))
+        if table is None:
+            return None
+        return table.probe(position)
+
+
+def _generate_chunk(task):
+    """
+    Works out the moves of a range of positions (run in a worker process)
+    :param task: (material, tablebase directory, first position number, end position number) tuple
+    :return: (flags bytearray, array of in-table move counts, array of in-table successor numbers, array of the
+              shortest win through a capture, array of the longest loss through a capture) tuple, distances in plies
+    """
+    material, directory, start, end = task
+    layout = TableLayout(material)
+    pieces = layout.get_pieces()
+    strides = [layout.get_stride(slot) for slot in range(len(pieces))]
+    domain_indexes = [layout.get_domain_index(slot) for slot in range(len(pieces))]
+    flags = bytearray(end - start)
+    counts = array('I', bytes(4 * (end - start)))
+    successors = array('I')
+    capture_wins = array('H', bytes(2 * (end - start)))
+    capture_losses = array('H', bytes(2 * (end - start)))
+    position = Position([])
+
+    with Tablebases(directory) as tablebases:
+        for offset, index in enumerate(range(start, end)):
+            squares, side = layout.decode(index)
+            if len(set(squares)) != len(squares):
+                flags[offset] = _INVALID_FLAG
+                continue
+            position.reset([], 'red' if side == RED else 'blue')
+            for square, (color, piece_type) in zip(squares, pieces):
+                position.put_piece(square, color, piece_type)
+            # the player who just moved can't have left their General in check
+            if position.square_attacked(position.general_square(1 - side), side):
+                flags[offset] = _INVALID_FLAG
+                continue
+
+            in_check = position.square_attacked(position.general_square(side), 1 - side)
+            moves = position.generate_legal_moves(side)
+            if in_check and len(moves) == 0:
+                flags[offset] = _TERMINAL_FLAG
+                continue
+            count = 0
+            if not in_check:
+                successors.append(index ^ 1)
+                count += 1
+            slots = {square: slot for slot, square in enumerate(squares)}
+            for move in moves:
+                from_square, to_square = move >> 7, move & 127
+                if to_square in slots:
+                    # a capture leads to a table with less material
+                    position.push_move(move)
+                    result = tablebases.probe(position)
+                    position.pop_move()
+                    if result is None or result[0] == DRAW:
+                        flags[offset] |= _BLOCKED_FLAG
+                    elif result[0] == LOSS:
+                        if capture_wins[offset] == 0 or result[1] + 1 < capture_wins[offset]:
+                            capture_wins[offset] = result[1] + 1
+                        flags[offset] |= _BLOCKED_FLAG
+                    else:
+                        capture_losses[offset] = max(capture_losses[offset], result[1] + 1)
+                    continue
+                slot = slots[from_square]
+                domain_index = domain_indexes[slot]
+                successors.append((index ^ 1) + (domain_index[to_square] - domain_index[from_square]) * strides[slot])
+                count += 1
+            counts[offset] = count
+    return flags, counts, successors, capture_wins, capture_losses
+
+
+def sub_materials(material):
+    """
+    Lists the material left after each possible capture
+    :param material: (blue piece types, red piece types) tuple
+    :return: set of (blue piece types, red piece types) tuples
+    """
+    result = set()
+    for color in [BLUE, RED]:
+        for piece_type in set(material[color]):
+            types = list(material[color])
+            types.remove(piece_type)
+            side_material = list(material)
+            side_material[color] = tuple(types)
+            result.add(tuple(side_material))
+    return result
+
+
+def generate_table(material, directory, workers=None, report=None):
+    """
+    Generates a table by retrograde analysis, first generating the tables of the material left after captures if
+    they are not in the directory yet. Positions' moves are worked out on a pool of worker processes; results are then
+    propagated back from the checkmates one ply at a time.
+    :param material: (blue piece types, red piece types) tuple, or a material name such as 'KR-KAA'
+    :param directory: tablebase directory (created if it doesn't exist)
+    :param workers: number of worker processes (all cores if not given)
+    :param report: function called with a progress message for each table generated (None for no messages)
+    :return: path of the table file
+    """
+    if isinstance(material, str):
+        material = parse_material(material)
+    material = (tuple(sorted(material[BLUE])), tuple(sorted(material[RED])))
+    os.makedirs(directory, exist_ok=True)
+    for sub_material in sorted(sub_materials(material)):
+        if not os.path.exists(table_path(directory, sub_material)):
+            generate_table(sub_material, directory, workers, report)
+
+    start_time = time.perf_counter()
+    workers = workers or os.cpu_count() or 1
+    size = TableLayout(material).get_size()
+    tasks = [(material, directory, start, min(start + CHUNK_SIZE, size)) for start in range(0, size, CHUNK_SIZE)]
+    flags = bytearray()
+    counts = array('I')
+    successor_offsets = array('I', [0])
+    successors = array('I')
+    capture_wins = array('H')
+    capture_losses = array('H')
+    if workers <= 1:
+        chunks = map(_generate_chunk, tasks)
+    else:
+        executor = ProcessPoolExecutor(workers)
+        chunks = executor.map(_generate_chunk, tasks)
+    try:
+        for chunk_flags, chunk_counts, chunk_successors, chunk_wins, chunk_losses in chunks:
+            flags += chunk_flags
+            base = len(successors)
+            for count in chunk_counts:
+                base += count
+                successor_offsets.append(base)
+            counts += chunk_counts
+            successors += chunk_successors
+            capture_wins += chunk_wins
+            capture_losses += chunk_losses
+    finally:
+        if workers > 1:
+            executor.shutdown()
+
+    # predecessors of each position, in the same compact form as the successors
+    predecessor_offsets = array('I', bytes(4 * (size + 1)))
+    for successor in successors:
+        predecessor_offsets[successor + 1] += 1
+    for index in range(size):
+        predecessor_offsets[index + 1] += predecessor_offsets[index]
+    fill = array('I', predecessor_offsets[:size])
+    predecessors = array('I', bytes(4 * len(successors)))
+    for index in range(size):
+        for successor in successors[successor_offsets[index]:successor_offsets[index + 1]]:
+            predecessors[fill[successor]] = index
+            fill[successor] += 1
+    del fill, successors, successor_offsets
+
+    # a position is lost once every move leads to a win for the opponent: count down the moves left
+    values = array('H', bytes(2 * size))
+    remaining = counts
+    buckets = {}
+    for index in range(size):
+        if flags[index] & _INVALID_FLAG:
+            values[index] = INVALID
+        elif flags[index] & _TERMINAL_FLAG:
+            buckets.setdefault(0, []).append((index, False))
+        else:
+            if flags[index] & _BLOCKED_FLAG:
+                remaining[index] += 1
+            if capture_wins[index]:
+                buckets.setdefault(capture_wins[index], []).append((index, True))
+            if remaining[index] == 0:
+                buckets.setdefault(capture_losses[index], []).append((index, False))
+
+    distance = 0
+    while buckets:
+        for index, win in buckets.pop(distance, []):
+            if values[index] != 0:
+                continue
+            values[index] = distance + 1
+            for predecessor in predecessors[predecessor_offsets[index]:predecessor_offsets[index + 1]]:
+                if values[predecessor] != 0:
+                    continue
+                if not win:
+                    buckets.setdefault(distance + 1, []).append((predecessor, True))
+                else:
+                    remaining[predecessor] -= 1
+                    if remaining[predecessor] == 0:
+                        loss_distance = max(distance + 1, capture_losses[predecessor])
+                        buckets.setdefault(loss_distance, []).append((predecessor, False))
+        distance += 1
+
+    path = table_path(directory, material)
+    if sys.byteorder == 'big':
+        values.byteswap()
+    with open(path + '.tmp', 'wb') as file:
+        file.write(TABLE_HEADER.pack(TABLE_MAGIC, bytes(material[BLUE]).ljust(MAX_SIDE_PIECES, b'\xff'),
+                                     bytes(material[RED]).ljust(MAX_SIDE_PIECES, b'\xff'), size))
+        file.write(values.tobytes())
+    os.replace(path + '.tmp', path)
+    if report is not None:
+        report('%s: %d positions in %.1fs' % (material_name(material), size, time.perf_counter() - start_time))
+    return path
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Janggi endgame tablebases')
+    parser.add_argument('command', choices=['generate', 'probe'], help='generate a table or look up a position')
+    parser.add_argument('material', help='material such as KR-KAA (blue first)')
+    parser.add_argument('squares', nargs='*', help='squares of the pieces in the order of the material name')
+    parser.add_argument('--directory', default='tablebases', help='tablebase directory')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='worker processes')
+    parser.add_argument('--red-to-move', action='store_true', help='probe with red to move')
+    arguments = parser.parse_args()
+
+    if arguments.command == 'generate':
+        generate_table(arguments.material, arguments.directory, arguments.workers, print)
+    else:
+        probe_layout = TableLayout(parse_material(arguments.material))
+        probe_position = Position([], 'red' if arguments.red_to_move else 'blue')
+        for probe_square, (probe_color, probe_type) in zip(arguments.squares, probe_layout.get_pieces()):
+            probe_position.put_piece(SQUARE_INDEX[probe_square], probe_color, probe_type)
+        with Tablebases(arguments.directory) as probe_tablebases:
+            print(probe_tablebases.probe(probe_position))
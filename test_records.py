@@ -0,0 +1,67 @@
+# Description: Tests for the game record formats: games recorded from any start position replay to the same game.
+#
+#              python -m pytest test_records.py        (or python -m unittest test_records)
+
+import random
+import unittest
+
+from JanggiGame import JanggiGame
+from JanggiPosition import ARRANGEMENTS, DEFAULT_ARRANGEMENT, BLUE, RED, GENERAL, CHARIOT, SOLDIER, Position, \
+    starting_pieces
+from JanggiRecord import decode_record, encode_record, record_from_game, record_to_game
+
+
+def play_random_moves(games, count, seed):
+    """
+    Makes the same random legal moves on several copies of a game
+    :param games: list of JanggiGame or Position objects in the same position
+    :param count: most moves to make
+    :param seed: random seed
+    """
+    rng = random.Random(seed)
+    for _ in range(count):
+        moves = games[0].legal_moves(games[0].get_current_player())
+        if len(moves) == 0 or games[0].get_game_state() != 'UNFINISHED':
+            return
+        move = rng.choice(sorted(moves))
+        for game in games:
+            game.make_move(*move)
+
+
+class RecordRoundTripTest(unittest.TestCase):
+    """
+    Checks that record_to_game(record_from_game(game)) gives back the game
+    """
+
+    def check_round_trip(self, games):
+        """
+        Records each game, passes the record through the binary format and replays it
+        :param games: list of JanggiGame or Position objects in the same position
+        """
+        for game in games:
+            record = decode_record(encode_record(record_from_game(game)))[0]
+            replayed = record_to_game(record)
+            self.assertEqual(replayed.get_position_hash(), games[0].get_position_hash())
+            self.assertEqual(replayed.get_move_history(), games[0].get_move_history())
+
+    def test_every_arrangement(self):
+        for blue_arrangement in sorted(ARRANGEMENTS):
+            for red_arrangement in sorted(ARRANGEMENTS):
+                with self.subTest(blue=blue_arrangement, red=red_arrangement):
+                    games = [JanggiGame(blue_arrangement, red_arrangement),
+                             Position(starting_pieces(blue_arrangement, red_arrangement))]
+                    play_random_moves(games, 20, 1)
+                    self.check_round_trip(games)
+                    is_default = blue_arrangement == red_arrangement == DEFAULT_ARRANGEMENT
+                    self.assertEqual(record_from_game(games[0]).get_start_position() is None, is_default)
+
+    def test_set_position(self):
+        pieces = [('e2', RED, GENERAL), ('e9', BLUE, GENERAL), ('a1', RED, CHARIOT), ('c7', BLUE, SOLDIER)]
+        game = JanggiGame()
+        game.set_position(pieces, 'red')
+        play_random_moves([game], 10, 2)
+        self.check_round_trip([game])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,247 @@
+# Description: Regression tests for the move rules. Runs the perft check of JanggiBenchmark on both engines and pins
+#              the palace rules that the move generator once got wrong, with positions set up on JanggiGame and on
+#              the bitboard Position so that a rule change made to one engine and not the other fails here. Also
+#              checks the move geometry JanggiGame looks up against the pieces' movement rules, and the incrementally
+#              updated legal move cache against moves worked out from scratch after random make/push/pop sequences, and
+#              validate_moves against valid_move and make_move on every move of every piece in random positions.
+#
+#              python -m pytest test_rules.py        (or python -m unittest test_rules)
+
+import random
+import unittest
+
+from JanggiBenchmark import verify_perft
+from JanggiGame import CARTESIAN_SQUARE, MOVE_GEOMETRY, REJECTION_REASONS, SQUARE_CARTESIAN, JanggiGame
+from JanggiPosition import BLUE, RED, GENERAL, GUARD, CHARIOT, CANNON, SOLDIER, SQUARE_INDEX, SQUARE_NAMES, Position
+
+# perft depth checked for each engine (the reference counts go to depth 4, see JanggiBenchmark)
+PERFT_DEPTH = 2
+
+
+def set_up(engine, pieces, current_player='red'):
+    """
+    Sets up a position on one of the engines
+    :param engine: 'position' for the bitboard Position or 'game' for JanggiGame
+    :param pieces: list of (location, color, piece type) tuples
+    :param current_player: 'blue' or 'red'
+    :return: Position or JanggiGame object
+    """
+    if engine == 'position':
+        return Position(pieces, current_player)
+    game = JanggiGame()
+    game.set_position(pieces, current_player)
+    return game
+
+
+def destinations(game, from_location):
+    """
+    Lists the legal destinations of the piece on a location
+    :param game: Position or JanggiGame object
+    :param from_location: location of a piece of the player to move
+    :return: set of locations
+    """
+    return {to_location for location, to_location in game.legal_moves(game.get_current_player())
+            if location == from_location}
+
+
+class PerftTest(unittest.TestCase):
+    """
+    Checks the perft counts of the benchmark positions against the reference counts
+    """
+
+    def test_position_engine(self):
+        self.assertEqual(verify_perft(PERFT_DEPTH, 'position'), [])
+
+    def test_game_engine(self):
+        self.assertEqual(verify_perft(PERFT_DEPTH, 'game'), [])
+
+
+class PalaceRulesTest(unittest.TestCase):
+    """
+    Pins the palace diagonal rules on both engines
+    """
+
+    def check(self, pieces, from_location, expected):
+        """
+        Checks the legal destinations of a piece on both engines
+        :param pieces: list of (location, color, piece type) tuples, red to move
+        :param from_location: location of the red piece to check
+        :param expected: set of locations the piece should be able to move to
+        """
+        for engine in ('position', 'game'):
+            with self.subTest(engine=engine):
+                self.assertEqual(destinations(set_up(engine, pieces), from_location), expected)
+
+    def test_soldier_on_palace_corner_steps_along_diagonal_only(self):
+        pieces = [('e2', RED, GENERAL), ('f9', BLUE, GENERAL), ('d8', RED, SOLDIER)]
+        # e9 is on the diagonal line; c9 is off the palace, so the Soldier can't step there
+        self.check(pieces, 'd8', {'c8', 'e8', 'd9', 'e9'})
+
+    def test_soldier_off_palace_diagonal_has_no_diagonal_step(self):
+        pieces = [('e2', RED, GENERAL), ('f8', BLUE, GENERAL), ('d9', RED, SOLDIER)]
+        self.check(pieces, 'd9', {'c9', 'e9', 'd10'})
+
+    def test_soldier_on_palace_center_steps_to_far_corners(self):
+        pieces = [('e2', RED, GENERAL), ('f8', BLUE, GENERAL), ('e9', RED, SOLDIER)]
+        self.check(pieces, 'e9', {'d9', 'f9', 'e10', 'd10', 'f10'})
+
+    def test_chariot_diagonal_is_blocked_at_palace_center(self):
+        pieces = [('e2', RED, GENERAL), ('f9', BLUE, GENERAL), ('e9', BLUE, GUARD), ('d8', RED, CHARIOT)]
+        self.check(pieces, 'd8', {'a8', 'b8', 'c8', 'e8', 'f8', 'g8', 'h8', 'i8', 'd9', 'd10', 'd7', 'd6', 'd5', 'd4',
+                                  'd3', 'd2', 'd1', 'e9'})
+
+    def test_chariot_diagonal_crosses_empty_palace_center(self):
+        pieces = [('e2', RED, GENERAL), ('f9', BLUE, GENERAL), ('d8', RED, CHARIOT)]
+        for engine in ('position', 'game'):
+            with self.subTest(engine=engine):
+                self.assertTrue({'e9', 'f10'} <= destinations(set_up(engine, pieces), 'd8'))
+
+    def test_cannon_jumps_palace_center(self):
+        pieces = [('e2', RED, GENERAL), ('f9', BLUE, GENERAL), ('e9', BLUE, GUARD), ('d8', RED, CANNON)]
+        self.check(pieces, 'd8', {'f10'})
+
+    def test_cannon_has_no_diagonal_move_without_screen(self):
+        pieces = [('e2', RED, GENERAL), ('f9', BLUE, GENERAL), ('d8', RED, CANNON)]
+        self.check(pieces, 'd8', set())
+
+
+class MoveGeometryTest(unittest.TestCase):
+    """
+    Checks the move geometry the game looks up (built from the JanggiPosition tables) against the pieces' own
+    movement rules
+    """
+
+    def test_move_paths_match_geometry(self):
+        game = JanggiGame()
+        for color in ('blue', 'red'):
+            for piece in game.get_player_obj(color).get_pieces():
+                with self.subTest(piece=piece.get_nickname()):
+                    for from_square in range(90):
+                        for to_square in range(90):
+                            if from_square == to_square:
+                                continue
+                            move_path = piece.get_move_path(SQUARE_CARTESIAN[from_square], SQUARE_CARTESIAN[to_square])
+                            if move_path is not None:
+                                move_path = sum(1 << CARTESIAN_SQUARE[row][column] for row, column in move_path)
+                            key = (piece.get_piece_type(), color, from_square, to_square)
+                            self.assertEqual(MOVE_GEOMETRY.get(key), move_path, key)
+
+
+def generated_moves(game, player_color):
+    """
+    Works out the legal moves of a player without the legal move cache (test_move leaves the cache alone)
+    :param game: JanggiGame object
+    :param player_color: 'blue' or 'red'
+    :return: set of (from_location, to_location) tuples
+    """
+    moves = set()
+    for piece in game.get_player_obj(player_color).get_pieces():
+        from_location = piece.get_location()
+        if from_location != 'CAPTURED':
+            moves.update((from_location, to_location) for to_location in game.generate_piece_moves(piece)
+                         if game.test_move(piece, from_location, to_location))
+    return moves
+
+
+class MoveCacheTest(unittest.TestCase):
+    """
+    Checks the incrementally updated legal move cache against moves worked out from scratch
+    """
+
+    def test_cache_after_make_push_and_pop(self):
+        for seed in range(4):
+            rng = random.Random(seed)
+            game = JanggiGame()
+            for step in range(120):
+                moves = game.legal_moves(game.get_current_player())
+                action = rng.random()
+                if (action < 0.25 or not moves) and game.get_move_count():
+                    game.pop_move()
+                elif moves and action < 0.6:
+                    game.push_move(*rng.choice(moves))
+                elif moves and game.get_game_state() == 'UNFINISHED':
+                    self.assertTrue(game.make_move(*rng.choice(moves)))
+                elif game.get_move_count():
+                    game.pop_move()
+                for color in ('blue', 'red'):
+                    with self.subTest(seed=seed, step=step, color=color):
+                        self.assertEqual(set(game.legal_moves(color)), generated_moves(game, color))
+
+
+def rejection_reason(game, from_location, to_location):
+    """
+    Works out why make_move would reject a move of the player to move, one move at a time with valid_move and
+    make_move (the move is taken back if it is made)
+    :param game: JanggiGame object
+    :param from_location: location of a piece of the player to move
+    :param to_location: location on the board (the same as from_location to pass the turn)
+    :return: one of REJECTION_REASONS, or None if make_move makes the move
+    """
+    piece = game.get_piece_at(from_location)
+    player = game.get_player_obj(game.get_current_player())
+    if not game.valid_move(from_location, to_location):
+        if game.capturing_own_piece(to_location, player):
+            return 'CAPTURES_OWN_PIECE'
+        blocking_squares = game.get_move_geometry(piece, SQUARE_INDEX[from_location], SQUARE_INDEX[to_location])
+        if blocking_squares is None:
+            return 'AGAINST_MOVE_RULES'
+        if game.path_is_blocked(piece, blocking_squares):
+            return 'BLOCKED'
+        return 'CANNON_CAPTURES_CANNON'
+    if not game.make_move(from_location, to_location):
+        return 'LEAVES_GENERAL_IN_CHECK'
+    game.pop_move()
+    return None
+
+
+class ValidateMovesTest(unittest.TestCase):
+    """
+    Checks validate_moves against valid_move and make_move on every move of every piece of the player to move
+    """
+
+    def test_every_own_piece_to_every_square(self):
+        positions_checked = in_check_checked = 0
+        for seed in range(6):
+            rng = random.Random(seed)
+            game = JanggiGame()
+            for ply in range(60):
+                moves = game.legal_moves(game.get_current_player())
+                if not moves or game.get_game_state() != 'UNFINISHED':
+                    break
+                in_check = game.is_in_check(game.get_current_player())
+                if ply % 20 == 10 or in_check:
+                    positions_checked += 1
+                    in_check_checked += in_check
+                    with self.subTest(seed=seed, ply=ply):
+                        self.check_position(game)
+                game.make_move(*rng.choice(moves))
+        self.assertGreater(in_check_checked, 0)
+        self.assertGreater(positions_checked, in_check_checked)
+
+    def check_position(self, game):
+        """
+        Checks validate_moves on every move of the player to move, to every square, in the current position
+        :param game: JanggiGame object (left in the same position)
+        """
+        pairs = [(piece.get_location(), to_location)
+                 for piece in game.get_player_obj(game.get_current_player()).get_pieces()
+                 if piece.get_location() != 'CAPTURED' for to_location in SQUARE_NAMES]
+        opponent_general = game.get_opposite_player(game.get_current_player()).get_pieces()[0]
+        pairs += [(pairs[0][0], 'j11'), (opponent_general.get_location(), 'e5')]
+        history = game.get_move_history()
+        legal, reasons = game.validate_moves(pairs)
+        for (from_location, to_location), is_legal, reason in zip(pairs, legal, reasons):
+            if to_location not in SQUARE_INDEX:
+                expected = 'NOT_ON_BOARD'
+            elif from_location == opponent_general.get_location():
+                expected = 'NOT_OWN_PIECE'
+                self.assertFalse(game.make_move(from_location, to_location))
+            else:
+                expected = rejection_reason(game, from_location, to_location)
+            self.assertIn(reason, REJECTION_REASONS + [None])
+            self.assertEqual((is_legal, reason), (expected is None, expected), (from_location, to_location))
+        self.assertEqual(game.get_move_history(), history)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,44 @@
+# Description: Tests for the computer player: a JanggiGame is searched the same as a Position with the same moves,
+#              so positions from earlier in the game count as repetitions.
+#
+#              python -m pytest test_search.py        (or python -m unittest test_search)
+
+import unittest
+
+from JanggiAI import EXACT, SearchEngine
+from JanggiGame import JanggiGame
+from JanggiPosition import Position
+
+# Horses stepping out and back, so the game repeats positions
+REPEATING_MOVES = [('c10', 'd8'), ('c1', 'd3'), ('d8', 'c10'), ('d3', 'c1'), ('h10', 'g8'), ('h1', 'g3'),
+                   ('g8', 'h10'), ('g3', 'h1')]
+
+
+class RepetitionTest(unittest.TestCase):
+    """
+    Checks that the search sees the positions played earlier in a game
+    """
+
+    def test_game_history_is_searched_like_position_history(self):
+        game = JanggiGame()
+        position = Position()
+        for move in REPEATING_MOVES:
+            self.assertTrue(game.make_move(*move))
+            self.assertTrue(position.make_move(*move))
+        self.assertEqual(game.get_hash_history(), position.get_hash_history())
+        game_result = SearchEngine().search(game, 3)
+        position_result = SearchEngine().search(position, 3)
+        self.assertEqual((game_result.get_move(), game_result.get_score(), game_result.get_nodes()),
+                         (position_result.get_move(), position_result.get_score(), position_result.get_nodes()))
+
+    def test_restricted_root_search_leaves_no_exact_root_entry(self):
+        position = Position()
+        engine = SearchEngine()
+        moves = position.generate_legal_moves()
+        engine.search(position, 2, root_moves=moves[:3])
+        entry = engine._table.get(position.get_hash())
+        self.assertTrue(entry is None or entry[2] != EXACT)
+
+
+if __name__ == '__main__':
+    unittest.main()